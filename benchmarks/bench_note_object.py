@@ -0,0 +1,51 @@
+"""笔记拼接基准：逐行 += 构建笔记，对比分块构建器与改写前逐次复制的实现
+
+用法: python benchmarks/bench_note_object.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bilibili.note_object import NoteObject
+
+class CopyingNoteObject:
+    # 改写前的实现：每次 += 都复制左侧的完整列表
+    def __init__(self, obj: list = None, length: int = 0) -> None:
+        self.obj = obj if obj else []
+        self.length = length
+
+    def __add__(self, other: 'CopyingNoteObject') -> 'CopyingNoteObject':
+        new_obj = self.obj.copy()
+        new_obj.extend(other.obj)
+        return CopyingNoteObject(new_obj, self.length + other.length)
+
+    def append(self, obj: dict, len: int) -> None:
+        self.obj.append(obj)
+        self.length += len
+
+    def appendNewLine(self) -> None:
+        self.append({ "insert": "\n" }, 1)
+
+def build(note_class, ops: int) -> float:
+    start = time.perf_counter()
+    main = note_class()
+    for i in range(ops // 2):
+        line = note_class()
+        line.append({'insert': f'第{i}行'}, 4)
+        line.appendNewLine()
+        main += line
+    final = note_class()
+    final += main
+    assert len(final.obj) == ops
+    return time.perf_counter() - start
+
+def main() -> None:
+    for ops in (12500, 25000, 50000):
+        old = build(CopyingNoteObject, ops)
+        new = build(NoteObject, ops)
+        print(f'{ops} 个op: 逐次复制 {old:.3f} 秒, 分块构建 {new:.3f} 秒')
+
+if __name__ == '__main__':
+    main()
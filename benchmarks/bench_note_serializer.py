@@ -0,0 +1,53 @@
+"""笔记提交请求体基准：对比流式表单编码与先生成完整JSON再编码的耗时和峰值内存
+
+用法: python benchmarks/bench_note_serializer.py
+"""
+import os
+import sys
+import json
+import time
+import tracemalloc
+from urllib.parse import urlencode
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bilibili.note_object import NoteObject
+from bilibili import note_serializer
+from bilibili.note_serializer import encodeFormBody
+
+LINES = 50000
+
+def buildData() -> dict:
+    note = NoteObject()
+    for i in range(LINES):
+        note.append({'attributes': {'color': '#0b84ed', 'bold': True}, 'insert': f'第{i}行 text & more/?='}, 10)
+        note.appendNewLine()
+    return {'oid': 1, 'note_id': 2, 'title': '标题', 'summary': '摘要', 'content': note, 'csrf': 'token'}
+
+def encodeWhole(data: dict) -> bytes:
+    # 改写前的实现
+    data = dict(data)
+    data['content'] = json.dumps(data['content'].obj, indent=None, ensure_ascii=False, separators=(',', ':'))
+    return urlencode(data).encode()
+
+def measure(func, data: dict):
+    tracemalloc.start()
+    start = time.perf_counter()
+    body = func(data)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return body, elapsed, peak
+
+def main() -> None:
+    data = buildData()
+    backend = 'orjson' if note_serializer.orjson is not None else 'json'
+    old_body, old_time, old_peak = measure(encodeWhole, data)
+    new_body, new_time, new_peak = measure(encodeFormBody, data)
+    assert bytes(new_body) == old_body
+    print(f'{LINES * 2} 个op，请求体 {len(old_body) / 1e6:.1f} MB')
+    print(f'完整JSON后编码: {old_time:.3f} 秒, 峰值内存 {old_peak / 1e6:.1f} MB')
+    print(f'流式编码（{backend}）: {new_time:.3f} 秒, 峰值内存 {new_peak / 1e6:.1f} MB')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""分P注册基准：10k 条目 × 100 个分P，对比逐条扫描与二分查找
+
+用法: python benchmarks/bench_runtime_timeline.py
+"""
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bilibili.note_object import NoteObject
+from bilibili.runtime_timeline import RuntimeTimeline, RuntimeTimelineItem
+from bilibili.timeline import Timeline, TimelineItem
+from bilibili.video import VideoPartInfo
+
+ITEMS = 10000
+PARTS = 100
+PART_DURATION = 3600
+
+def run(timeline: Timeline, linear: bool) -> float:
+    runtime_timeline = RuntimeTimeline([RuntimeTimelineItem(item, (NoteObject(), '')) for item in timeline])
+    start = time.perf_counter()
+    for i in range(PARTS):
+        info = VideoPartInfo(i, i + 1, PARTS, f'P{i + 1}', PART_DURATION)
+        if linear:
+            for item in runtime_timeline.items:
+                item.registerPartInfo(info, i * PART_DURATION, 0, '', False)
+        else:
+            runtime_timeline.registerPartInfo(info, i * PART_DURATION, 0, '', False)
+    return time.perf_counter() - start
+
+def main() -> None:
+    rng = random.Random(1)
+    timeline = Timeline([TimelineItem(rng.randrange(0, PARTS * PART_DURATION), f'条目{i}') for i in range(ITEMS)])
+    linear = run(timeline, True)
+    bisected = run(timeline, False)
+    print(f'{ITEMS} 条目 × {PARTS} 分P: 逐条扫描 {linear:.3f} 秒, 二分查找 {bisected:.3f} 秒, {linear / bisected:.1f} 倍')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+"""分词吞吐量基准：对比单遍扫描实现与改写前的实现
+
+用法: python benchmarks/bench_tokenizer.py
+"""
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'tests'))
+
+from bilibili.tokenizer import tokenizer
+from test_tokenizer import referenceTokenizer
+
+def measure(func, line: str, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func(line)
+    return len(line) * rounds / (time.perf_counter() - start) / 1e6
+
+def main() -> None:
+    lines = {
+        '指令/链接/BV混排': '[B|#ee230d]粗体 https://example.com 看BV1xx411c7mD 回放[R]普通文本' * 2000,
+        '纯文本': '纯文本' * 20000,
+        '连续指令': '[B]' * 50000,
+    }
+    for name, line in lines.items():
+        new = measure(tokenizer, line, 20)
+        old = measure(referenceTokenizer, line, 20)
+        print(f'{name}（{len(line)} 字符）: 改写前 {old:.2f} M字符/秒, 当前 {new:.2f} M字符/秒, {new / old:.1f} 倍')
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,18 @@
-from .agent import BilibiliAgent
-from .timeline import Timeline, TimelineItem
+from .agent import BilibiliAgent, AgentOptions, AgentPool, TokenBucket
+from .timeline import Timeline, TimelineItem, TimelineColumns
 from .bilibili_note_helper import BilibiliNoteHelper, VideoPartInfo
-from .timeline_converter import TimelineConverter
+from .timeline_converter import TimelineConverter, TimelineDiagnostic
+from .timeline_cache import TimelineCSVCache
 from .pub_timeline_config import PubTimelineConfig
+from .title_resolver import BvTitleResolver
+from .image_cache import ImageUploadCache
+from .line_cache import LineCache
+from .note_state import NoteStateStore
+from .file_watcher import FileWatcher
+from .publish_task import PublishTask
+from .publish_resources import PublishResources
+from .publish_daemon import PublishDaemon
+from .adaptive_interval import AdaptiveInterval
+from .notifier import Notifier, NotificationSink, PushPlusSink, WebhookSink, FileSink
+from .reply_monitor import ReplyMonitor, BoundedSet
+from .comment_monitor import CommentMonitor, CommentMonitorConfig
@@ -0,0 +1,55 @@
+class AdaptiveInterval:
+    def __init__(self, min_interval: float = 60, max_interval: float = 3600, factor: float = 2.0) -> None:
+        """自适应的轮询间隔
+
+        没有变化时按factor指数增大间隔直至max_interval，检测到变化时立即回到min_interval
+
+        Args:
+            min_interval (float): 最短间隔，单位为秒
+            max_interval (float): 最长间隔，单位为秒
+            factor (float): 每次没有变化时间隔增大的倍数
+        """
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.factor = factor
+        self.current = min_interval
+
+    def configure(self, min_interval: float, max_interval: float) -> None:
+        """更新间隔范围，当前间隔会被限制在新范围内
+
+        Args:
+            min_interval (float): 最短间隔，单位为秒
+            max_interval (float): 最长间隔，单位为秒
+        """
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.current = min(max(self.current, self.min_interval), self.max_interval)
+
+    def reset(self) -> float:
+        """检测到变化，回到最短间隔
+
+        Returns:
+            float: 新的间隔
+        """
+        self.current = self.min_interval
+        return self.current
+
+    def backoff(self) -> float:
+        """没有变化，增大间隔
+
+        Returns:
+            float: 新的间隔
+        """
+        self.current = min(self.max_interval, self.current * self.factor)
+        return self.current
+
+    def update(self, changed: bool) -> float:
+        """根据本次检查是否有变化更新间隔
+
+        Args:
+            changed (bool): 本次检查是否检测到变化
+
+        Returns:
+            float: 下一次检查前应等待的间隔
+        """
+        return self.reset() if changed else self.backoff()
@@ -1,14 +1,95 @@
 import re
+import json
+import time
+import random
+import asyncio
 import aiohttp
+from typing import Dict
+from urllib.parse import urlparse
+
+# 需要退避重试的HTTP状态码与B站返回码（-412: 请求被拦截, -509/-799: 请求过于频繁, -500/-503: 服务器错误/过载）
+RETRY_STATUS = {412, 429}
+RETRY_CODES = {-412, -509, -799, -500, -503}
+# 其中表示请求被拦截或限流、没有被处理的返回码（RETRY_STATUS均属此类），非幂等请求遇到时也可以安全重试
+REJECTED_CODES = {-412, -509, -799}
+
+# 各接口每秒允许的请求数，未列出的接口使用defaultRate
+DEFAULT_RATE_LIMITS = {
+    '/x/note/add': 1.0,
+    '/x/note/image/upload': 2.0,
+    '/x/v2/reply/add': 0.5,
+}
+
+class RequestMaybeSentError(Exception):
+    """非幂等请求失败，但请求可能已经被服务器处理，不能安全地重新提交
+    """
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = 1) -> None:
+        """令牌桶限速器
+
+        Args:
+            rate (float): 每秒补充的令牌数
+            capacity (float): 桶容量，即允许的突发请求数
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """取得一个令牌，令牌不足时等待
+        """
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+class AgentOptions:
+    def __init__(self, json_data: dict = None) -> None:
+        """网络连接选项
+
+        Args:
+            json_data (dict): 配置文件中的network项
+        """
+        json_data = json_data if json_data else {}
+        self.limit: int = json_data['limit'] if 'limit' in json_data else 10
+        self.limit_per_host: int = json_data['limitPerHost'] if 'limitPerHost' in json_data else 6
+        self.dns_cache_ttl: int = json_data['dnsCacheTTL'] if 'dnsCacheTTL' in json_data else 300
+        self.timeout: float = json_data['timeout'] if 'timeout' in json_data else 30
+        self.max_retries: int = json_data['maxRetries'] if 'maxRetries' in json_data else 4
+        self.backoff_base: float = json_data['backoffBase'] if 'backoffBase' in json_data else 1.0
+        self.backoff_max: float = json_data['backoffMax'] if 'backoffMax' in json_data else 60.0
+        self.default_rate: float = json_data['defaultRate'] if 'defaultRate' in json_data else 4.0
+        self.rate_limits: Dict[str, float] = dict(DEFAULT_RATE_LIMITS)
+        if 'rateLimits' in json_data:
+            self.rate_limits.update(json_data['rateLimits'])
 
 class BilibiliAgent:
-    def __init__(self, cookie: str = None) -> None:
+    def __init__(self, cookie: str = None, options: AgentOptions = None, rate_budget: TokenBucket = None) -> None:
+        """B站接口调用代理
+
+        Args:
+            cookie (str): 登录用的cookie，为空时匿名访问
+            options (AgentOptions): 网络连接选项
+            rate_budget (TokenBucket): 多个代理共享的全局限速器，为空时不限制
+        """
         self.csrf = ''
         self.cookie = ''
+        self.mid = ''
         if cookie != None:
             if "bili_jct=" in cookie and "SESSDATA=" in cookie:
                 self.csrf = re.search(r"bili_jct=([0-9a-zA-Z]{32})", cookie).group(1).strip()
                 self.cookie = cookie
+                mid_match = re.search(r"DedeUserID=(\d+)", cookie)
+                if mid_match:
+                    self.mid = mid_match.group(1)
             else:
                 print("警告: cookie 无效，部分功能可能不可用\n请保证有SESSDATA字段和bili_jct字段")
         self.headers = {
@@ -17,24 +98,155 @@ class BilibiliAgent:
             "Chrome/83.0.4103.116 Safari/537.36",
             "Cookie": self.cookie,
         }
-        self.session = aiohttp.ClientSession(headers=self.headers)
+        self.options = options if options else AgentOptions()
+        self.rate_budget = rate_budget
+        self._buckets: Dict[str, TokenBucket] = {}
+        connector = aiohttp.TCPConnector(
+            limit=self.options.limit,
+            limit_per_host=self.options.limit_per_host,
+            ttl_dns_cache=self.options.dns_cache_ttl)
+        self.session = aiohttp.ClientSession(
+            headers=self.headers,
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.options.timeout))
+
+    @property
+    def account(self) -> str:
+        """区分账号的标识：cookie中的用户UID，没有时使用csrf
+        """
+        return self.mid or self.csrf
 
     @staticmethod
     def _check(url: str, res_json) -> None:
         if res_json["code"] != 0:
             raise Exception(f"服务调用失败\n地址: {url}\n返回值: {res_json}")
 
+    def _getBucket(self, url: str) -> TokenBucket:
+        path = urlparse(url).path
+        bucket = self._buckets.get(path)
+        if bucket is None:
+            rate = self.options.rate_limits.get(path, self.options.default_rate)
+            bucket = TokenBucket(rate)
+            self._buckets[path] = bucket
+        return bucket
+
+    def _getBackoff(self, attempt: int) -> float:
+        delay = min(self.options.backoff_max, self.options.backoff_base * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.5)
+
+    async def request(self, method: str, url: str, idempotent: bool = True, **kwargs) -> dict:
+        """发送请求，按接口限速，并对可重试的错误进行指数退避重试
+
+        Args:
+            method (str): 请求方法
+            url (str): 请求地址
+            idempotent (bool): 重复发送是否安全。为False时（如新建笔记、发送评论）只在连接未能建立或请求被拦截、限流时重试，
+                超时、服务器错误等请求可能已被处理的情况下抛出RequestMaybeSentError，避免重复创建
+            kwargs: 传递给aiohttp的参数。data可以是无参函数，每次重试时重新调用以生成请求体
+
+        Returns:
+            dict: 返回值的data字段
+        """
+        data = kwargs.pop('data', None)
+        bucket = self._getBucket(url)
+        attempt = 0
+        while True:
+            await bucket.acquire()
+            if self.rate_budget is not None:
+                await self.rate_budget.acquire()
+            if data is not None:
+                kwargs['data'] = data() if callable(data) else data
+            # 请求是否确定没有被处理（此时即使不是幂等请求也可以安全重试）
+            not_processed = False
+            try:
+                async with self.session.request(method, url, **kwargs) as res:
+                    if res.status in RETRY_STATUS or res.status >= 500:
+                        reason = f'HTTP {res.status}'
+                        not_processed = res.status in RETRY_STATUS
+                    else:
+                        res_json = await res.json(content_type=None)
+                        if res_json["code"] in RETRY_CODES:
+                            reason = f'返回码 {res_json["code"]}'
+                            not_processed = res_json["code"] in REJECTED_CODES
+                        else:
+                            BilibiliAgent._check(url, res_json)
+                            return res_json.get("data", {})
+            except aiohttp.ClientConnectorError as e:
+                # 连接未能建立
+                reason = f'{e.__class__.__name__} {e}'
+                not_processed = True
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                reason = f'{e.__class__.__name__} {e}'
+            if not idempotent and not not_processed:
+                raise RequestMaybeSentError(f"服务调用失败\n地址: {url}\n错误: {reason}\n请求可能已被处理，为避免重复提交不再重试")
+            if attempt >= self.options.max_retries:
+                raise Exception(f"服务调用失败\n地址: {url}\n已重试 {attempt} 次，最后一次错误: {reason}")
+            delay = self._getBackoff(attempt)
+            print(f'请求 {url} 失败（{reason}），{delay:.1f} 秒后重试')
+            await asyncio.sleep(delay)
+            attempt += 1
+
     async def get(self, url: str, **kwargs) -> dict:
-        async with self.session.get(url, **kwargs) as res:
-            res_json = await res.json()
-            BilibiliAgent._check(url, res_json)
-            return res_json.get("data", {})
+        return await self.request('GET', url, **kwargs)
 
     async def post(self, url: str, **kwargs) -> dict:
-        async with self.session.post(url, **kwargs) as res:
-            res_json = await res.json()
-            BilibiliAgent._check(url, res_json)
-            return res_json.get("data", {})
+        return await self.request('POST', url, **kwargs)
 
     async def close(self) -> None:
         await self.session.close()
+
+class AgentPool:
+    def __init__(self, global_rate: float = None) -> None:
+        """按cookie共享的代理池
+
+        Args:
+            global_rate (float): 池内所有代理合计每秒允许的请求数，为空时不限制
+        """
+        self.rate_budget = TokenBucket(global_rate, max(1, global_rate)) if global_rate else None
+        self._agents: Dict[tuple, BilibiliAgent] = {}
+        self._refs: Dict[tuple, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._agents)
+
+    @staticmethod
+    def _getKey(cookie: str, network: dict) -> tuple:
+        return (cookie, json.dumps(network, sort_keys=True))
+
+    def acquire(self, cookie: str, network: dict = None) -> BilibiliAgent:
+        """获取与cookie和网络选项对应的代理，不存在时新建
+
+        Args:
+            cookie (str): 登录用的cookie
+            network (dict): 配置文件中的network项
+
+        Returns:
+            BilibiliAgent: 共享的代理
+        """
+        key = AgentPool._getKey(cookie, network)
+        if key not in self._agents:
+            self._agents[key] = BilibiliAgent(cookie, AgentOptions(network), self.rate_budget)
+            self._refs[key] = 0
+        self._refs[key] += 1
+        return self._agents[key]
+
+    async def release(self, agent: BilibiliAgent) -> None:
+        """归还代理，没有任务使用时关闭连接
+
+        Args:
+            agent (BilibiliAgent): 由acquire获取的代理
+        """
+        for key, pooled_agent in self._agents.items():
+            if pooled_agent is agent:
+                self._refs[key] -= 1
+                if self._refs[key] <= 0:
+                    del self._agents[key]
+                    del self._refs[key]
+                    await agent.close()
+                return
+
+    async def close(self) -> None:
+        for agent in self._agents.values():
+            await agent.close()
+        self._agents.clear()
+        self._refs.clear()
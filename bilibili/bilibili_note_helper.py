@@ -13,7 +13,10 @@ from .timeline_converter import TimelineConverter
 from .pub_timeline_config import PubTimelineConfig
 from .runtime_timeline import RuntimeTimeline
 from .note_object import NoteObject
-from .tokenizer import getContentJson, getTitleJson
+from .tokenizer import getContentJson, getTitleJson, collectBvids
+from .note_serializer import encodeFormBody, FORM_CONTENT_TYPE
+from .note_state import NoteStateStore, hashNote
+from .publish_resources import PublishResources
 
 class TokenInfo:
     def __init__(self) -> None:
@@ -56,12 +59,38 @@ class BilibiliNoteHelper:
         parts = [BilibiliNoteHelper.getVideoPartInfo(cnt, part_payload) for part_payload in payload['pages']]
         return VideoInfo(aid, pic, title, parts)
 
+    @staticmethod
+    async def getPartCollection(config: PubTimelineConfig, agent: BilibiliAgent) -> List[int]:
+        """只获取视频的分P列表，用于低成本地检测分P变化
+
+        Args:
+            config (PubTimelineConfig): 配置信息
+            agent (BilibiliAgent): 用于查询的账号
+
+        Returns:
+            List[int]: 各分P的cid
+        """
+        pages = None
+        if config.custom_video_info:
+            with open(config.custom_video_info, 'r', encoding='utf8') as fp:
+                pages = json.load(fp)
+        if not pages:
+            pages = await agent.get(
+                "https://api.bilibili.com/x/player/pagelist",
+                params={
+                    "bvid": config.bvid
+                })
+        return [page['cid'] for page in pages]
+
     @staticmethod
     async def sendNote(
             timeline: Timeline, template: List[str], agent: BilibiliAgent,
             config: PubTimelineConfig,
             confirmed: bool = False,
-            previousPartCollection: List[str] = None
+            previousPartCollection: List[str] = None,
+            note_state: NoteStateStore = None,
+            resources: PublishResources = None,
+            skip_unchanged: bool = False
         ) -> List[str]:
         """发送笔记
 
@@ -71,9 +100,24 @@ class BilibiliNoteHelper:
             config (PubTimelineConfig): 其他配置信息
             confirmed (bool): 发布前是否不用二次确认, 默认为False
             previousPartCollection (list[int]): 前一次发布的视频分P信息, 默认为空
+            note_state (NoteStateStore): 笔记状态，为空时按配置中的noteState新建
+            resources (PublishResources): 已按配置设置好的缓存，为空时按配置设置并使用进程共享的缓存
+            skip_unchanged (bool): 渲染结果与上次提交的笔记一致时是否跳过提交，默认为False，用于自动监控
         Returns:
             List[str]: 如果发布成功，返回新的视频分P信息
         """
+        if note_state is None:
+            note_state = NoteStateStore(config.note_state)
+        if resources is None:
+            resources = PublishResources.shared()
+            resources.configure(config)
+        if previousPartCollection:
+            # 只拉取分P列表检查是否有变化，避免每次都获取完整的视频信息
+            part_collection = await BilibiliNoteHelper.getPartCollection(config, agent)
+            if previousPartCollection == part_collection:
+                # 分P数量没有发生变化
+                return part_collection
+
         # 获取视频信息
         video_info_res = await agent.get(
             "https://api.bilibili.com/x/web-interface/view",
@@ -92,28 +136,29 @@ class BilibiliNoteHelper:
             # 分P数量没有发生变化
             return part_collection
 
-        await asyncio.sleep(1)
-        # 获取笔记状态
-        note_res = await agent.get(
-            "https://api.bilibili.com/x/note/list/archive",
-            params={
-                "oid": video_info.aid
-            })
-        note_id = ''
-        if not note_res['noteIds']:
-            await asyncio.sleep(1)
-            # 没有笔记，插入一个新的空笔记以获取ID
-            note_add_res = await agent.post(
-                "https://api.bilibili.com/x/note/add",
-                data={
-                    "oid": video_info.aid,
-                    "csrf": agent.csrf,
-                    "title": video_info.title,
-                    "summary": " "
+        # 获取笔记状态，同一视频的笔记ID不会变化，记录后不再重复查询
+        note_id = note_state.getNoteId(agent.account, video_info.aid)
+        if not note_id:
+            note_res = await agent.get(
+                "https://api.bilibili.com/x/note/list/archive",
+                params={
+                    "oid": video_info.aid
                 })
-            note_id = note_add_res['note_id']
-        else:
-            note_id = note_res['noteIds'][0]
+            if not note_res['noteIds']:
+                # 没有笔记，插入一个新的空笔记以获取ID
+                note_add_res = await agent.post(
+                    "https://api.bilibili.com/x/note/add",
+                    idempotent=False,
+                    data={
+                        "oid": video_info.aid,
+                        "csrf": agent.csrf,
+                        "title": video_info.title,
+                        "summary": " "
+                    })
+                note_id = note_add_res['note_id']
+            else:
+                note_id = note_res['noteIds'][0]
+            note_state.setNoteId(agent.account, video_info.aid, note_id)
 
         # 发布笔记
         # 检查偏移量和分P数是否一致
@@ -132,8 +177,14 @@ class BilibiliNoteHelper:
                 return []
 
         # 开始生成笔记
+        # 预先并发解析轴内和模板内引用的全部BV号标题
+        bv_texts = [item.tag for item in timeline if not item.tag.startswith('##')]
+        bv_texts.extend(line.rstrip('\n') for line in template)
+        bv_texts.append(config.song_dance_title)
+        await resources.title_resolver.resolveAll(collectBvids(bv_texts), agent)
+
         token_info = [TokenInfo() for _ in range(len(config.tokens))]
-        runtime_timeline = await RuntimeTimeline.getRuntimeTimeline(timeline, config, agent)
+        runtime_timeline = await RuntimeTimeline.getRuntimeTimeline(timeline, config, agent, resources)
 
         op_obj = NoteObject()
         # 生成每个分P的轴
@@ -221,7 +272,7 @@ class BilibiliNoteHelper:
                 song_dance_timeline = runtime_timeline.songAndDance()
                 if song_dance_timeline.items:
                     song_dance_obj = NoteObject()
-                    song_dance_title, _ = await getContentJson(config.song_dance_title, agent)
+                    song_dance_title, _ = await getContentJson(config.song_dance_title, agent, resources)
                     song_dance_obj += song_dance_title
                     for item in song_dance_timeline.items:
                         song_dance_obj += item.getObject()
@@ -234,7 +285,7 @@ class BilibiliNoteHelper:
                     if item.part_names != last_titles and (not config.hide_part_title):
                         merged_titles = ' / '.join(item.part_names)
                         last_titles = item.part_names
-                        main_obj += await getTitleJson(merged_titles, config)
+                        main_obj += await getTitleJson(merged_titles, config, resources=resources)
                     main_obj += item.getObject()
                 final_submit_obj += main_obj
                 final_submit_obj.appendNewLine()
@@ -246,16 +297,35 @@ class BilibiliNoteHelper:
                         if video_part.index in item.abstract_time_obj:
                             part_labels.append(item.abstract_time_obj[video_part.index])
                     if part_labels:
-                        abstract_obj += await getTitleJson(video_part.title, config)
+                        abstract_obj += await getTitleJson(video_part.title, config, resources=resources)
                         for part_label in part_labels:
                             abstract_obj.append(part_label, 1)
                             abstract_obj.appendNewLine()
                 final_submit_obj += abstract_obj
                 final_submit_obj.appendNewLine()
             else:
-                line_obj, _ = await getContentJson(line, agent)
+                line_obj, _ = await getContentJson(line, agent, resources)
                 final_submit_obj += line_obj
 
+        resources.save()
+
+        # 与上次提交的内容比较（在补全随机字数之前计算）
+        content_hash = hashNote(final_submit_obj, {
+            "title": video_info.title,
+            "summary": config.cover,
+            "publish": config.publish,
+            "auto_comment": config.auto_comment,
+            "comment_format": config.legacy_comment_style
+        })
+        lines = [str(item) for item in timeline]
+        parts = [part.title for part in video_info.parts]
+        previous_state = note_state.getNote(note_id)
+        if previous_state:
+            print(NoteStateStore.diffSummary(previous_state, lines, parts))
+            if skip_unchanged and previous_state['hash'] == content_hash:
+                print('渲染结果与上次提交的笔记一致，跳过提交')
+                return part_collection
+
         # 补全字数
         if final_submit_obj.length < 300:
             sample = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789'
@@ -273,14 +343,13 @@ class BilibiliNoteHelper:
             }, len(ran_str))
             final_submit_obj.length = 311
 
-        submit_obj_str = json.dumps(final_submit_obj.obj, indent=None, ensure_ascii=False, separators=(',', ':'))
         comment_format = 1 if config.legacy_comment_style else 2
         data = {
             "oid": video_info.aid,
             "note_id": note_id,
             "title": video_info.title,
             "summary": config.cover,
-            "content": submit_obj_str,
+            "content": final_submit_obj,
             "csrf": agent.csrf,
             "cont_len": max(final_submit_obj.length, 301),
             "hash": str(round(time.time()*1000)),
@@ -288,10 +357,19 @@ class BilibiliNoteHelper:
             "auto_comment": 1 if (config.publish and config.auto_comment) else 0,
             "comment_format": comment_format
         }
-        await asyncio.sleep(1)
-        submit_res = await agent.post("https://api.bilibili.com/x/note/add", data=data)
+        # 笔记内容直接流式编码进请求体，避免同时持有完整的JSON字符串
+        try:
+            submit_res = await agent.post(
+                "https://api.bilibili.com/x/note/add",
+                data=encodeFormBody(data),
+                headers={"Content-Type": FORM_CONTENT_TYPE})
+        except Exception:
+            # 笔记可能已被删除，下次重新查询笔记ID
+            note_state.forgetNoteId(agent.account, video_info.aid)
+            raise
         if submit_res['note_id']:
             print(f'执行成功，笔记ID为：{submit_res}')
+            note_state.setNote(note_id, content_hash, lines, parts)
             return part_collection
         else:
             print(f'执行失败，返回值为{submit_res}')
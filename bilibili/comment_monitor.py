@@ -0,0 +1,118 @@
+import os
+import time
+import asyncio
+from typing import Dict, List, Set
+
+from .agent import BilibiliAgent
+from .bilibili_note_helper import BilibiliNoteHelper
+from .adaptive_interval import AdaptiveInterval
+from .reply_monitor import ReplyMonitor
+from .notifier import Notifier
+
+class CommentMonitorConfig:
+    def __init__(self, json_data: dict) -> None:
+        """评论监控配置
+
+        Args:
+            json_data (dict): 配置文件内容
+        """
+        self.videos: List[str] = list(dict.fromkeys(json_data['videos']))
+        # 按mid匹配用户；unames仅用于兼容按用户名匹配的旧用法
+        self.mids: Set[int] = {int(mid) for mid in json_data['mids']} if 'mids' in json_data else set()
+        self.unames: Set[str] = set(json_data['unames']) if 'unames' in json_data else set()
+        self.state_dir: str = json_data['stateDir'] if 'stateDir' in json_data else '.'
+        self.poll_min_interval: float = json_data['pollMinInterval'] if 'pollMinInterval' in json_data else 60
+        self.poll_max_interval: float = json_data['pollMaxInterval'] if 'pollMaxInterval' in json_data else 600
+        self.max_pages: int = json_data['maxPages'] if 'maxPages' in json_data else 10
+
+    def matches(self, reply: dict) -> bool:
+        return reply['mid'] in self.mids or (bool(self.unames) and reply['member']['uname'] in self.unames)
+
+class CommentMonitor:
+    def __init__(self, config: CommentMonitorConfig, agent: BilibiliAgent, notifier: Notifier) -> None:
+        """同时监控多个视频下多个用户的评论
+
+        所有视频共用一个账号连接，在同一个事件循环中轮询，每个视频按评论区活跃程度自适应调整检查间隔
+
+        Args:
+            config (CommentMonitorConfig): 监控配置
+            agent (BilibiliAgent): 共享的账号
+            notifier (Notifier): 推送通知
+        """
+        self.config = config
+        self.agent = agent
+        self.notifier = notifier
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._intervals: Dict[str, AdaptiveInterval] = {}
+
+    def configure(self, config: CommentMonitorConfig) -> None:
+        """更新配置，启动新增视频的监控并停止已移除的视频
+
+        Args:
+            config (CommentMonitorConfig): 新的监控配置
+        """
+        self.config = config
+        for bvid in list(self._tasks.keys()):
+            if bvid not in config.videos:
+                print(f'[{bvid}] 停止监控')
+                self._tasks.pop(bvid).cancel()
+                del self._intervals[bvid]
+        for bvid, interval in self._intervals.items():
+            interval.configure(config.poll_min_interval, config.poll_max_interval)
+        for bvid in config.videos:
+            if bvid not in self._tasks:
+                self._intervals[bvid] = AdaptiveInterval(config.poll_min_interval, config.poll_max_interval)
+                self._tasks[bvid] = asyncio.ensure_future(self._watchVideo(bvid))
+
+    def _format(self, bvid: str, reply: dict) -> str:
+        uname = reply['member']['uname']
+        kind = '楼中楼回复' if reply.get('root') else '评论'
+        pub_time = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(reply["ctime"]))
+        base_url_app = f"https://www.bilibili.com/video/{bvid}?comment_on=1&comment_root_id="
+        base_url_pc = f"https://www.bilibili.com/video/{bvid}#reply"
+        content = f"已捕获到 {uname} 的{kind}：\n{reply['content']['message']}\n"
+        content += f"发布时间{pub_time}\nAPP直达链接：\n{base_url_app}{reply['rpid']}\nPC直达链接：\n{base_url_pc}{reply['rpid']}\n\n"
+        return content
+
+    async def _watchVideo(self, bvid: str) -> None:
+        monitor = None
+        title = bvid
+        interval = self._intervals[bvid]
+        while True:
+            try:
+                if monitor is None:
+                    video_info_res = await self.agent.get(
+                        "https://api.bilibili.com/x/web-interface/view",
+                        params={
+                            "bvid": bvid
+                        })
+                    video_info = BilibiliNoteHelper.getVideoInfo(video_info_res)
+                    title = video_info.title
+                    os.makedirs(self.config.state_dir, exist_ok=True)
+                    state_path = os.path.join(self.config.state_dir, f'.comment_monitor_{bvid}.json')
+                    monitor = ReplyMonitor(video_info.aid, state_path, max_pages=self.config.max_pages)
+                    print(f'[{bvid}] 开始监视 {title} 的评论区...')
+                new_replies = await monitor.poll(self.agent)
+                # 评论区有新动态时加快检查，否则逐步放缓
+                interval.update(bool(new_replies))
+                content = ''
+                for reply in new_replies:
+                    if self.config.matches(reply):
+                        message = self._format(bvid, reply)
+                        print('==============================')
+                        print(f'[{bvid}] {message}', end='')
+                        content += message
+                if content:
+                    self.notifier.notify(f'{title} 评论监控', content + "持续监控中...")
+            except Exception as e:
+                interval.backoff()
+                print(f'[{bvid}] 检查评论区失败，错误原因如下：')
+                print(e)
+            await asyncio.sleep(interval.current)
+
+    async def close(self) -> None:
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks.clear()
+        self._intervals.clear()
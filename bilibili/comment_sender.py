@@ -0,0 +1,255 @@
+import os
+import json
+import time
+import asyncio
+from typing import Callable, Dict, List
+
+from .agent import BilibiliAgent, RequestMaybeSentError
+from .notifier import Notifier
+
+class CommentTarget:
+    def __init__(self, bvid: str, comment: str) -> None:
+        """等待笔记发布后自动评论的视频
+
+        Args:
+            bvid (str): 视频BV号
+            comment (str): 评论内容，发送时会在前面加上笔记链接
+        """
+        self.bvid = bvid
+        self.comment = comment
+        self.aid = 0
+        self.title = bvid
+        # 匹配到的笔记专栏ID
+        self.cvid: int = None
+        self.pending = False
+        self.sent = False
+        # 发送失败但评论可能已经发出，不会自动重新发送
+        self.uncertain = False
+
+class ArticleScanner:
+    def __init__(self, mid: str, page_size: int = 30, max_pages: int = 5, newest_id: int = 0) -> None:
+        """增量扫描用户发布的专栏（笔记）
+
+        按发布时间倒序翻页，遇到已扫描过的专栏即停止
+
+        Args:
+            mid (str): 用户UID
+            page_size (int): 每页条数
+            max_pages (int): 单次扫描最多读取的页数
+            newest_id (int): 已扫描过的最新专栏ID
+        """
+        self.mid = mid
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.newest_id = newest_id
+
+    async def scan(self, agent: BilibiliAgent) -> List[dict]:
+        """读取上次扫描之后新发布的专栏
+
+        Args:
+            agent (BilibiliAgent): 用于查询的账号
+
+        Returns:
+            List[dict]: 新发布的专栏，按发布时间倒序排列
+        """
+        articles = []
+        for pn in range(1, self.max_pages + 1):
+            article_res = await agent.get(
+                "https://api.bilibili.com/x/space/article",
+                params={
+                    "mid": self.mid,
+                    "pn": pn,
+                    "ps": self.page_size,
+                    "sort": "publish_time"
+                })
+            page = article_res.get('articles') or []
+            reached = False
+            for article in page:
+                if article['id'] <= self.newest_id:
+                    reached = True
+                    break
+                articles.append(article)
+            if reached or len(page) < self.page_size or pn * self.page_size >= article_res.get('count', 0):
+                break
+        if articles:
+            self.newest_id = max(self.newest_id, articles[0]['id'])
+        return articles
+
+class CommentQueue:
+    def __init__(self, agent: BilibiliAgent, notifier: Notifier, min_interval: float = 10, on_update: Callable[[CommentTarget], None] = None) -> None:
+        """按固定最小间隔依次发送评论的队列
+
+        确定没有发出的评论会在下次检查时重新提交；请求已发出但结果未知的评论标记为不确定，不会自动重新发送
+
+        Args:
+            agent (BilibiliAgent): 用于发送评论的账号
+            notifier (Notifier): 发送成功后的推送通知
+            min_interval (float): 两条评论之间的最小间隔，单位为秒
+            on_update (Callable[[CommentTarget], None]): 每条评论发送成功或被标记为不确定后立即调用，用于及时保存状态，避免重启后重复评论
+        """
+        self.agent = agent
+        self.notifier = notifier
+        self.min_interval = min_interval
+        self.on_update = on_update
+        self.sent = 0
+        self.failed = 0
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: asyncio.Task = None
+
+    def submit(self, target: CommentTarget) -> None:
+        """提交一条评论，立即返回
+
+        Args:
+            target (CommentTarget): 已匹配到笔记的目标视频
+        """
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._drain())
+        target.pending = True
+        self._queue.put_nowait(target)
+
+    @staticmethod
+    def getMessage(target: CommentTarget) -> str:
+        url = f'https://www.bilibili.com/h5/note-app/view?cvid={target.cvid}&pagefrom=comment'
+        return f'{url}\n{target.comment}'
+
+    def _update(self, target: CommentTarget) -> None:
+        if self.on_update is None:
+            return
+        try:
+            self.on_update(target)
+        except Exception as e:
+            # 评论可能已经发出，不能因为保存失败而重试
+            print(f'[{target.bvid}] 评论状态保存失败: {e}')
+
+    async def _send(self, target: CommentTarget) -> None:
+        full_comment = CommentQueue.getMessage(target)
+        await self.agent.post(
+            'http://api.bilibili.com/x/v2/reply/add',
+            idempotent=False,
+            params={
+                "type": 1,
+                "oid": target.aid,
+                "csrf": self.agent.csrf,
+                "message": full_comment
+            })
+        target.sent = True
+        self._update(target)
+        print(f'[{target.bvid}] 已完成评论发布')
+        self.notifier.notify(f'{target.title}评论自动发布', full_comment)
+
+    async def _drain(self) -> None:
+        last_sent = 0.0
+        while True:
+            target = await self._queue.get()
+            try:
+                delay = last_sent + self.min_interval - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                await self._send(target)
+                self.sent += 1
+            except RequestMaybeSentError as e:
+                self.failed += 1
+                target.uncertain = True
+                self._update(target)
+                print(f'[{target.bvid}] 评论可能已经发出，为避免重复评论不再自动重试，请到评论区确认，错误原因如下：')
+                print(e)
+                self.notifier.notify(f'{target.title}评论结果未知', f'评论可能已经发出，请到评论区确认：\n{CommentQueue.getMessage(target)}')
+            except Exception as e:
+                self.failed += 1
+                print(f'[{target.bvid}] 评论发布失败，下次检查时重试，错误原因如下：')
+                print(e)
+            finally:
+                last_sent = time.monotonic()
+                target.pending = False
+                self._queue.task_done()
+
+    async def verify(self, target: CommentTarget) -> bool:
+        """在视频的最新评论中查找本账号发出的同样内容，用于确认结果不确定的评论是否已经发出
+
+        Args:
+            target (CommentTarget): 目标视频
+
+        Returns:
+            bool: 是否找到，找到时将其标记为已发送
+        """
+        message = CommentQueue.getMessage(target)
+        res = await self.agent.get(
+            "https://api.bilibili.com/x/v2/reply/main",
+            params={
+                "type": 1,
+                "oid": target.aid,
+                "mode": 2,
+                "next": 0
+            })
+        for reply in res.get('replies') or []:
+            if reply['content']['message'] != message:
+                continue
+            if self.agent.mid and str(reply['member']['mid']) != self.agent.mid:
+                continue
+            target.sent = True
+            target.uncertain = False
+            self._update(target)
+            return True
+        return False
+
+    async def join(self) -> None:
+        """等待队列中的评论全部发送完毕
+        """
+        await self._queue.join()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+class CommentSenderState:
+    def __init__(self, state_path: str = None) -> None:
+        """记录已扫描到的最新专栏ID、各视频匹配到的笔记、已完成和结果不确定的评论，可选地持久化到磁盘
+
+        Args:
+            state_path (str): 状态文件路径，为空时仅在内存中记录
+        """
+        self.state_path = state_path
+        self.newest_id = 0
+        self.found: Dict[str, int] = {}
+        self.sent: List[str] = []
+        # 结果不确定、需要人工确认的评论
+        self.uncertain: List[str] = []
+        if state_path and os.path.exists(state_path):
+            try:
+                with open(state_path, 'r', encoding='utf-8') as f:
+                    json_data = json.load(f)
+                self.newest_id = json_data.get('newest', 0)
+                self.found = json_data.get('found', {})
+                self.sent = json_data.get('sent', [])
+                self.uncertain = json_data.get('uncertain', [])
+            except (OSError, ValueError) as e:
+                print(f'状态文件 {state_path} 读取失败，将重新记录: {e}')
+
+    def restore(self, target: CommentTarget) -> None:
+        target.cvid = self.found.get(target.bvid)
+        target.sent = target.bvid in self.sent
+        target.uncertain = not target.sent and target.bvid in self.uncertain
+
+    def update(self, newest_id: int, targets: List[CommentTarget]) -> None:
+        """记录最新进度并写入状态文件（如有）
+
+        Args:
+            newest_id (int): 已扫描过的最新专栏ID
+            targets (List[CommentTarget]): 全部目标视频
+        """
+        self.newest_id = newest_id
+        for target in targets:
+            if target.cvid is not None:
+                self.found[target.bvid] = target.cvid
+            if target.sent and target.bvid not in self.sent:
+                self.sent.append(target.bvid)
+            if target.uncertain and not target.sent:
+                if target.bvid not in self.uncertain:
+                    self.uncertain.append(target.bvid)
+            elif target.bvid in self.uncertain:
+                self.uncertain.remove(target.bvid)
+        if not self.state_path:
+            return
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'newest': self.newest_id, 'found': self.found, 'sent': self.sent, 'uncertain': self.uncertain}, f)
+        os.replace(tmp_path, self.state_path)
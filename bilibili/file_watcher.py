@@ -0,0 +1,177 @@
+import os
+import sys
+import time
+import struct
+import asyncio
+import ctypes
+import ctypes.util
+from typing import Dict, Iterable, Set, Tuple
+
+# inotify 常量（见 <sys/inotify.h>）
+IN_MODIFY      = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM  = 0x00000040
+IN_MOVED_TO    = 0x00000080
+IN_CREATE      = 0x00000100
+IN_DELETE      = 0x00000200
+IN_IGNORED     = 0x00008000
+IN_NONBLOCK    = 0x00000800
+IN_CLOEXEC     = 0x00080000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct('iIII')
+
+class FileWatcher:
+    def __init__(self, paths: Iterable[str], debounce: float = 0.3, max_delay: float = 1.0, poll_interval: float = 1.0) -> None:
+        """监控一组文件的变化
+
+        Linux下使用inotify监控文件所在目录（兼容编辑器先写临时文件再重命名的保存方式），其他平台或inotify不可用时退化为定时轮询。
+        短时间内的多次变化会被合并为一次通知
+
+        Args:
+            paths (Iterable[str]): 需要监控的文件
+            debounce (float): 文件静默多久后视为修改完成，单位为秒
+            max_delay (float): 从首次变化到发出通知的最长等待时间，单位为秒
+            poll_interval (float): 轮询模式下的检查间隔，单位为秒
+        """
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self._paths: Set[str] = set()
+        self._changed: Set[str] = set()
+        self._event = asyncio.Event()
+        self._fd = -1
+        self._libc = None
+        self._dirs: Dict[str, int] = {}
+        self._wds: Dict[int, str] = {}
+        self._stats: Dict[str, Tuple[int, int]] = {}
+        self._poll_task: asyncio.Task = None
+        self._initInotify()
+        self.setPaths(paths)
+
+    @property
+    def mode(self) -> str:
+        return 'inotify' if self._fd >= 0 else 'polling'
+
+    def _initInotify(self) -> None:
+        if not sys.platform.startswith('linux'):
+            return
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        except (OSError, AttributeError):
+            return
+        if fd < 0:
+            return
+        self._libc = libc
+        self._fd = fd
+        asyncio.get_running_loop().add_reader(fd, self._readEvents)
+
+    def setPaths(self, paths: Iterable[str]) -> None:
+        """更新需要监控的文件
+
+        Args:
+            paths (Iterable[str]): 需要监控的文件
+        """
+        self._paths = {os.path.abspath(path) for path in paths}
+        self._stats = {path: FileWatcher._stat(path) for path in self._paths}
+        if self._fd >= 0:
+            directories = {os.path.dirname(path) for path in self._paths}
+            # 不再需要的目录取消监控
+            for directory in [directory for directory in self._dirs if directory not in directories]:
+                wd = self._dirs.pop(directory)
+                del self._wds[wd]
+                self._libc.inotify_rm_watch(self._fd, wd)
+            for directory in directories:
+                if directory in self._dirs:
+                    continue
+                wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+                if wd < 0:
+                    print(f'无法监控目录 {directory}，将改为轮询模式')
+                    self._closeInotify()
+                    break
+                self._dirs[directory] = wd
+                self._wds[wd] = directory
+        if self._fd < 0 and self._poll_task is None:
+            self._poll_task = asyncio.ensure_future(self._poll())
+
+    @staticmethod
+    def _stat(path: str) -> Tuple[int, int]:
+        try:
+            stat = os.stat(path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def _notify(self, path: str) -> None:
+        self._changed.add(path)
+        self._event.set()
+
+    def _readEvents(self) -> None:
+        try:
+            buffer = os.read(self._fd, 65536)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(buffer):
+            wd, mask, _, name_len = EVENT_HEADER.unpack_from(buffer, offset)
+            offset += EVENT_HEADER.size
+            name = buffer[offset:offset + name_len].rstrip(b'\0')
+            offset += name_len
+            if mask & IN_IGNORED:
+                # 目录被删除等原因导致监控失效，下次setPaths时重新添加
+                directory = self._wds.pop(wd, None)
+                if directory is not None and self._dirs.get(directory) == wd:
+                    del self._dirs[directory]
+                continue
+            directory = self._wds.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, os.fsdecode(name))
+            if path in self._paths:
+                self._notify(path)
+
+    async def _poll(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            for path in self._paths:
+                stat = FileWatcher._stat(path)
+                if stat != self._stats.get(path):
+                    self._stats[path] = stat
+                    self._notify(path)
+
+    async def wait(self) -> Set[str]:
+        """等待文件变化
+
+        Returns:
+            Set[str]: 发生变化的文件（绝对路径）
+        """
+        await self._event.wait()
+        first_change = time.monotonic()
+        while True:
+            self._event.clear()
+            remaining = self.max_delay - (time.monotonic() - first_change)
+            if remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(self._event.wait(), min(self.debounce, remaining))
+            except asyncio.TimeoutError:
+                break
+        self._event.clear()
+        changed = self._changed
+        self._changed = set()
+        return changed
+
+    def _closeInotify(self) -> None:
+        if self._fd < 0:
+            return
+        asyncio.get_running_loop().remove_reader(self._fd)
+        os.close(self._fd)
+        self._fd = -1
+        self._dirs.clear()
+        self._wds.clear()
+
+    def close(self) -> None:
+        self._closeInotify()
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+            self._poll_task = None
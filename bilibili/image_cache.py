@@ -0,0 +1,147 @@
+import os
+import json
+import asyncio
+import hashlib
+from typing import Dict, Tuple
+
+from .agent import BilibiliAgent
+
+class ImageUploadCache:
+    def __init__(self, cache_path: str = None, max_concurrency: int = 4) -> None:
+        """按文件内容寻址的图片上传缓存
+
+        以文件内容的SHA-256为键记录上传后返回的图片地址；文件大小和修改时间未变化时直接复用上次的哈希值，无需重新读取文件
+
+        Args:
+            cache_path (str): 磁盘缓存文件路径，为空时仅在内存中缓存
+            max_concurrency (int): 同时进行的最大上传数量
+        """
+        self.cache_path = None
+        self._locations: Dict[str, str] = {}
+        self._files: Dict[str, Tuple[int, int, str]] = {}
+        self._pending: Dict[str, asyncio.Future] = {}
+        self.max_concurrency = max_concurrency
+        # 信号量绑定在创建时的事件循环上，首次上传时在当前循环中创建
+        self._semaphore: asyncio.Semaphore = None
+        self._loop: asyncio.AbstractEventLoop = None
+        self._dirty = False
+        self.configure(cache_path)
+
+    def configure(self, cache_path: str = None) -> None:
+        """更新磁盘缓存路径，路径变化时会重新载入
+
+        Args:
+            cache_path (str): 磁盘缓存文件路径，为空时不修改
+        """
+        if cache_path and cache_path != self.cache_path:
+            self.cache_path = cache_path
+            self._load()
+
+    def _load(self) -> None:
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                json_data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f'图片缓存 {self.cache_path} 读取失败，将重新建立缓存: {e}')
+            return
+        self._locations.update(json_data.get('locations', {}))
+        self._files.update({path: tuple(stat) for path, stat in json_data.get('files', {}).items()})
+
+    def save(self) -> None:
+        """将缓存写入磁盘缓存文件（如有）
+        """
+        if not self.cache_path or not self._dirty:
+            return
+        tmp_path = self.cache_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'locations': self._locations, 'files': self._files}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.cache_path)
+        self._dirty = False
+
+    @staticmethod
+    def _hashFile(path: str) -> str:
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 16), b''):
+                sha.update(chunk)
+        return sha.hexdigest()
+
+    async def _digest(self, img_path: str) -> str:
+        path = os.path.abspath(img_path)
+        stat = os.stat(path)
+        cached = self._files.get(path)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+        # 大图片的哈希计算放到线程池中，避免阻塞事件循环
+        digest = await asyncio.get_running_loop().run_in_executor(None, ImageUploadCache._hashFile, path)
+        self._files[path] = (stat.st_size, stat.st_mtime_ns, digest)
+        self._dirty = True
+        return digest
+
+    def _getSemaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._semaphore
+
+    async def _upload(self, img_path: str, agent: BilibiliAgent) -> str:
+        async with self._getSemaphore():
+            # aiohttp发送完毕后会关闭文件，因此每次重试都重新打开文件
+            handles = []
+            def form() -> dict:
+                f = open(img_path, 'rb')
+                handles.append(f)
+                return {
+                    "file": f,
+                    "csrf": agent.csrf
+                }
+            try:
+                result = await agent.post('https://api.bilibili.com/x/note/image/upload', data=form)
+            finally:
+                for f in handles:
+                    f.close()
+        return result["location"]
+
+    async def upload(self, img_path: str, agent: BilibiliAgent) -> Tuple[bool, str]:
+        """上传图片，内容相同的图片只会上传一次
+
+        Args:
+            img_path (str): 本地图片路径
+            agent (BilibiliAgent): 用于上传的账号
+
+        Returns:
+            Tuple[bool, str]: 是否成功，以及图片地址
+        """
+        if not os.path.exists(img_path):
+            print(f'图片{img_path}未找到')
+            return False, None
+        digest = await self._digest(img_path)
+        location = self._locations.get(digest)
+        if location:
+            return True, location
+        pending = self._pending.get(digest)
+        if pending is not None:
+            return True, await asyncio.shield(pending)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[digest] = future
+        try:
+            location = await self._upload(img_path, agent)
+            self._locations[digest] = location
+            self._dirty = True
+            future.set_result(location)
+            return True, location
+        except Exception as e:
+            future.set_exception(e)
+            # 避免无人等待时出现未获取异常的警告
+            future.exception()
+            raise
+        finally:
+            if not future.done():
+                future.cancel()
+            del self._pending[digest]
+
+# 整个进程共享的图片上传缓存
+image_upload_cache = ImageUploadCache()
@@ -0,0 +1,99 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+
+from .timeline import TimelineItem
+from .note_object import NoteObject
+from .pub_timeline_config import PubTimelineConfig
+
+class LineCache:
+    def __init__(self, max_size: int = 4096) -> None:
+        """已渲染轴条目的LRU缓存
+
+        以条目文本和相关的样式配置为键，缓存渲染得到的(笔记内容, 摘要)。
+        引用了本地图片的条目会同时记录图片的大小和修改时间，图片变化后缓存失效；
+        含有BV号标题的条目记录标题缓存最早的过期时间，到期后缓存失效，重新获取标题
+
+        Args:
+            max_size (int): 最大缓存条目数
+        """
+        self.max_size = max_size
+        self._cache: 'OrderedDict[tuple, Tuple[NoteObject, str, tuple, Optional[float]]]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, max_size: int = None) -> None:
+        if max_size is not None:
+            self.max_size = max_size
+            self._evict()
+
+    @staticmethod
+    def getKey(item: TimelineItem, config: PubTimelineConfig) -> tuple:
+        if item.tag.startswith('##'):
+            return (item.tag, config.sub_title_prefix, config.sub_title_postfix)
+        return (item.tag,)
+
+    @staticmethod
+    def _statImages(image_paths: Iterable[str]) -> tuple:
+        stats = []
+        for path in image_paths:
+            try:
+                stat = os.stat(path)
+                stats.append((path, stat.st_size, stat.st_mtime_ns))
+            except OSError:
+                stats.append((path, None, None))
+        return tuple(stats)
+
+    def get(self, item: TimelineItem, config: PubTimelineConfig) -> Optional[Tuple[NoteObject, str]]:
+        """查询缓存
+
+        Args:
+            item (TimelineItem): 时间轴条目
+            config (PubTimelineConfig): 配置信息
+
+        Returns:
+            Optional[Tuple[NoteObject, str]]: 缓存内容的副本，未命中时返回None
+        """
+        key = LineCache.getKey(item, config)
+        entry = self._cache.get(key)
+        if entry is not None:
+            note_obj, abstract, image_stats, expire_at = entry
+            if (expire_at is None or expire_at > time.time()) and (not image_stats or LineCache._statImages(path for path, _, _ in image_stats) == image_stats):
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return note_obj.copy(), abstract
+            del self._cache[key]
+        self.misses += 1
+        return None
+
+    def put(self, item: TimelineItem, config: PubTimelineConfig, note_obj: Tuple[NoteObject, str], image_paths: Iterable[str] = (), expire_at: float = None) -> None:
+        """写入缓存
+
+        Args:
+            item (TimelineItem): 时间轴条目
+            config (PubTimelineConfig): 配置信息
+            note_obj (Tuple[NoteObject, str]): 渲染得到的笔记内容与摘要
+            image_paths (Iterable[str]): 条目引用的本地图片路径
+            expire_at (float): 缓存的过期时间戳，为空时不过期
+        """
+        key = LineCache.getKey(item, config)
+        obj, abstract = note_obj
+        self._cache[key] = (obj.copy(), abstract, LineCache._statImages(image_paths), expire_at)
+        self._cache.move_to_end(key)
+        self._evict()
+
+    def _evict(self) -> None:
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+
+    def resetStats(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+    def hitRate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+# 整个进程共享的轴条目缓存
+line_cache = LineCache()
@@ -1,25 +1,91 @@
-from typing import Tuple, List
+from typing import Iterator, Tuple, List
 
 class NoteObject:
     def __init__(self, obj: List[dict] = None, length: int = 0) -> None:
-        self.obj = obj if obj else []
+        """笔记内容构建器
+
+        内容按块存储：拼接其他笔记时只引用对方的块，直到读取obj时才展平为一个列表。
+        被引用的块不会再被修改，因此拼接后双方仍可独立地继续追加内容
+
+        Args:
+            obj (List[dict]): 初始内容
+            length (int): 初始内容的字数
+        """
+        self._chunks: List[List[dict]] = []
+        # 当前可以直接追加的块，None表示下一次追加前需要新建块
+        self._tail: List[dict] = None
+        if obj:
+            self._tail = list(obj)
+            self._chunks.append(self._tail)
         self.length = length
 
+    @property
+    def obj(self) -> List[dict]:
+        """展平后的内容列表
+
+        返回新的列表，内容块可能与其他笔记共享，修改返回值不会影响笔记内容
+        """
+        if len(self._chunks) > 1:
+            flat = [op for chunk in self._chunks for op in chunk]
+            self._chunks = [flat]
+            self._tail = flat
+        return self._chunks[0].copy() if self._chunks else []
+
+    def __iter__(self) -> Iterator[dict]:
+        for chunk in self._chunks:
+            yield from chunk
+
+    def __len__(self) -> int:
+        return sum(len(chunk) for chunk in self._chunks)
+
+    def _seal(self) -> None:
+        self._tail = None
+
+    def copy(self) -> 'NoteObject':
+        """生成共享已有内容块的副本，对副本的追加不会影响原对象
+
+        Returns:
+            NoteObject: 副本
+        """
+        self._seal()
+        new_obj = NoteObject(length=self.length)
+        new_obj._chunks = self._chunks.copy()
+        return new_obj
+
+    def extend(self, other: 'NoteObject') -> None:
+        """将另一个笔记的内容原地追加到末尾
+
+        Args:
+            other (NoteObject): 追加的内容
+        """
+        if not other._chunks:
+            return
+        self._seal()
+        other._seal()
+        self._chunks.extend(other._chunks)
+        self.length += other.length
+
+    def __iadd__(self, other: 'NoteObject') -> 'NoteObject':
+        self.extend(other)
+        return self
+
     def __add__(self, other: 'NoteObject') -> 'NoteObject':
-        new_obj = self.obj.copy()
-        new_obj.extend(other.obj)
-        return NoteObject(new_obj, self.length + other.length)
+        new_obj = self.copy()
+        new_obj.extend(other)
+        return new_obj
 
     def append(self, obj: dict, len: int) -> None:
-        self.obj.append(obj)
+        if self._tail is None:
+            self._tail = []
+            self._chunks.append(self._tail)
+        self._tail.append(obj)
         self.length += len
 
     def appendNewLine(self, align: str = None) -> None:
         if not align:
-            self.obj.append({ "insert": "\n" })
+            self.append({ "insert": "\n" }, 1)
         else:
-            self.obj.append({
+            self.append({
                 "attributes": { 'align': align },
                 "insert": "\n"
-            })
-        self.length += 1
+            }, 1)
@@ -0,0 +1,85 @@
+import json
+from urllib.parse import quote_plus
+from typing import Iterator
+
+from .note_object import NoteObject
+
+try:
+    # 可选的高速JSON后端
+    import orjson
+except ImportError:
+    orjson = None
+
+FORM_CONTENT_TYPE = 'application/x-www-form-urlencoded'
+# 每个JSON片段包含的操作数量，片段越大编码越快，但占用的临时内存越多
+OPS_PER_CHUNK = 256
+
+def dumpOp(op: dict) -> bytes:
+    """将单个笔记操作序列化为紧凑的UTF-8 JSON
+
+    Args:
+        op (dict): 笔记操作
+
+    Returns:
+        bytes: 序列化结果
+    """
+    if orjson is not None:
+        return orjson.dumps(op)
+    return json.dumps(op, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def iterNoteJson(note: NoteObject) -> Iterator[bytes]:
+    """分片生成笔记内容的JSON数组，不会构造完整的JSON字符串
+
+    Args:
+        note (NoteObject): 笔记内容
+
+    Yields:
+        bytes: JSON片段
+    """
+    chunk = [b'[']
+    first = True
+    for op in note:
+        if not first:
+            chunk.append(b',')
+        first = False
+        chunk.append(dumpOp(op))
+        if len(chunk) >= OPS_PER_CHUNK * 2:
+            yield b''.join(chunk)
+            chunk = []
+    chunk.append(b']')
+    yield b''.join(chunk)
+
+def iterFormBody(data: dict) -> Iterator[bytes]:
+    """生成表单编码的请求体片段，其中NoteObject类型的值会以JSON数组的形式流式编码
+
+    Args:
+        data (dict): 表单字段
+
+    Yields:
+        bytes: 请求体片段
+    """
+    first = True
+    for key, value in data.items():
+        if not first:
+            yield b'&'
+        first = False
+        yield quote_plus(str(key)).encode('ascii') + b'='
+        if isinstance(value, NoteObject):
+            for chunk in iterNoteJson(value):
+                yield quote_plus(chunk).encode('ascii')
+        else:
+            yield quote_plus(str(value)).encode('ascii')
+
+def encodeFormBody(data: dict) -> bytearray:
+    """将表单字段直接写入请求体缓冲区
+
+    Args:
+        data (dict): 表单字段，NoteObject类型的值会被编码为JSON
+
+    Returns:
+        bytearray: 表单编码的请求体
+    """
+    body = bytearray()
+    for chunk in iterFormBody(data):
+        body += chunk
+    return body
@@ -0,0 +1,168 @@
+import os
+import json
+import difflib
+import hashlib
+from typing import Dict, List, Optional
+
+from .note_object import NoteObject
+
+# 每次渲染都会变化的字段（时间戳生成的key和图片id），计算哈希时忽略
+VOLATILE_KEYS = ('key', 'id')
+
+def normalizeOp(op: dict) -> dict:
+    insert = op.get('insert')
+    if not isinstance(insert, dict):
+        return op
+    normalized = {}
+    for name, value in insert.items():
+        if isinstance(value, dict):
+            value = {k: v for k, v in value.items() if k not in VOLATILE_KEYS}
+        normalized[name] = value
+    new_op = dict(op)
+    new_op['insert'] = normalized
+    return new_op
+
+def _canonicalJson(value) -> bytes:
+    # 与所用的JSON库无关的规范编码，保证不同环境下的哈希一致
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'), sort_keys=True).encode('utf-8')
+
+def hashLine(line: str) -> str:
+    """计算单个轴条目的短哈希，状态文件中只保存该值而不保存条目内容
+
+    Args:
+        line (str): 轴条目
+
+    Returns:
+        str: 十六进制哈希值
+    """
+    return hashlib.blake2b(line.encode('utf-8'), digest_size=6).hexdigest()
+
+def hashNote(note: NoteObject, fields: dict) -> str:
+    """计算笔记内容和提交字段的哈希，忽略每次渲染都会变化的字段
+
+    Args:
+        note (NoteObject): 笔记内容
+        fields (dict): 标题、摘要等其他提交字段
+
+    Returns:
+        str: 十六进制哈希值
+    """
+    sha = hashlib.sha256()
+    sha.update(_canonicalJson(fields))
+    for op in note:
+        sha.update(b'\n')
+        sha.update(_canonicalJson(normalizeOp(op)))
+    return sha.hexdigest()
+
+class NoteStateStore:
+    def __init__(self, state_path: str = None) -> None:
+        """记录每篇笔记上次提交的内容摘要以及各账号下视频对应的笔记ID，可选地持久化到磁盘
+
+        每个配置（任务）使用各自的实例，互不共享
+
+        Args:
+            state_path (str): 状态文件路径，为空时仅在内存中记录
+        """
+        self.state_path = state_path or None
+        self._notes: Dict[str, dict] = {}
+        self._archives: Dict[str, str] = {}
+        if self.state_path:
+            self._load()
+
+    @staticmethod
+    def _getArchiveKey(account: str, aid) -> str:
+        # 同一视频在不同账号下是不同的笔记
+        return f'{account}:{aid}'
+
+    def _load(self) -> None:
+        if not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                json_data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f'笔记状态文件 {self.state_path} 读取失败，将重新记录: {e}')
+            return
+        self._notes.update(json_data.get('notes', {}))
+        # 旧版本只按aid记录，无法区分账号，不再使用
+        self._archives.update({key: note_id for key, note_id in json_data.get('archives', {}).items() if ':' in key})
+
+    def save(self) -> None:
+        """将状态写入状态文件（如有）
+        """
+        if not self.state_path:
+            return
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'notes': self._notes, 'archives': self._archives}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.state_path)
+
+    def getNoteId(self, account: str, aid) -> Optional[str]:
+        return self._archives.get(NoteStateStore._getArchiveKey(account, aid))
+
+    def setNoteId(self, account: str, aid, note_id) -> None:
+        self._archives[NoteStateStore._getArchiveKey(account, aid)] = note_id
+        self.save()
+
+    def forgetNoteId(self, account: str, aid) -> None:
+        if self._archives.pop(NoteStateStore._getArchiveKey(account, aid), None) is not None:
+            self.save()
+
+    def getNote(self, note_id) -> Optional[dict]:
+        return self._notes.get(str(note_id))
+
+    def setNote(self, note_id, content_hash: str, lines: List[str], parts: List[str]) -> None:
+        self._notes[str(note_id)] = {
+            'hash': content_hash,
+            'lineHashes': [hashLine(line) for line in lines],
+            'parts': parts
+        }
+        self.save()
+
+    @staticmethod
+    def _getLineHashes(previous: dict) -> List[str]:
+        if 'lineHashes' in previous:
+            return previous['lineHashes']
+        # 旧版本的状态文件保存的是完整的轴条目
+        return [hashLine(line) for line in previous.get('lines', [])]
+
+    @staticmethod
+    def diffSummary(previous: dict, lines: List[str], parts: List[str]) -> str:
+        """生成与上次提交相比的结构差异摘要。上次提交只保存了各行的哈希，只能列出本次新增或修改后的条目
+
+        Args:
+            previous (dict): 上次提交的状态
+            lines (List[str]): 本次的轴条目
+            parts (List[str]): 本次的分P标题
+
+        Returns:
+            str: 差异摘要
+        """
+        summary = []
+        added = removed = changed = 0
+        samples = []
+        matcher = difflib.SequenceMatcher(None, NoteStateStore._getLineHashes(previous), [hashLine(line) for line in lines], autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == 'equal':
+                continue
+            if tag == 'insert':
+                added += j2 - j1
+            elif tag == 'delete':
+                removed += i2 - i1
+            else:
+                changed += max(i2 - i1, j2 - j1)
+            samples.extend(f'  + {line}' for line in lines[j1:j2])
+        if added or removed or changed:
+            summary.append(f'轴条目: 新增 {added} 行，删除 {removed} 行，修改 {changed} 行')
+            summary.extend(samples[:10])
+            if len(samples) > 10:
+                summary.append(f'  ... 另有 {len(samples) - 10} 处变化')
+        new_parts = [part for part in parts if part not in previous['parts']]
+        missing_parts = [part for part in previous['parts'] if part not in parts]
+        if new_parts:
+            summary.append('新增分P: ' + ' / '.join(new_parts))
+        if missing_parts:
+            summary.append('移除分P: ' + ' / '.join(missing_parts))
+        if not summary:
+            summary.append('轴条目与分P均无结构变化')
+        return '\n'.join(summary)
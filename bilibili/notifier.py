@@ -0,0 +1,215 @@
+import abc
+import time
+import random
+import asyncio
+import aiohttp
+from typing import List, Tuple
+
+PUSHPLUS_URL = 'http://www.pushplus.plus/send'
+
+class NotificationSink(abc.ABC):
+    """推送渠道的基类
+    """
+    name = 'sink'
+
+    @abc.abstractmethod
+    async def send(self, session: aiohttp.ClientSession, title: str, content: str) -> None:
+        """发送一条推送，失败时抛出异常
+
+        Args:
+            session (aiohttp.ClientSession): 共享的连接
+            title (str): 标题
+            content (str): 内容
+        """
+
+class PushPlusSink(NotificationSink):
+    name = 'pushplus'
+
+    def __init__(self, token: str, url: str = PUSHPLUS_URL) -> None:
+        """pushplus推送 (https://www.pushplus.plus/)
+
+        Args:
+            token (str): pushplus的token
+            url (str): 推送接口地址
+        """
+        self.token = token
+        self.url = url
+
+    async def send(self, session: aiohttp.ClientSession, title: str, content: str) -> None:
+        data = {'token': self.token, 'title': title, 'content': content}
+        async with session.post(self.url, data=data) as res:
+            res.raise_for_status()
+            res_json = await res.json(content_type=None)
+        if res_json.get('code') != 200:
+            raise Exception(f'pushplus返回错误: {res_json}')
+
+class WebhookSink(NotificationSink):
+    name = 'webhook'
+
+    def __init__(self, url: str, headers: dict = None) -> None:
+        """以json格式POST到任意地址，请求体为 {"title": ..., "content": ...}
+
+        Args:
+            url (str): 推送地址
+            headers (dict): 额外的请求头
+        """
+        self.url = url
+        self.headers = headers if headers else {}
+
+    async def send(self, session: aiohttp.ClientSession, title: str, content: str) -> None:
+        async with session.post(self.url, json={'title': title, 'content': content}, headers=self.headers) as res:
+            res.raise_for_status()
+
+class FileSink(NotificationSink):
+    name = 'file'
+
+    def __init__(self, path: str) -> None:
+        """追加写入本地文件
+
+        Args:
+            path (str): 文件路径
+        """
+        self.path = path
+
+    def _write(self, title: str, content: str) -> None:
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(f'[{time.strftime("%Y-%m-%d %H:%M:%S")}] {title}\n{content}\n\n')
+
+    async def send(self, session: aiohttp.ClientSession, title: str, content: str) -> None:
+        await asyncio.get_running_loop().run_in_executor(None, self._write, title, content)
+
+def createSinks(json_data: dict) -> List[NotificationSink]:
+    """根据配置创建推送渠道
+
+    Args:
+        json_data (dict): 配置文件中的notify项，可包含pushplus、pushplusUrl、webhook、webhookHeaders、file
+
+    Returns:
+        List[NotificationSink]: 推送渠道
+    """
+    sinks = []
+    if not json_data:
+        return sinks
+    if json_data.get('pushplus'):
+        sinks.append(PushPlusSink(json_data['pushplus'], json_data.get('pushplusUrl', PUSHPLUS_URL)))
+    if json_data.get('webhook'):
+        sinks.append(WebhookSink(json_data['webhook'], json_data.get('webhookHeaders')))
+    if json_data.get('file'):
+        sinks.append(FileSink(json_data['file']))
+    return sinks
+
+class Notifier:
+    def __init__(
+            self, sinks: List[NotificationSink],
+            max_queue: int = 100, batch_window: float = 5.0, max_batch: int = 10,
+            max_retries: int = 3, backoff_base: float = 2.0, timeout: float = 10
+        ) -> None:
+        """异步推送通知
+
+        通知先进入有界队列，由后台任务合并后发送到各个渠道，调用方不会被慢速的推送接口阻塞
+
+        Args:
+            sinks (List[NotificationSink]): 推送渠道
+            max_queue (int): 队列长度上限，队列满时丢弃最早的通知
+            batch_window (float): 收到通知后等待更多通知以合并发送的时间，单位为秒
+            max_batch (int): 单次合并的最大通知数
+            max_retries (int): 每个渠道的最大重试次数
+            backoff_base (float): 首次重试前的等待时间，之后每次翻倍，单位为秒
+            timeout (float): 单次推送的超时时间，单位为秒
+        """
+        self.sinks = sinks
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.timeout = timeout
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self._queue: asyncio.Queue = asyncio.Queue(max_queue)
+        self._session: aiohttp.ClientSession = None
+        self._task: asyncio.Task = None
+
+    def notify(self, title: str, content: str) -> None:
+        """提交一条通知，立即返回
+
+        Args:
+            title (str): 标题
+            content (str): 内容
+        """
+        if not self.sinks:
+            return
+        if self._task is None:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+            self._task = asyncio.ensure_future(self._drain())
+        if self._queue.full():
+            self._queue.get_nowait()
+            self._queue.task_done()
+            self.dropped += 1
+            print('推送队列已满，丢弃最早的一条通知')
+        self._queue.put_nowait((title, content))
+
+    @staticmethod
+    def _merge(batch: List[Tuple[str, str]]) -> Tuple[str, str]:
+        title = batch[0][0]
+        if len(batch) > 1:
+            title = f'{title} 等{len(batch)}条通知'
+        content = '\n'.join(content for _, content in batch)
+        return title, content
+
+    async def _sendTo(self, sink: NotificationSink, title: str, content: str) -> None:
+        attempt = 0
+        while True:
+            try:
+                await sink.send(self._session, title, content)
+                return
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    self.failed += 1
+                    print(f'推送失败（{sink.name}），已重试 {attempt} 次，错误原因: {e}')
+                    return
+                delay = self.backoff_base * (2 ** attempt) * random.uniform(0.5, 1.5)
+                print(f'推送失败（{sink.name}），{delay:.1f} 秒后重试: {e}')
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    async def _drain(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.monotonic() + self.batch_window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            title, content = Notifier._merge(batch)
+            try:
+                await asyncio.gather(*[self._sendTo(sink, title, content) for sink in self.sinks])
+                self.sent += len(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def close(self, timeout: float = 30) -> None:
+        """等待队列中的通知发送完毕（最多timeout秒）后关闭
+
+        Args:
+            timeout (float): 最长等待时间，单位为秒
+        """
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f'仍有 {self._queue.qsize()} 条通知未发送')
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self._session.close()
+        self._session = None
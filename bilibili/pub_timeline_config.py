@@ -53,3 +53,13 @@ class PubTimelineConfig:
 
         # 发布选项
         self.auto_comment: bool = json_data['autoComment'] if 'autoComment' in json_data else True
+
+        # 性能选项
+        self.convert_concurrency: int = json_data['convertConcurrency'] if 'convertConcurrency' in json_data else 8
+        self.line_cache_size: int = json_data['lineCacheSize'] if 'lineCacheSize' in json_data else 4096
+
+        # 缓存选项
+        self.bv_title_cache: str = json_data['bvTitleCache'] if 'bvTitleCache' in json_data else ''
+        self.bv_title_ttl: int = json_data['bvTitleTTL'] if 'bvTitleTTL' in json_data else 86400
+        self.image_cache: str = json_data['imageCache'] if 'imageCache' in json_data else ''
+        self.note_state: str = json_data['noteState'] if 'noteState' in json_data else ''
@@ -0,0 +1,165 @@
+import os
+import json
+import time
+import asyncio
+from typing import Dict, Tuple
+
+from .agent import AgentPool
+from .publish_task import PublishTask
+
+# 任务异常退出后重启前的等待时间（秒），连续失败时加倍，直到上限
+RESTART_BACKOFF_BASE = 10
+RESTART_BACKOFF_MAX = 600
+
+class PublishDaemon:
+    def __init__(self, config_dir: str, global_rate: float = None, scan_interval: float = 5.0, status_path: str = None) -> None:
+        """同时监控多个视频的笔记发布守护进程
+
+        目录中每个json配置文件对应一个监控任务，相同cookie的任务共享同一个账号连接；
+        配置文件新增或删除时自动启动或停止对应任务
+
+        Args:
+            config_dir (str): 配置文件所在目录
+            global_rate (float): 所有任务合计每秒允许的请求数，为空时不限制
+            scan_interval (float): 扫描配置目录的间隔，单位为秒
+            status_path (str): 状态文件路径，为空时使用配置目录下的 .status.json
+        """
+        self.config_dir = config_dir
+        self.scan_interval = scan_interval
+        self.status_path = status_path if status_path else os.path.join(config_dir, '.status.json')
+        self.agent_pool = AgentPool(global_rate)
+        self.tasks: Dict[str, PublishTask] = {}
+        self._runners: Dict[str, asyncio.Task] = {}
+        self._errors: Dict[str, Tuple[int, str]] = {}
+        self._start_time = time.time()
+
+    def _scan(self) -> Dict[str, int]:
+        configs = {}
+        for entry in os.scandir(self.config_dir):
+            if entry.name.startswith('.') or not entry.name.endswith('.json') or not entry.is_file():
+                continue
+            path = os.path.abspath(entry.path)
+            if path == os.path.abspath(self.status_path):
+                continue
+            configs[path] = entry.stat().st_mtime_ns
+        return configs
+
+    async def _runTask(self, path: str, task: PublishTask) -> None:
+        failures = 0
+        try:
+            while True:
+                start_time = time.monotonic()
+                try:
+                    await task.run()
+                    return
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    # 稳定运行一段时间后再失败时，重新从最短的等待时间开始
+                    if time.monotonic() - start_time > RESTART_BACKOFF_MAX:
+                        failures = 0
+                    delay = min(RESTART_BACKOFF_MAX, RESTART_BACKOFF_BASE * (2 ** failures))
+                    failures += 1
+                    print(f'[{task.name}] 任务异常退出，{delay} 秒后重启: {e}')
+                    task.state = 'error'
+                    task.last_error = str(e)
+                    task.restarts += 1
+                    # 归还账号，重启时按最新的配置重新载入
+                    await task.close()
+                    await asyncio.sleep(delay)
+        finally:
+            await task.close()
+
+    async def addTask(self, path: str, mtime: int = 0) -> None:
+        """载入配置文件并启动对应的监控任务
+
+        Args:
+            path (str): 配置文件路径
+            mtime (int): 配置文件的修改时间，载入失败时用于判断文件是否已被修正
+        """
+        task = PublishTask(path, self.agent_pool, confirm=False)
+        try:
+            await task.load()
+        except Exception as e:
+            print(f'配置文件 {path} 载入失败，文件更新后将重试，错误原因如下：')
+            print(e)
+            self._errors[path] = (mtime, str(e))
+            await task.close()
+            return
+        self._errors.pop(path, None)
+        print(f'[{task.name}] 已添加任务: {path}')
+        self.tasks[path] = task
+        self._runners[path] = asyncio.ensure_future(self._runTask(path, task))
+
+    async def removeTask(self, path: str) -> None:
+        """停止并移除监控任务
+
+        Args:
+            path (str): 配置文件路径
+        """
+        self._errors.pop(path, None)
+        task = self.tasks.pop(path, None)
+        runner = self._runners.pop(path, None)
+        if runner is not None:
+            runner.cancel()
+            try:
+                await runner
+            except asyncio.CancelledError:
+                pass
+        if task is not None:
+            print(f'[{task.name}] 已移除任务: {path}')
+
+    async def sync(self) -> None:
+        """扫描配置目录，启动新增的配置并停止已删除的配置
+        """
+        configs = self._scan()
+        for path in list(self.tasks.keys()):
+            if path not in configs:
+                await self.removeTask(path)
+        for path in list(self._errors.keys()):
+            if path not in configs:
+                del self._errors[path]
+        for path, mtime in configs.items():
+            if path in self.tasks:
+                continue
+            if path in self._errors and self._errors[path][0] == mtime:
+                continue
+            await self.addTask(path, mtime)
+
+    def getStatus(self) -> dict:
+        """获取守护进程和所有任务的运行状态
+
+        Returns:
+            dict: 可直接序列化为json的状态信息
+        """
+        return {
+            "startTime": self._start_time,
+            "updateTime": time.time(),
+            "agents": len(self.agent_pool),
+            "tasks": [task.getStatus() for task in self.tasks.values()],
+            "errors": [{"config": path, "lastError": error} for path, (_, error) in self._errors.items()]
+        }
+
+    def saveStatus(self) -> None:
+        """将运行状态写入状态文件
+        """
+        tmp_path = self.status_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.getStatus(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.status_path)
+
+    async def run(self) -> None:
+        """持续运行，直到被取消
+        """
+        try:
+            while True:
+                try:
+                    await self.sync()
+                    self.saveStatus()
+                except OSError as e:
+                    print(f'扫描配置目录失败: {e}')
+                await asyncio.sleep(self.scan_interval)
+        finally:
+            for path in list(self.tasks.keys()):
+                await self.removeTask(path)
+            await self.agent_pool.close()
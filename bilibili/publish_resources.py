@@ -0,0 +1,44 @@
+from .pub_timeline_config import PubTimelineConfig
+from .title_resolver import BvTitleResolver, bv_title_resolver
+from .image_cache import ImageUploadCache, image_upload_cache
+from .line_cache import LineCache, line_cache
+
+class PublishResources:
+    def __init__(self, title_resolver: BvTitleResolver = None, image_cache: ImageUploadCache = None, line_cache: LineCache = None) -> None:
+        """发布笔记时使用的缓存：BV号标题、图片上传、已渲染的轴条目
+
+        守护进程中每个任务使用各自的实例，缓存路径、有效期和命中率统计互不影响
+
+        Args:
+            title_resolver (BvTitleResolver): BV号标题解析器，为空时新建
+            image_cache (ImageUploadCache): 图片上传缓存，为空时新建
+            line_cache (LineCache): 轴条目缓存，为空时新建
+        """
+        self.title_resolver = title_resolver if title_resolver is not None else BvTitleResolver()
+        self.image_cache = image_cache if image_cache is not None else ImageUploadCache()
+        self.line_cache = line_cache if line_cache is not None else LineCache()
+
+    @staticmethod
+    def shared() -> 'PublishResources':
+        """使用整个进程共享的缓存，适用于只处理一个配置的场合
+
+        Returns:
+            PublishResources: 共享的缓存
+        """
+        return PublishResources(bv_title_resolver, image_upload_cache, line_cache)
+
+    def configure(self, config: PubTimelineConfig) -> None:
+        """按配置更新缓存路径、有效期和容量
+
+        Args:
+            config (PubTimelineConfig): 配置信息
+        """
+        self.title_resolver.configure(config.bv_title_ttl, config.bv_title_cache)
+        self.image_cache.configure(config.image_cache)
+        self.line_cache.configure(config.line_cache_size)
+
+    def save(self) -> None:
+        """将缓存写入各自的磁盘缓存文件（如有）
+        """
+        self.title_resolver.save()
+        self.image_cache.save()
@@ -0,0 +1,218 @@
+import os
+import json
+import time
+import asyncio
+from typing import List
+
+from .agent import BilibiliAgent, AgentPool
+from .bilibili_note_helper import BilibiliNoteHelper
+from .timeline_converter import TimelineConverter
+from .pub_timeline_config import PubTimelineConfig
+from .file_watcher import FileWatcher
+from .adaptive_interval import AdaptiveInterval
+from .note_state import NoteStateStore
+from .publish_resources import PublishResources
+
+def loadConfig(config_path: str) -> dict:
+    with open(config_path, 'r', encoding='utf8') as fp:
+        return json.load(fp)
+
+def loadTemplate(json_data: dict) -> List[str]:
+    with open(json_data['template'], "r", encoding="utf-8") as f:
+        return f.readlines()
+
+class PublishTask:
+    def __init__(self, config_path: str, agent_pool: AgentPool, confirm: bool = None) -> None:
+        """单个视频的笔记自动监控任务
+
+        Args:
+            config_path (str): 配置文件路径
+            agent_pool (AgentPool): 获取账号的代理池
+            confirm (bool): 首次发布前是否需要二次确认，为空时使用配置文件中的confirm项
+        """
+        self.config_path = config_path
+        self.agent_pool = agent_pool
+        self.confirm = confirm
+        self.json_data: dict = None
+        self.config: PubTimelineConfig = None
+        self.agent: BilibiliAgent = None
+        self.note_state: NoteStateStore = None
+        # 本任务独享的缓存，不受同一进程中其他任务的配置影响
+        self.resources = PublishResources()
+        self.template_lines: List[str] = []
+        self.published_parts: List[str] = []
+        self.known_parts: List[str] = []
+        self.watcher: FileWatcher = None
+        self.interval: AdaptiveInterval = None
+        # 运行状态与统计
+        self.state = 'created'
+        self.cycles = 0
+        self.updates = 0
+        self.failures = 0
+        self.failed_cnt = 0
+        self.restarts = 0
+        self.last_error = ''
+        self.last_cycle_time = 0.0
+        self.last_update_time = 0.0
+        self.last_duration = 0.0
+
+    @property
+    def name(self) -> str:
+        if self.config and self.config.bvid:
+            return self.config.bvid
+        return os.path.basename(self.config_path)
+
+    def _getWatchPaths(self) -> List[str]:
+        return [self.config_path, self.json_data['timeline'], self.json_data['template']]
+
+    def _configureInterval(self) -> None:
+        min_interval = self.json_data['pollMinInterval'] if 'pollMinInterval' in self.json_data else 60
+        max_interval = self.json_data['pollMaxInterval'] if 'pollMaxInterval' in self.json_data else 3600
+        if self.interval is None:
+            self.interval = AdaptiveInterval(min_interval, max_interval)
+        else:
+            self.interval.configure(min_interval, max_interval)
+
+    async def load(self) -> None:
+        """读取配置文件、模板，并从代理池获取账号
+        """
+        json_data = loadConfig(self.config_path)
+        config = PubTimelineConfig(json_data)
+        template_lines = loadTemplate(json_data)
+        if self.agent is None or json_data['cookie'] != self.json_data['cookie'] or json_data.get('network') != self.json_data.get('network'):
+            agent = self.agent_pool.acquire(json_data['cookie'], json_data.get('network'))
+            if self.agent is not None:
+                await self.agent_pool.release(self.agent)
+            self.agent = agent
+        if self.note_state is None or config.note_state != self.config.note_state:
+            self.note_state = NoteStateStore(config.note_state)
+        self.resources.configure(config)
+        self.json_data = json_data
+        self.config = config
+        self.template_lines = template_lines
+        self._configureInterval()
+        if self.watcher is not None:
+            self.watcher.setPaths(self._getWatchPaths())
+
+    async def publish(self, first_time: bool) -> None:
+        """执行一次检查，必要时更新笔记
+
+        Args:
+            first_time (bool): 是否为首次执行
+        """
+        self.cycles += 1
+        self.state = 'publishing'
+        start_time = time.monotonic()
+        print(f'[{self.name}] 正在开始第 {self.cycles} 次任务 ...')
+        try:
+            timeline = TimelineConverter.loadTimelineFromCSV(self.json_data['timeline'])
+            if first_time:
+                # 首次，正常地发布笔记
+                confirm = self.confirm if self.confirm is not None else (self.json_data['confirm'] if 'confirm' in self.json_data else True)
+                self.published_parts = await BilibiliNoteHelper.sendNote(timeline, self.template_lines, self.agent, self.config, confirmed=not confirm, note_state=self.note_state, resources=self.resources, skip_unchanged=True)
+                if self.published_parts:
+                    self.updates += 1
+                    self.last_update_time = time.time()
+            else:
+                # 后续循环，不进行确认，同时自动发布
+                new_published_parts = await BilibiliNoteHelper.sendNote(timeline, self.template_lines, self.agent, self.config, confirmed=True, previousPartCollection=self.published_parts, note_state=self.note_state, resources=self.resources, skip_unchanged=True)
+                if new_published_parts != self.published_parts:
+                    print(f'[{self.name}] 已自动更新笔记')
+                    self.published_parts = new_published_parts
+                    self.updates += 1
+                    self.last_update_time = time.time()
+                else:
+                    print(f'[{self.name}] 视频列表和轴文件均无变化')
+            # 分P发生变化时回到最短检查间隔，否则逐步延长
+            parts_changed = bool(self.published_parts) and self.published_parts != self.known_parts
+            if self.published_parts:
+                self.known_parts = self.published_parts
+            self.interval.update(parts_changed)
+            self.failed_cnt = 0
+            self.state = 'idle'
+        except Exception as e:
+            self.interval.backoff()
+            self.failed_cnt += 1
+            self.failures += 1
+            self.last_error = str(e)
+            self.state = 'error'
+            print(f'[{self.name}] 当前共计连续失败 {self.failed_cnt} 次，错误原因如下：')
+            print(e)
+        self.last_cycle_time = time.time()
+        self.last_duration = time.monotonic() - start_time
+
+    async def run(self) -> None:
+        """持续监控视频分P和文件变化，直到任务被取消
+        """
+        if self.json_data is None or self.agent is None:
+            await self.load()
+        self.watcher = FileWatcher(self._getWatchPaths())
+        print(f'[{self.name}] 文件监控模式: {self.watcher.mode}')
+        watch_task = None
+        first_time = True
+        try:
+            # 退出循环条件：必须手动退出循环或取消任务
+            while True:
+                await self.publish(first_time)
+                first_time = False
+
+                # 等待文件变化，或到达下一次检查视频分P的时间
+                if watch_task is None:
+                    watch_task = asyncio.ensure_future(self.watcher.wait())
+                print(f'[{self.name}] {self.interval.current:.0f} 秒后再次检查视频分P')
+                done, _ = await asyncio.wait({watch_task}, timeout=self.interval.current)
+                if watch_task not in done:
+                    continue
+                changed = watch_task.result()
+                watch_task = None
+                try:
+                    if os.path.abspath(self.config_path) in changed:
+                        print(f'[{self.name}] 检测到配置文件更新，重新载入配置')
+                        await self.load()
+                    elif os.path.abspath(self.json_data['template']) in changed:
+                        print(f'[{self.name}] 检测到模板更新')
+                        self.template_lines = loadTemplate(self.json_data)
+                    else:
+                        print(f'[{self.name}] 检测到轴更新')
+                except Exception as e:
+                    print(f'[{self.name}] 重新载入失败，将继续使用原有配置，错误原因如下：')
+                    print(e)
+                # 文件发生变化后强制进行发布
+                self.published_parts = []
+        finally:
+            if watch_task is not None:
+                watch_task.cancel()
+            self.state = 'stopped'
+
+    async def close(self) -> None:
+        """停止文件监控并归还账号
+        """
+        if self.watcher is not None:
+            self.watcher.close()
+            self.watcher = None
+        if self.agent is not None:
+            await self.agent_pool.release(self.agent)
+            self.agent = None
+
+    def getStatus(self) -> dict:
+        """获取任务的运行状态与统计信息
+
+        Returns:
+            dict: 可直接序列化为json的状态信息
+        """
+        return {
+            "config": self.config_path,
+            "bvid": self.config.bvid if self.config else None,
+            "state": self.state,
+            "cycles": self.cycles,
+            "updates": self.updates,
+            "failures": self.failures,
+            "consecutiveFailures": self.failed_cnt,
+            "restarts": self.restarts,
+            "lastError": self.last_error,
+            "lastCycleTime": self.last_cycle_time,
+            "lastUpdateTime": self.last_update_time,
+            "lastDuration": round(self.last_duration, 3),
+            "publishedParts": len(self.published_parts),
+            "currentPollInterval": self.interval.current if self.interval else None
+        }
@@ -0,0 +1,237 @@
+import os
+import json
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Iterable, List
+
+from .agent import BilibiliAgent
+
+class BoundedSet:
+    def __init__(self, max_size: int = 20000, items: Iterable = ()) -> None:
+        """容量有限的集合，超出容量时淘汰最早加入的元素
+
+        Args:
+            max_size (int): 最大元素数
+            items (Iterable): 初始元素，按加入顺序排列
+        """
+        self.max_size = max_size
+        self._set = set()
+        self._order = deque()
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item) -> bool:
+        return item in self._set
+
+    def __len__(self) -> int:
+        return len(self._set)
+
+    def __iter__(self):
+        return iter(self._order)
+
+    def add(self, item) -> bool:
+        """加入元素
+
+        Returns:
+            bool: 元素此前是否不在集合中
+        """
+        if item in self._set:
+            return False
+        self._set.add(item)
+        self._order.append(item)
+        while len(self._order) > self.max_size:
+            self._set.discard(self._order.popleft())
+        return True
+
+class _PollBatch:
+    def __init__(self, monitor: 'ReplyMonitor') -> None:
+        # 单次检查中读到的评论和楼中楼回复数，检查成功完成后才写入监控状态，
+        # 中途出错时这些评论会在下次检查时重新读到
+        self.monitor = monitor
+        self.new_replies: List[dict] = []
+        self.seen: Dict[int, None] = {}
+        self.rcounts: Dict[int, int] = {}
+
+    def add(self, reply: dict) -> None:
+        rpid = reply['rpid']
+        if rpid in self.monitor.seen or rpid in self.seen:
+            return
+        self.seen[rpid] = None
+        if reply.get('ctime', 0) >= self.monitor.seeded_at:
+            self.new_replies.append(reply)
+
+    def getRcount(self, rpid: int) -> int:
+        if rpid in self.rcounts:
+            return self.rcounts[rpid]
+        return self.monitor.rcounts.get(rpid, 0)
+
+class ReplyMonitor:
+    def __init__(self, aid: int, state_path: str = None, max_seen: int = 20000, max_pages: int = 10, sub_page_size: int = 20) -> None:
+        """增量监控视频评论区
+
+        按时间倒序逐页读取评论，直到遇到已读过的评论为止；楼中楼回复数增加时通过楼中楼接口补全预览之外的回复。
+        没有状态记录时，首次检查只读取第一页作为起点，此前发布的评论和楼中楼回复之后也不会被当作新评论。
+        已读评论和游标可以持久化，重启后不会重新扫描
+
+        Args:
+            aid (int): 视频的aid
+            state_path (str): 状态文件路径，为空时仅在内存中记录
+            max_seen (int): 记录的已读评论数上限
+            max_pages (int): 单次检查最多读取的页数
+            sub_page_size (int): 楼中楼接口每页的条数
+        """
+        self.aid = aid
+        self.state_path = state_path
+        self.max_pages = max_pages
+        self.sub_page_size = sub_page_size
+        self.newest_rpid = 0
+        self.seen = BoundedSet(max_seen)
+        self.rcounts: 'OrderedDict[int, int]' = OrderedDict()
+        self.requests = 0
+        self.initialized = False
+        # 首次检查的时间，早于此时间发布的评论只记为已读
+        self.seeded_at = 0
+        self._poll_cnt = 0
+        self._load()
+
+    def _load(self) -> None:
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                json_data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f'评论监控状态文件 {self.state_path} 读取失败，将重新记录: {e}')
+            return
+        if json_data.get('aid') != self.aid:
+            return
+        self.initialized = True
+        self.seeded_at = json_data.get('seeded', 0)
+        self.newest_rpid = json_data.get('newest', 0)
+        self.seen = BoundedSet(self.seen.max_size, json_data.get('seen', []))
+        self.rcounts = OrderedDict((int(rpid), rcount) for rpid, rcount in json_data.get('rcounts', []))
+
+    def save(self) -> None:
+        """将游标和已读评论写入状态文件（如有）
+        """
+        if not self.state_path:
+            return
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'aid': self.aid,
+                'seeded': self.seeded_at,
+                'newest': self.newest_rpid,
+                'seen': list(self.seen),
+                'rcounts': list(self.rcounts.items())
+            }, f)
+        os.replace(tmp_path, self.state_path)
+
+    def _setRcount(self, rpid: int, rcount: int) -> None:
+        self.rcounts[rpid] = rcount
+        self.rcounts.move_to_end(rpid)
+        while len(self.rcounts) > self.seen.max_size:
+            self.rcounts.popitem(last=False)
+
+    async def _getPage(self, agent: BilibiliAgent, mode: int, next_cursor: int = 0) -> dict:
+        self.requests += 1
+        return await agent.get(
+            "https://api.bilibili.com/x/v2/reply/main",
+            params={
+                "type": 1,
+                "oid": self.aid,
+                # 2是最新评论，3是热门评论
+                "mode": mode,
+                "next": next_cursor
+            })
+
+    async def _getSubReplies(self, agent: BilibiliAgent, root: dict, known: int) -> List[dict]:
+        # 楼中楼按时间正序排列，新回复在后面，从上次已知的位置附近开始读取
+        replies = []
+        pn = max(1, known // self.sub_page_size)
+        while True:
+            self.requests += 1
+            res = await agent.get(
+                "https://api.bilibili.com/x/v2/reply/reply",
+                params={
+                    "type": 1,
+                    "oid": self.aid,
+                    "root": root['rpid'],
+                    "pn": pn,
+                    "ps": self.sub_page_size
+                })
+            page = res.get('replies') or []
+            replies.extend(page)
+            if len(page) < self.sub_page_size or pn * self.sub_page_size >= res.get('page', {}).get('count', 0):
+                return replies
+            pn += 1
+
+    async def _collect(self, agent: BilibiliAgent, root: dict, batch: _PollBatch) -> None:
+        batch.add(root)
+        rcount = root.get('rcount', 0)
+        known = batch.getRcount(root['rpid'])
+        if rcount <= known:
+            return
+        preview = root.get('replies') or []
+        if rcount > len(preview):
+            sub_replies = await self._getSubReplies(agent, root, known)
+        else:
+            sub_replies = preview
+        for sub_reply in sub_replies:
+            batch.add(sub_reply)
+        batch.rcounts[root['rpid']] = rcount
+
+    async def _seed(self, agent: BilibiliAgent) -> None:
+        # 以最新评论的第一页为起点，记录已有的评论和楼中楼回复数，不请求楼中楼接口
+        self.seeded_at = int(time.time())
+        res = await self._getPage(agent, 2)
+        for root in res.get('replies') or []:
+            self.newest_rpid = max(self.newest_rpid, root['rpid'])
+            self.seen.add(root['rpid'])
+            for sub_reply in root.get('replies') or []:
+                self.seen.add(sub_reply['rpid'])
+            self._setRcount(root['rpid'], root.get('rcount', 0))
+        self.initialized = True
+        self.save()
+
+    async def poll(self, agent: BilibiliAgent) -> List[dict]:
+        """检查一次评论区
+
+        Args:
+            agent (BilibiliAgent): 用于查询的账号
+
+        Returns:
+            List[dict]: 新出现的评论和楼中楼回复（楼中楼回复的root字段不为0），首次检查时为空
+        """
+        if not self.initialized:
+            await self._seed(agent)
+            return []
+        batch = _PollBatch(self)
+        newest_rpid = self.newest_rpid
+        next_cursor = 0
+        # 按时间倒序翻页，直到遇到上次读到的位置
+        for _ in range(self.max_pages):
+            res = await self._getPage(agent, 2, next_cursor)
+            reached = False
+            for root in res.get('replies') or []:
+                newest_rpid = max(newest_rpid, root['rpid'])
+                if root['rpid'] <= self.newest_rpid or root['rpid'] in self.seen:
+                    reached = True
+                await self._collect(agent, root, batch)
+            cursor = res.get('cursor', {})
+            if reached or cursor.get('is_end', True) or not cursor.get('next'):
+                break
+            next_cursor = cursor['next']
+        # 旧评论下的新回复不会出现在最新评论的前几页，隔一次检查一次热门评论
+        if self._poll_cnt % 2 == 1:
+            res = await self._getPage(agent, 3)
+            for root in res.get('replies') or []:
+                await self._collect(agent, root, batch)
+        self._poll_cnt += 1
+        self.newest_rpid = newest_rpid
+        for rpid in batch.seen:
+            self.seen.add(rpid)
+        for rpid, rcount in batch.rcounts.items():
+            self._setRcount(rpid, rcount)
+        self.save()
+        return batch.new_replies
@@ -5,12 +5,20 @@ from .video import VideoPartInfo
 from .timeline_converter import TimelineConverter
 from .pub_timeline_config import PubTimelineConfig
 from .agent import BilibiliAgent
+from .tokenizer import TokenType
+from .publish_resources import PublishResources
 import time
+import asyncio
+import bisect
+
+# 转换耗时超过此值（秒）的条目会在日志中列出
+SLOW_ITEM_THRESHOLD = 0.5
 
 class RuntimeTimelineItem:
     def __init__(self, item: TimelineItem, note_obj: Tuple[NoteObject, str]) -> None:
         self.item = item
         self.note_obj, self.abstract = note_obj
+        self.convert_time = 0.0
         self.time_obj = []
         self.abstract_time_obj = {}
         self.part_names = []
@@ -99,8 +107,16 @@ class RuntimeTimelineItem:
         return note_object
 
 class RuntimeTimeline:
-    def __init__(self, items: List[RuntimeTimelineItem]) -> None:
+    def __init__(self, items: List[RuntimeTimelineItem], song_dance_positions: List[int] = None) -> None:
+        """运行时时间轴
+
+        Args:
+            items (List[RuntimeTimelineItem]): 按秒数排序的条目
+            song_dance_positions (List[int]): 歌舞条目的下标，为空时按内容筛选
+        """
         self.items = items
+        self.secs = [item.item.sec for item in items]
+        self.song_dance_positions = song_dance_positions
 
     def __iter__(self) -> Iterator[RuntimeTimelineItem]:
         return iter(self.items)
@@ -111,17 +127,77 @@ class RuntimeTimeline:
         Returns:
             Timeline: 仅含歌舞的时间轴
         """
-        sd_items = list(filter(lambda item: item.item.tag.startswith('🎤') or item.item.tag.startswith('💃'), self.items))
+        if self.song_dance_positions is not None:
+            sd_items = [self.items[i] for i in self.song_dance_positions]
+        else:
+            sd_items = list(filter(lambda item: item.item.tag.startswith('🎤') or item.item.tag.startswith('💃'), self.items))
         return RuntimeTimeline(sd_items)
 
     @staticmethod
-    async def getRuntimeTimeline(timeline: Timeline, config: PubTimelineConfig, agent: BilibiliAgent = None) -> 'RuntimeTimeline':
-        converted_items = []
-        for item in timeline:
-            note_obj = await TimelineConverter.getTimelineItemJson(item, config, agent)
-            converted_items.append(RuntimeTimelineItem(item, note_obj))
-        return RuntimeTimeline(converted_items)
+    async def getRuntimeTimeline(timeline: Timeline, config: PubTimelineConfig, agent: BilibiliAgent = None, resources: PublishResources = None) -> 'RuntimeTimeline':
+        """并发转换时间轴中的每个条目，输出保持原有顺序
+
+        未变化的条目直接取自缓存；纯文本条目直接同步渲染；含BV号或待上传图片的条目在并发上限内并行请求
+
+        Args:
+            timeline (Timeline): 参考时间轴
+            config (PubTimelineConfig): 配置信息
+            agent (BilibiliAgent): 用于网络请求的账号
+            resources (PublishResources): 使用的缓存，为空时使用进程共享的缓存
+
+        Returns:
+            RuntimeTimeline: 转换后的时间轴
+        """
+        resources = resources if resources is not None else PublishResources.shared()
+        line_cache = resources.line_cache
+        items = list(timeline)
+        converted_items: List[RuntimeTimelineItem] = [None] * len(items)
+        pending = []
+        line_cache.resetStats()
+        for i, item in enumerate(items):
+            start = time.perf_counter()
+            note_obj = line_cache.get(item, config)
+            if note_obj is None:
+                note_obj = TimelineConverter.getStaticTimelineItemJson(item, config)
+                if note_obj is None:
+                    pending.append((i, item))
+                    continue
+                line_cache.put(item, config, note_obj)
+            converted_items[i] = RuntimeTimelineItem(item, note_obj)
+            converted_items[i].convert_time = time.perf_counter() - start
+
+        if pending:
+            semaphore = asyncio.Semaphore(config.convert_concurrency)
+            async def convert(i: int, item: TimelineItem) -> None:
+                async with semaphore:
+                    start = time.perf_counter()
+                    note_obj = await TimelineConverter.getTimelineItemJson(item, config, agent, resources)
+                    converted_items[i] = RuntimeTimelineItem(item, note_obj)
+                    converted_items[i].convert_time = time.perf_counter() - start
+                tokens = TimelineConverter.getTimelineItemTokens(item, config)
+                image_paths = [token.extra_info for token in tokens if token.token_type == TokenType.IMAGE_UPLOAD]
+                # 含BV号的条目随标题缓存一同过期
+                expire_at = None
+                for token in tokens:
+                    if token.token_type == TokenType.BV_URL:
+                        title_expire_at = resources.title_resolver.getExpireAt(token.extra_info)
+                        if title_expire_at is None:
+                            return
+                        expire_at = title_expire_at if expire_at is None else min(expire_at, title_expire_at)
+                line_cache.put(item, config, note_obj, image_paths, expire_at)
+            await asyncio.gather(*(convert(i, item) for i, item in pending))
+
+        if items:
+            total_time = sum(item.convert_time for item in converted_items)
+            print(f'已转换 {len(items)} 条轴，缓存命中率 {line_cache.hitRate():.0%}，其中 {len(pending)} 条需要网络请求，累计耗时 {total_time:.2f} 秒')
+            slow_items = sorted((item for item in converted_items if item.convert_time >= SLOW_ITEM_THRESHOLD), key=lambda item: -item.convert_time)
+            for item in slow_items[:5]:
+                print(f'  {item.convert_time:.2f} 秒: {item.item}')
+        return RuntimeTimeline(converted_items, timeline.categoryPositions('songAndDance'))
 
     def registerPartInfo(self, info: VideoPartInfo, start_time: int, token_index: int, customTitle: str, hidePart: bool) -> None:
-        for item in self.items:
-            item.registerPartInfo(info, start_time, token_index, customTitle, hidePart)
\ No newline at end of file
+        # 只处理落在 [start_time, start_time + duration] 内的条目
+        lo = bisect.bisect_left(self.secs, start_time)
+        hi = bisect.bisect_right(self.secs, start_time + info.duration, lo)
+        for item in self.items[lo:hi]:
+            item.registerPartInfo(info, start_time, token_index, customTitle, hidePart)
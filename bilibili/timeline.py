@@ -1,5 +1,19 @@
+import sys
+import heapq
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import repeat
 from enum import Enum, unique
-from typing import Iterator, List
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Tuple
+
+class TimelineDiagnostic(NamedTuple):
+    path: str
+    line_no: int
+    line: str
+    message: str
+
+    def __str__(self) -> str:
+        return f"Please check (file: '{self.path}' line{self.line_no}:'{self.line}'): {self.message}, continue..."
 
 class TimelineItem:
     def __init__(self,
@@ -38,27 +52,176 @@ class TimelineItem:
             time = "%d:%02d:%02d" % (h, m, s)
         return time + ' ' + self.tag
 
+# 条目分类：歌舞（🎤/💃开头）、章节（##开头）、重点（*结尾）
+TIMELINE_CATEGORIES: Dict[str, Callable[[str], bool]] = {
+    'songAndDance': lambda tag: tag.startswith('🎤') or tag.startswith('💃'),
+    'section': lambda tag: tag.startswith('##'),
+    'starred': lambda tag: tag.endswith('*'),
+}
+
+class TimelineColumns:
+    def __init__(self) -> None:
+        """按列存储的时间轴条目，多个时间轴视图可以共享同一份存储
+
+        秒数按升序存放；条目内容和mask经过intern，重复的字符串只保存一份。
+        条目的key默认为“原始秒数_内容”，只记录原始秒数，不符合该格式的key单独保存
+        """
+        self.secs = array('i')
+        self.key_secs = array('i')
+        self.tags: List[str] = []
+        self.masks: List[str] = []
+        self.custom_keys: Dict[int, str] = {}
+        self._categories: Dict[str, Tuple[array, 'TimelineColumns']] = {}
+
+    def __len__(self) -> int:
+        return len(self.secs)
+
+    def append(self, sec: int, tag: str, mask: str, key_sec: int, key: str = None) -> None:
+        if key is not None:
+            self.custom_keys[len(self.secs)] = key
+        self._categories.clear()
+        self.secs.append(sec)
+        self.key_secs.append(key_sec)
+        self.tags.append(sys.intern(tag))
+        self.masks.append(sys.intern(mask) if mask else '')
+
+    def appendItem(self, item: TimelineItem) -> None:
+        key_sec, _, key_tag = item.key.partition('_')
+        if key_tag == item.tag and key_sec.lstrip('-').isdigit():
+            self.append(item.sec, item.tag, item.mask, int(key_sec))
+        else:
+            self.append(item.sec, item.tag, item.mask, item.sec, item.key)
+
+    def appendRow(self, source: 'TimelineColumns', index: int, sec: int) -> None:
+        self.append(sec, source.tags[index], source.masks[index], source.key_secs[index], source.custom_keys.get(index))
+
+    def getKey(self, index: int) -> str:
+        key = self.custom_keys.get(index)
+        if key is None:
+            key = f'{self.key_secs[index]}_{self.tags[index]}'
+        return key
+
+    def getItem(self, index: int, offset: int) -> TimelineItem:
+        return TimelineItem(self.secs[index] + offset, self.tags[index], self.getKey(index), self.masks[index])
+
+    def getCategory(self, name: str) -> Tuple[array, 'TimelineColumns']:
+        """获取某一分类的索引，首次访问时扫描一遍并缓存，之后追加条目会使缓存失效
+
+        Args:
+            name (str): 分类名，见TIMELINE_CATEGORIES
+
+        Returns:
+            Tuple[array, TimelineColumns]: 该分类条目在本存储中的下标（升序），以及只含这些条目的列存储
+        """
+        category = self._categories.get(name)
+        if category is None:
+            predicate = TIMELINE_CATEGORIES[name]
+            rows = array('i', (i for i, tag in enumerate(self.tags) if predicate(tag)))
+            columns = TimelineColumns()
+            for i in rows:
+                columns.appendRow(self, i, self.secs[i])
+            category = (rows, columns)
+            self._categories[name] = category
+        return category
+
 class Timeline:
-    def __init__(self, items: List[TimelineItem]) -> None:
+    def __init__(self, items: List[TimelineItem], presorted: bool = False) -> None:
         """生成时间轴
 
         Args:
             items (list[TimelineItem]): 时间轴条目
+            presorted (bool): 条目是否已按时间排序，为True时不再排序
+        """
+        if not presorted:
+            items = sorted(items, key=lambda item: item.sec)
+        columns = TimelineColumns()
+        for item in items:
+            columns.appendItem(item)
+        self._setView(columns, 0, 0, len(columns))
+
+    def _setView(self, columns: TimelineColumns, offset: int, start: int, stop: int) -> None:
+        self.columns = columns
+        self.offset = offset
+        self.start = start
+        self.stop = stop
+        self._items: List[TimelineItem] = None
+
+    @staticmethod
+    def fromColumns(columns: TimelineColumns, offset: int = 0, start: int = 0, stop: int = None) -> 'Timeline':
+        """基于已有的列存储创建时间轴视图，不复制数据
+
+        Args:
+            columns (TimelineColumns): 按秒数排序的列存储
+            offset (int): 视图的时间偏移量
+            start (int): 视图在列存储中的起始下标
+            stop (int): 视图在列存储中的结束下标（不含），为空时到末尾
+
+        Returns:
+            Timeline: 时间轴视图
+        """
+        timeline = Timeline.__new__(Timeline)
+        timeline._setView(columns, offset, start, len(columns) if stop is None else stop)
+        return timeline
+
+    @property
+    def items(self) -> List[TimelineItem]:
+        """时间轴条目，首次访问时生成
+        """
+        if self._items is None:
+            self._items = list(self)
+        return self._items
+
+    @property
+    def secs(self) -> List[int]:
+        """各条目的秒数
+        """
+        if self.offset == 0:
+            return self.columns.secs[self.start:self.stop].tolist()
+        return [sec + self.offset for sec in self.columns.secs[self.start:self.stop]]
+
+    @staticmethod
+    def merge(timelines: Iterable['Timeline'], offsets: Iterable[int] = None) -> 'Timeline':
+        """将多个时间轴分别调整偏移量后合并为一个时间轴
+
+        结果与依次调用shift后相加一致（时间相同的条目保持输入顺序），但只做一次多路归并
+
+        Args:
+            timelines (Iterable[Timeline]): 各个时间轴
+            offsets (Iterable[int]): 各个时间轴的偏移量，为空时均为0
+
+        Returns:
+            Timeline: 合并后的时间轴
         """
-        self.items = items
-        self.items.sort(key=lambda item: item.sec)
+        timelines = list(timelines)
+        offsets = list(offsets) if offsets is not None else [0] * len(timelines)
+        streams = []
+        for index, (timeline, offset) in enumerate(zip(timelines, offsets)):
+            delta = timeline.offset + offset
+            secs = timeline.columns.secs[timeline.start:timeline.stop]
+            if delta:
+                secs = array('i', [sec + delta for sec in secs])
+            streams.append(zip(secs, repeat(index), range(timeline.start, timeline.stop)))
+        columns = TimelineColumns()
+        for sec, index, i in heapq.merge(*streams):
+            columns.appendRow(timelines[index].columns, i, sec)
+        return Timeline.fromColumns(columns)
 
     def __iter__(self) -> Iterator[TimelineItem]:
-        return iter(self.items)
+        if self._items is not None:
+            return iter(self._items)
+        return (self.columns.getItem(i, self.offset) for i in range(self.start, self.stop))
+
+    def __len__(self) -> int:
+        return self.stop - self.start
 
     def __add__(self, other: 'Timeline') -> 'Timeline':
-        return Timeline(self.items + other.items)
+        return Timeline.merge([self, other])
 
     def __str__(self) -> str:
-        return '\n'.join(map(str, self.items))
+        return '\n'.join(map(str, self))
 
     def shift(self, delta: int) -> 'Timeline':
-        """生成调整后的时间轴
+        """生成调整后的时间轴（共享存储的视图）
 
         Args:
             delta (int): 调整的时间偏移量
@@ -66,10 +229,10 @@ class Timeline:
         Returns:
             Timeline: 新生成的时间轴
         """
-        return Timeline([item.shift(delta) for item in self.items])
+        return Timeline.fromColumns(self.columns, self.offset + delta, self.start, self.stop)
 
     def clip(self, start: int, length: int) -> 'Timeline':
-        """生成时间轴切片
+        """生成时间轴切片（共享存储的视图）
 
         Args:
             start (int): 切片开始对应的时刻（秒）
@@ -78,7 +241,41 @@ class Timeline:
         Returns:
             Timeline: 适配于切片的时间轴（0表示切片开始时刻）
         """
-        return Timeline([item.shift(-start) for item in self.items if item.sec >= start and item.sec <= start + length])
+        secs = self.columns.secs
+        lo = bisect_left(secs, start - self.offset, self.start, self.stop)
+        hi = bisect_right(secs, start + length - self.offset, lo, self.stop)
+        return Timeline.fromColumns(self.columns, self.offset - start, lo, hi)
+
+    def _categoryRange(self, name: str) -> Tuple[int, int, TimelineColumns]:
+        rows, columns = self.columns.getCategory(name)
+        lo = bisect_left(rows, self.start)
+        hi = bisect_left(rows, self.stop, lo)
+        return lo, hi, columns
+
+    def category(self, name: str) -> 'Timeline':
+        """生成仅含某一分类条目的时间轴（共享分类索引的视图）
+
+        Args:
+            name (str): 分类名，见TIMELINE_CATEGORIES
+
+        Returns:
+            Timeline: 仅含该分类条目的时间轴
+        """
+        lo, hi, columns = self._categoryRange(name)
+        return Timeline.fromColumns(columns, self.offset, lo, hi)
+
+    def categoryPositions(self, name: str) -> List[int]:
+        """某一分类的条目在本时间轴中的位置（升序）
+
+        Args:
+            name (str): 分类名，见TIMELINE_CATEGORIES
+
+        Returns:
+            List[int]: 条目下标
+        """
+        rows = self.columns.getCategory(name)[0]
+        lo, hi, _ = self._categoryRange(name)
+        return [i - self.start for i in rows[lo:hi]]
 
     def songAndDance(self) -> 'Timeline':
         """生成仅含歌舞的时间轴（🎤/💃开头的条目）
@@ -86,8 +283,7 @@ class Timeline:
         Returns:
             Timeline: 仅含歌舞的时间轴
         """
-        sd_items = list(filter(lambda item: item.tag.startswith('🎤') or item.tag.startswith('💃'), self.items))
-        return Timeline(sd_items)
+        return self.category('songAndDance')
 
     def section(self) -> 'Timeline':
         """生成仅含章节的时间轴（##开头的条目）
@@ -95,8 +291,15 @@ class Timeline:
         Returns:
             Timeline: 仅含章节的时间轴
         """
-        sd_items = list(filter(lambda item: item.tag.startswith('##')), self.items)
-        return Timeline(sd_items)
+        return self.category('section')
+
+    def starred(self) -> 'Timeline':
+        """生成仅含重点条目的时间轴（*结尾的条目）
+
+        Returns:
+            Timeline: 仅含重点条目的时间轴
+        """
+        return self.category('starred')
 
     def hasTitle(self) -> bool:
         """判断轴中是否包含章节标题（##开头的条目）
@@ -104,7 +307,5 @@ class Timeline:
         Returns:
             bool: 是否包含章节标题
         """
-        for item in self.items:
-            if item.tag.startswith('##'):
-                return True
-        return False
+        lo, hi, _ = self._categoryRange('section')
+        return hi > lo
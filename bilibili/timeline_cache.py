@@ -0,0 +1,289 @@
+import io
+import os
+import sys
+import csv
+import zlib
+import struct
+from array import array
+from collections import OrderedDict
+from itertools import accumulate
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from .timeline import Timeline, TimelineColumns, TimelineDiagnostic, TimelineItem
+
+# 旁路缓存文件：文件头 + 秒数 + 条目内容偏移 + mask偏移 + 条目内容(UTF-8) + mask(UTF-8)
+TLCACHE_SUFFIX = '.tlcache'
+TLCACHE_MAGIC = b'TLCACHE\0'
+TLCACHE_VERSION = 2
+# magic, 版本, 条目数, csv大小, csv修改时间(ns), 已解析的字节数, 已解析部分的CRC32, 已解析部分的行数, 条目内容长度, mask长度
+TLCACHE_HEADER = struct.Struct('<8sIIqqqIIII')
+UTF8_BOM = b'\xef\xbb\xbf'
+# 校验已解析部分时每次读取的字节数
+PREFIX_CHUNK_SIZE = 1 << 20
+# 追加的条目数超过缓存中条目数的该比例时才重写缓存文件，缓存落后时读取后会继续解析之后的部分
+TLCACHE_REWRITE_RATIO = 0.1
+
+def _splitLine(line: str) -> Tuple[List[str], Optional[str]]:
+    # 不含引号的行直接按逗号分割，与csv模块的结果一致
+    if '"' not in line:
+        return line.split(','), None
+    try:
+        return next(csv.reader([line], strict=True)), None
+    except csv.Error as e:
+        # 旧版本保存的csv不加引号，引号不成对时按原样保留
+        return line.split(','), f'引号不匹配（{e}），已按逗号直接分割'
+
+def _parseLines(path: str, lines: Iterable[str], line_base: int = 0, diagnostics: List[TimelineDiagnostic] = None) -> Iterator[TimelineItem]:
+    """逐行解析csv，每行对应一个条目，不支持跨行的字段
+    """
+    for line_no, line in enumerate(lines, line_base + 1):
+        line = line.rstrip('\r\n')
+        if not line.strip():
+            continue
+        row, warning = _splitLine(line)
+        if warning is not None:
+            diagnostic = TimelineDiagnostic(path, line_no, line, warning)
+            if diagnostics is None:
+                print(diagnostic)
+            else:
+                diagnostics.append(diagnostic)
+        if not ''.join(row).strip():
+            continue
+        try:
+            sec = int(row[0])
+        except ValueError:
+            raise ValueError(f"时间轴文件 {path} 第{line_no}行格式有误: {line}") from None
+        yield TimelineItem(sec, row[1] if len(row) >= 2 else '', mask=(row[2] if len(row) >= 3 else ''))
+
+def iterTimelineFromCSV(path: str, diagnostics: List[TimelineDiagnostic] = None) -> Iterator[TimelineItem]:
+    """
+    逐行读取csv格式的时间轴，依次生成时间轴条目（未排序）
+    :param path: csv文件路径
+    :param diagnostics: 收集引号不匹配等问题的列表，为空时直接打印
+    :return: Iterator[TimelineItem]
+    """
+    # before error:UnicodeDecodeError: 'gbk' codec can't decode byte 0x80 in position 4: illegal multibyte sequence
+    with open(path, "r", encoding="utf-8-sig", newline='') as f:
+        yield from _parseLines(path, f, 0, diagnostics)
+
+def _toLittleEndian(data: array) -> bytes:
+    if sys.byteorder == 'big':
+        data = array(data.typecode, data)
+        data.byteswap()
+    return data.tobytes()
+
+def _fromLittleEndian(typecode: str, data: bytes) -> array:
+    result = array(typecode)
+    result.frombytes(data)
+    if sys.byteorder == 'big':
+        result.byteswap()
+    return result
+
+def _packStrings(strings: List[str]) -> Tuple[array, bytes]:
+    chunks = [s.encode('utf-8') for s in strings]
+    return array('I', accumulate(map(len, chunks), initial=0)), b''.join(chunks)
+
+class _CSVState:
+    def __init__(self, columns: TimelineColumns, size: int, mtime_ns: int, offset: int, crc: int, lines: int) -> None:
+        # columns只包含前offset字节中的完整行，末尾未写完的行每次单独解析
+        self.columns = columns
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.offset = offset
+        self.crc = crc
+        self.lines = lines
+        # 缓存文件中的条目数
+        self.saved = 0
+        self.fragment: Timeline = None
+        self._merged: TimelineColumns = None
+
+    def timeline(self) -> Timeline:
+        if self.fragment is None:
+            return Timeline.fromColumns(self.columns)
+        if self._merged is None:
+            self._merged = Timeline.merge([Timeline.fromColumns(self.columns), self.fragment]).columns
+        return Timeline.fromColumns(self._merged)
+
+class TimelineCSVCache:
+    def __init__(self, max_size: int = 8) -> None:
+        """csv时间轴的读取缓存
+
+        解析结果按列写入csv旁的 .tlcache 文件，csv的大小和修改时间未变化时直接读取该文件；
+        同一进程内最近读取的时间轴还会保留在内存中，重复读取未变化的文件时无需任何解析。
+        直播中不断向csv末尾追加条目时，若已解析部分的内容（按CRC32校验）未变化，只解析新追加的完整行并插入已有时间轴，
+        否则重新解析整个文件
+
+        Args:
+            max_size (int): 内存中最多保留的时间轴文件数
+        """
+        self.max_size = max_size
+        self._states: 'OrderedDict[str, _CSVState]' = OrderedDict()
+        # 最近一次读取的方式：memory/sidecar/append/full，便于观察
+        self.last_mode: str = None
+
+    @staticmethod
+    def getSidecarPath(path: str) -> str:
+        return path + TLCACHE_SUFFIX
+
+    def load(self, path: str, diagnostics: List[TimelineDiagnostic] = None) -> Timeline:
+        """读取csv时间轴，优先使用缓存
+
+        Args:
+            path (str): csv文件路径
+            diagnostics (List[TimelineDiagnostic]): 收集本次解析到的行中引号不匹配等问题的列表，为空时直接打印
+
+        Returns:
+            Timeline: 时间轴
+        """
+        abs_path = os.path.abspath(path)
+        stat = os.stat(abs_path)
+        state = self._states.get(abs_path)
+        from_memory = state is not None
+        if state is None:
+            state = self._readSidecar(abs_path)
+        if state is not None and state.size == stat.st_size and state.mtime_ns == stat.st_mtime_ns:
+            self.last_mode = 'memory' if from_memory else 'sidecar'
+        else:
+            with open(abs_path, 'rb') as f:
+                if state is not None and state.offset <= stat.st_size and self._prefixMatches(f, state):
+                    data = f.read()
+                    try:
+                        state = self._extend(abs_path, state, data, stat, diagnostics)
+                        self.last_mode = 'append'
+                    except UnicodeDecodeError:
+                        # 新追加的部分无法单独解码，重新解析
+                        state = None
+                else:
+                    state = None
+                if state is None:
+                    f.seek(0)
+                    state = self._extend(abs_path, _CSVState(TimelineColumns(), 0, 0, 0, 0, 0), f.read(), stat, diagnostics)
+                    self.last_mode = 'full'
+            if self.last_mode == 'full' or len(state.columns) - state.saved > TLCACHE_REWRITE_RATIO * state.saved:
+                self._writeSidecar(abs_path, state)
+        self._remember(abs_path, state)
+        return state.timeline()
+
+    def _remember(self, abs_path: str, state: _CSVState) -> None:
+        self._states[abs_path] = state
+        self._states.move_to_end(abs_path)
+        while len(self._states) > self.max_size:
+            self._states.popitem(last=False)
+
+    @staticmethod
+    def _prefixMatches(f, state: _CSVState) -> bool:
+        crc = 0
+        remaining = state.offset
+        while remaining > 0:
+            chunk = f.read(min(PREFIX_CHUNK_SIZE, remaining))
+            if not chunk:
+                return False
+            crc = zlib.crc32(chunk, crc)
+            remaining -= len(chunk)
+        return crc == state.crc
+
+    @staticmethod
+    def _parseChunk(path: str, data: bytes, line_base: int, diagnostics: List[TimelineDiagnostic] = None) -> List[TimelineItem]:
+        text = data.decode('utf-8')
+        return list(_parseLines(path, io.StringIO(text, newline=''), line_base, diagnostics))
+
+    def _extend(self, abs_path: str, state: _CSVState, data: bytes, stat: os.stat_result, diagnostics: List[TimelineDiagnostic] = None) -> _CSVState:
+        """解析state.offset之后的数据data，返回新的状态。完整行并入列存储，末尾未写完的行单独保存
+        """
+        start = 0
+        if state.offset == 0 and data.startswith(UTF8_BOM):
+            start = len(UTF8_BOM)
+        complete_end = data.rfind(b'\n') + 1
+        if complete_end < start:
+            complete_end = start
+        complete = data[start:complete_end]
+        items = self._parseChunk(abs_path, complete, state.lines, diagnostics) if complete else []
+
+        columns = state.columns
+        if items:
+            added = Timeline(items).columns
+            if not len(columns) or added.secs[0] >= columns.secs[-1]:
+                # 直播中追加的条目一般都在末尾，直接追加，已有的视图不受影响
+                for i in range(len(added)):
+                    columns.appendRow(added, i, added.secs[i])
+            else:
+                columns = Timeline.merge([Timeline.fromColumns(columns), Timeline.fromColumns(added)]).columns
+
+        size = state.offset + len(data)
+        # 读取期间文件仍在变化时，下次读取需重新检查
+        mtime_ns = stat.st_mtime_ns if size == stat.st_size else -1
+        result = _CSVState(columns, size, mtime_ns, state.offset + complete_end, zlib.crc32(data[:complete_end], state.crc), state.lines + complete.count(b'\n'))
+        result.saved = state.saved if columns is state.columns else 0
+        if complete_end < len(data):
+            try:
+                # 未写完的行可能暂时引号不成对，不报告
+                fragment = self._parseChunk(abs_path, data[complete_end:], result.lines, [])
+            except (ValueError, UnicodeDecodeError):
+                # 最后一行可能还没写完，等写完后再解析
+                fragment = []
+            if fragment:
+                result.fragment = Timeline(fragment)
+        return result
+
+    def _readSidecar(self, abs_path: str) -> Optional[_CSVState]:
+        sidecar_path = self.getSidecarPath(abs_path)
+        try:
+            # 所有条目都会立即解码为字符串，直接整体读入
+            with open(sidecar_path, 'rb') as f:
+                data = f.read()
+            if len(data) < TLCACHE_HEADER.size:
+                return None
+            magic, version, count, size, mtime_ns, offset, crc, lines, tags_len, masks_len = TLCACHE_HEADER.unpack_from(data, 0)
+            if magic != TLCACHE_MAGIC or version != TLCACHE_VERSION:
+                return None
+            pos = TLCACHE_HEADER.size
+            secs_end = pos + 4 * count
+            tag_offsets_end = secs_end + 4 * (count + 1)
+            mask_offsets_end = tag_offsets_end + 4 * (count + 1)
+            if len(data) != mask_offsets_end + tags_len + masks_len:
+                return None
+            secs = _fromLittleEndian('i', data[pos:secs_end])
+            tag_offsets = _fromLittleEndian('I', data[secs_end:tag_offsets_end])
+            mask_offsets = _fromLittleEndian('I', data[tag_offsets_end:mask_offsets_end])
+            if tag_offsets[0] != 0 or tag_offsets[-1] != tags_len or mask_offsets[0] != 0 or mask_offsets[-1] != masks_len:
+                return None
+            tags_blob = data[mask_offsets_end:mask_offsets_end + tags_len]
+            masks_blob = data[mask_offsets_end + tags_len:]
+            columns = TimelineColumns()
+            columns.secs = secs
+            columns.key_secs = array('i', secs)
+            columns.tags = [sys.intern(str(tags_blob[tag_offsets[i]:tag_offsets[i + 1]], 'utf-8')) for i in range(count)]
+            columns.masks = [sys.intern(str(masks_blob[mask_offsets[i]:mask_offsets[i + 1]], 'utf-8')) for i in range(count)]
+            state = _CSVState(columns, size, mtime_ns, offset, crc, lines)
+            state.saved = count
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f'时间轴缓存 {sidecar_path} 读取失败，将重新解析: {e}')
+            return None
+        if offset < size:
+            # 缓存中不保存末尾未写完的行，按当前文件内容重新解析
+            state.size = -1
+        return state
+
+    def _writeSidecar(self, abs_path: str, state: _CSVState) -> None:
+        # 从csv解析的条目均使用默认key（秒数_内容），缓存中无需保存key
+        sidecar_path = self.getSidecarPath(abs_path)
+        columns = state.columns
+        tag_offsets, tags_blob = _packStrings(columns.tags)
+        mask_offsets, masks_blob = _packStrings(columns.masks)
+        tmp_path = sidecar_path + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(TLCACHE_HEADER.pack(TLCACHE_MAGIC, TLCACHE_VERSION, len(columns), state.size, state.mtime_ns, state.offset, state.crc, state.lines, len(tags_blob), len(masks_blob)))
+                f.write(_toLittleEndian(columns.secs))
+                f.write(_toLittleEndian(tag_offsets))
+                f.write(_toLittleEndian(mask_offsets))
+                f.write(tags_blob)
+                f.write(masks_blob)
+            os.replace(tmp_path, sidecar_path)
+            state.saved = len(columns)
+        except OSError as e:
+            print(f'时间轴缓存 {sidecar_path} 写入失败: {e}')
+
+timeline_csv_cache = TimelineCSVCache()
@@ -1,59 +1,125 @@
 import time
 import re
-from typing import Tuple, List
+import csv
+from typing import Iterator, Optional, Tuple, List
 
-from .timeline import Timeline, TimelineItem
+from .timeline import Timeline, TimelineItem, TimelineDiagnostic
+from .timeline_cache import iterTimelineFromCSV, timeline_csv_cache
 from .video import VideoPartInfo
-from .tokenizer import getContentJson, getSubTitleJson
+from .tokenizer import Token, getContentTokens, getSubTitleTokens, getSubTitleTemplate, needsNetwork, resolveTokens, renderTokens
 from .note_object import NoteObject
 from .pub_timeline_config import PubTimelineConfig
 from .agent import BilibiliAgent
+from .publish_resources import PublishResources
+
+# 文本轴的一行：时间（如 1:23 或 1:02:03）+ 空格 + 内容
+TEXT_LINE_PATTERN = re.compile(r'(.+?\d+:\d+) (.+)')
 
 class TimelineConverter:
     @staticmethod
-    async def getTimelineItemJson(item: TimelineItem, config: PubTimelineConfig, agent: BilibiliAgent = None) -> Tuple[NoteObject, str]:
+    def getTimelineItemTokens(item: TimelineItem, config: PubTimelineConfig) -> List[Token]:
         tagContent = item.tag
         if tagContent.startswith('##'):
-            item_obj = await getSubTitleJson(tagContent[2:], config)
+            return getSubTitleTokens(tagContent[2:], config)
+        return getContentTokens(tagContent)
+
+    @staticmethod
+    def renderTimelineItem(item: TimelineItem, tokens: List[Token], resolved: dict = None) -> Tuple[NoteObject, str]:
+        item_obj, abstract = renderTokens(tokens, resolved)
+        if item.tag.startswith('##'):
             return item_obj, None
-        return await getContentJson(tagContent, agent)
+        return item_obj, abstract
+
+    @staticmethod
+    def getStaticTimelineItemJson(item: TimelineItem, config: PubTimelineConfig) -> Optional[Tuple[NoteObject, str]]:
+        """不需要网络请求时同步生成条目内容
+
+        Args:
+            item (TimelineItem): 时间轴条目
+            config (PubTimelineConfig): 配置信息
+
+        Returns:
+            Optional[Tuple[NoteObject, str]]: 条目内容与摘要，需要网络请求时返回None
+        """
+        tagContent = item.tag
+        if tagContent.startswith('##'):
+            template = getSubTitleTemplate(config)
+            if not template.static:
+                return None
+            return template.render(tagContent[2:]), None
+        tokens = getContentTokens(tagContent)
+        if needsNetwork(tokens):
+            return None
+        return renderTokens(tokens)
+
+    @staticmethod
+    async def getTimelineItemJson(item: TimelineItem, config: PubTimelineConfig, agent: BilibiliAgent = None, resources: PublishResources = None) -> Tuple[NoteObject, str]:
+        tokens = TimelineConverter.getTimelineItemTokens(item, config)
+        resolved = await resolveTokens(tokens, agent, resources)
+        return TimelineConverter.renderTimelineItem(item, tokens, resolved)
+
+    @staticmethod
+    def loadTimelineFromCSV(path: str, use_cache: bool = True, diagnostics: List[TimelineDiagnostic] = None) -> Timeline:
+        """
+        csv文件转换为时间轴数据类型并返回，文件未变化时直接使用缓存
+        :param path: csv文件路径
+        :param use_cache: 是否使用缓存（内存及csv旁的.tlcache文件）
+        :param diagnostics: 收集引号不匹配等问题的列表，为空时直接打印（使用缓存时只报告本次实际解析的行）
+        :return: Timeline
+        """
+        if use_cache:
+            return timeline_csv_cache.load(path, diagnostics)
+        return Timeline(list(iterTimelineFromCSV(path, diagnostics)))
 
     @staticmethod
-    def loadTimelineFromCSV(path: str) -> Timeline:
-        # before error:UnicodeDecodeError: 'gbk' codec can't decode byte 0x80 in position 4: illegal multibyte sequence
-        with open(path, "r", encoding="utf-8-sig") as f:
-            csv_l = f.readlines()
-        its = [c.replace("\n", "").split(",") for c in csv_l]
-        items = [TimelineItem(int(it[0]), it[1], mask=(it[2] if len(it)>=3 else '')) for it in its]
-        return Timeline(items)
+    def iterTimelineFromText(path: str, diagnostics: List[TimelineDiagnostic] = None) -> Iterator[TimelineItem]:
+        """
+        逐行读取固定格式的txt文件，依次生成时间轴条目，内存占用与文件大小无关
+        :param path: txt文件路径
+        :param diagnostics: 收集格式错误的列表，为空时直接打印错误
+        :return: Iterator[TimelineItem]
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                li = line.strip()
+                if not li:
+                    continue
+                match = TEXT_LINE_PATTERN.match(li)
+                try:
+                    if match is None:
+                        raise ValueError('格式应为“时间 内容”')
+                    sec = 0
+                    for t in match.group(1).split(":"):
+                        sec = sec * 60 + int(t)
+                except ValueError as e:
+                    diagnostic = TimelineDiagnostic(path, line_no, li, str(e))
+                    if diagnostics is None:
+                        print(diagnostic)
+                    else:
+                        diagnostics.append(diagnostic)
+                    continue
+                yield TimelineItem(sec=sec, tag=match.group(2).replace(',', '，'))
 
     @staticmethod
-    def loadTimelineFromText(path: str) -> Timeline:
+    def loadTimelineFromText(path: str, diagnostics: List[TimelineDiagnostic] = None) -> Timeline:
         """
         固定格式的txt文件转换为时间轴数据类型并返回
         :param path: txt文件路径
+        :param diagnostics: 收集格式错误的列表，为空时直接打印错误
         :return: Timeline
         """
-        with open(path, "r", encoding="utf-8") as f:
-            lines = [l.replace("\n", "") for l in f.readlines()]
-        items = []
-        for li in lines:
-            try:
-                li_re = re.findall("(.+?\d+:\d+) (.+)", li.strip())[0]
-                time = li_re[0].split(":")
-                x = 1
-                sec = 0
-                for t in reversed(time):
-                    sec += int(t) * x
-                    x *= 60
-                tag = li_re[1].replace(',', '，')
-                item = TimelineItem(sec=sec, tag=tag)
-                items.append(item)
-            except Exception as e:
-                print(e)
-                print(f"Please check (file: '{path}' line{lines.index(li)}:'{li}'),continue...")
-                continue
-        return Timeline(items)
+        return Timeline(list(TimelineConverter.iterTimelineFromText(path, diagnostics)))
+
+    @staticmethod
+    def loadTimelinesFromText(paths: List[str], offsets: List[int], diagnostics: List[TimelineDiagnostic] = None) -> Timeline:
+        """
+        批量读取多个分P的txt文件，按各自的偏移量合并为一个时间轴
+        :param paths: txt文件路径列表
+        :param offsets: 各文件对应的偏移量
+        :param diagnostics: 收集格式错误的列表，为空时直接打印错误
+        :return: Timeline
+        """
+        return Timeline.merge((TimelineConverter.loadTimelineFromText(path, diagnostics) for path in paths), offsets)
 
     @staticmethod
     def saveTimelineToCSV(path: str, timeline: Timeline) -> bool:
@@ -65,10 +131,11 @@ class TimelineConverter:
         """
         try:
             # "utf-8-sig"的原因：能在excel中正确显示
-            with open(path, "w", encoding="utf-8-sig") as f:
+            with open(path, "w", encoding="utf-8-sig", newline='') as f:
+                writer = csv.writer(f, lineterminator='\n')
                 for item in timeline:
-                    # 保存为秒
-                    f.write(f"{item.sec},{item.tag}\n")
+                    # 保存为秒，含逗号的内容会加上引号
+                    writer.writerow((item.sec, item.tag))
         except Exception as e:
             print(e)
             return False
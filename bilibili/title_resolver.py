@@ -0,0 +1,165 @@
+import os
+import json
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .agent import BilibiliAgent
+
+class BvTitleResolver:
+    def __init__(self, ttl: int = 86400, max_size: int = 1024, cache_path: str = None) -> None:
+        """BV号标题解析器
+
+        进程内缓存带有TTL与LRU淘汰，并可选地持久化到磁盘，
+        同一BV号的并发请求会被合并为一次网络调用
+
+        Args:
+            ttl (int): 缓存有效期（秒），默认为一天
+            max_size (int): 进程内缓存的最大条目数
+            cache_path (str): 磁盘缓存文件路径，为空时不使用磁盘缓存
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self.cache_path = None
+        self._cache: 'OrderedDict[str, Tuple[float, str]]' = OrderedDict()
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._dirty = False
+        self.configure(cache_path=cache_path)
+
+    def configure(self, ttl: int = None, cache_path: str = None) -> None:
+        """更新缓存配置，磁盘缓存路径变化时会重新载入
+
+        Args:
+            ttl (int): 缓存有效期（秒），为空时不修改
+            cache_path (str): 磁盘缓存文件路径，为空时不修改
+        """
+        if ttl is not None:
+            self.ttl = ttl
+        if cache_path and cache_path != self.cache_path:
+            self.cache_path = cache_path
+            self._load()
+
+    def _load(self) -> None:
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                json_data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f'BV标题缓存 {self.cache_path} 读取失败，将重新建立缓存: {e}')
+            return
+        now = time.time()
+        for bvid, (expire_at, title) in sorted(json_data.items(), key=lambda kv: kv[1][0]):
+            if expire_at > now:
+                self._put(bvid, title, expire_at)
+        self._dirty = False
+
+    def save(self) -> None:
+        """将进程内缓存写入磁盘缓存文件（如有）
+        """
+        if not self.cache_path or not self._dirty:
+            return
+        tmp_path = self.cache_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({bvid: [expire_at, title] for bvid, (expire_at, title) in self._cache.items()}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.cache_path)
+        self._dirty = False
+
+    def _get(self, bvid: str) -> str:
+        entry = self._cache.get(bvid)
+        if entry is None:
+            return None
+        expire_at, title = entry
+        if expire_at <= time.time():
+            del self._cache[bvid]
+            self._dirty = True
+            return None
+        self._cache.move_to_end(bvid)
+        return title
+
+    def getExpireAt(self, bvid: str) -> Optional[float]:
+        """获取已缓存标题的过期时间
+
+        Args:
+            bvid (str): 视频BV号
+
+        Returns:
+            Optional[float]: 过期时间戳，未缓存或已过期时返回None
+        """
+        entry = self._cache.get(bvid)
+        if entry is None or entry[0] <= time.time():
+            return None
+        return entry[0]
+
+    def _put(self, bvid: str, title: str, expire_at: float) -> None:
+        self._cache[bvid] = (expire_at, title)
+        self._cache.move_to_end(bvid)
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+        self._dirty = True
+
+    async def _fetch(self, bvid: str, agent: BilibiliAgent) -> str:
+        own_agent = agent is None
+        if own_agent:
+            agent = BilibiliAgent()
+        try:
+            video_info_res = await agent.get(
+                "https://api.bilibili.com/x/web-interface/view",
+                params={
+                    "bvid": bvid
+            })
+        finally:
+            if own_agent:
+                await agent.close()
+        return video_info_res['title']
+
+    async def resolve(self, bvid: str, agent: BilibiliAgent = None) -> str:
+        """获取BV号对应的视频标题
+
+        Args:
+            bvid (str): 视频BV号
+            agent (BilibiliAgent): 用于请求的账号，为空时临时创建匿名会话
+
+        Returns:
+            str: 视频标题
+        """
+        title = self._get(bvid)
+        if title is not None:
+            return title
+        pending = self._pending.get(bvid)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[bvid] = future
+        try:
+            title = await self._fetch(bvid, agent)
+            self._put(bvid, title, time.time() + self.ttl)
+            future.set_result(title)
+            return title
+        except Exception as e:
+            future.set_exception(e)
+            # 避免无人等待时出现未获取异常的警告
+            future.exception()
+            raise
+        finally:
+            if not future.done():
+                future.cancel()
+            del self._pending[bvid]
+
+    async def resolveAll(self, bvids: Iterable[str], agent: BilibiliAgent = None) -> None:
+        """并发预取一组BV号的标题，重复的BV号只请求一次
+
+        预取失败的BV号会在渲染时重新请求并报告错误
+
+        Args:
+            bvids (Iterable[str]): BV号列表
+            agent (BilibiliAgent): 用于请求的账号
+        """
+        missing: List[str] = [bvid for bvid in dict.fromkeys(bvids) if self._get(bvid) is None]
+        if not missing:
+            return
+        await asyncio.gather(*(self.resolve(bvid, agent) for bvid in missing), return_exceptions=True)
+
+# 整个进程共享的标题解析器
+bv_title_resolver = BvTitleResolver()
@@ -1,32 +1,21 @@
 from enum import Enum
-from dataclasses import dataclass
-from typing import List, Tuple
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Tuple
 import re
+import asyncio
 from .note_object import NoteObject
 from .agent import BilibiliAgent
 from .pub_timeline_config import PubTimelineConfig
+from .publish_resources import PublishResources
 import time
-import os
-
-async def uploadImage(img_path: str, agent: BilibiliAgent) -> Tuple[bool, str]:
-    if not os.path.exists(img_path):
-        print(f'图片{img_path}未找到')
-        return False, None
-    result = await agent.post('https://api.bilibili.com/x/note/image/upload', data={
-        "file": open(img_path,"rb"),
-        "csrf": agent.csrf
-    })
-    return True, result["location"]
-
-async def getBvTitle(bvid: str) -> str:
-    agent = BilibiliAgent()
-    video_info_res = await agent.get(
-        "https://api.bilibili.com/x/web-interface/view",
-        params={
-            "bvid": bvid
-    })
-    await agent.close()
-    return video_info_res['title']
+
+async def uploadImage(img_path: str, agent: BilibiliAgent, resources: PublishResources = None) -> Tuple[bool, str]:
+    resources = resources if resources is not None else PublishResources.shared()
+    return await resources.image_cache.upload(img_path, agent)
+
+async def getBvTitle(bvid: str, agent: BilibiliAgent = None, resources: PublishResources = None) -> str:
+    resources = resources if resources is not None else PublishResources.shared()
+    return await resources.title_resolver.resolve(bvid, agent)
 
 class TokenType(Enum):
     TEXT          = 0
@@ -54,110 +43,130 @@ class TokenType(Enum):
 
     RESET         = 100
 
-@dataclass
-class Token:
+class Token(NamedTuple):
     token_type: TokenType
     extra_info: str
 
+# 可能开始一个非文本token的位置
+SPECIAL_PATTERN = re.compile(r'\[|http|BV')
+BV_PATTERN = re.compile(r'BV[A-Za-z0-9]{10}')
+# 控制字到token类型的映射
+DIRECTIVES = {
+    'N': TokenType.NEW_LINE,
+    'R': TokenType.RESET,
+    'B': TokenType.SET_BOLD,
+    'I': TokenType.SET_ITALIC,
+    'U': TokenType.SET_UNDERLINE,
+    'S': TokenType.SET_STRIKE,
+    'AL': TokenType.ALIGN_LEFT,
+    'AC': TokenType.ALIGN_CENTER,
+    'AR': TokenType.ALIGN_RIGHT,
+}
+# 带参数的控制字：(前缀, token类型, 参数起始位置)
+PREFIX_DIRECTIVES = (
+    ('l', TokenType.URL_NAME, 1),
+    ('#', TokenType.SET_COLOR, 0),
+    ('b#', TokenType.SET_BG, 1),
+    ('s', TokenType.SET_FONT_SIZE, 1),
+    ('i', TokenType.IMAGE, 1),
+    ('u', TokenType.IMAGE_UPLOAD, 1),
+)
+
+def parseDirectives(token_str: str, tokens: List[Token]) -> None:
+    for item in token_str.split('|'):
+        item = item.strip()
+        token_type = DIRECTIVES.get(item)
+        if token_type is not None:
+            tokens.append(Token(token_type, ""))
+            continue
+        for prefix, token_type, arg_start in PREFIX_DIRECTIVES:
+            if item.startswith(prefix):
+                tokens.append(Token(token_type, item[arg_start:]))
+                break
+
 def tokenizer(item: str) -> List[Token]:
+    """将轴文本解析为token列表
+
+    使用游标单遍扫描，不会复制剩余的字符串
+
+    Args:
+        item (str): 轴文本
+
+    Returns:
+        List[Token]: token列表
+    """
     tokens = []
-    current_str = item
+    pos = 0
+    end = len(item)
 
     # 兼容旧式标记的预处理
-    if current_str.endswith('**'):
+    if item.endswith('**'):
         tokens.append(Token(TokenType.SET_COLOR, "#ee230d"))
         tokens.append(Token(TokenType.SET_BOLD, ""))
-        current_str = current_str[:-2]
-    elif current_str.endswith('*'):
+        end -= 2
+    elif item.endswith('*'):
         tokens.append(Token(TokenType.SET_COLOR, "#ee230d"))
-        current_str = current_str[:-1]
-    elif current_str.startswith('🎤'):
+        end -= 1
+    elif item.startswith('🎤'):
         tokens.append(Token(TokenType.SET_COLOR, "#0b84ed"))
-    elif current_str.startswith('💃'):
+    elif item.startswith('💃'):
         tokens.append(Token(TokenType.SET_COLOR, "#017001"))
 
-    current_token = Token(TokenType.TEXT, "")
-    while current_str:
-        if current_str.startswith('[') or current_str.startswith('http') or current_str.startswith('BV'):
-            # 装入上一个Token
-            tokens.append(current_token)
-            # 准备一个新的Token容器
-            current_token = Token(TokenType.TEXT, "")
-            if current_str.startswith('['):
+    text_parts = []
+    while pos < end:
+        if SPECIAL_PATTERN.match(item, pos, end):
+            # 装入上一个文本Token
+            tokens.append(Token(TokenType.TEXT, ''.join(text_parts)))
+            text_parts = []
+            char = item[pos]
+            if char == '[':
                 # 生成控制token
-                token_end = current_str.find(']')
+                token_end = item.find(']', pos, end)
                 if token_end != -1:
-                    token_str = current_str[1:token_end]
-                    token_items = token_str.split('|')
-                    for item in token_items:
-                        item = item.strip()
-                        if item == 'N':
-                            tokens.append(Token(TokenType.NEW_LINE, ""))
-                        if item == 'R':
-                            tokens.append(Token(TokenType.RESET, ""))
-                        if item == 'B':
-                            tokens.append(Token(TokenType.SET_BOLD, ""))
-                        if item == 'I':
-                            tokens.append(Token(TokenType.SET_ITALIC, ""))
-                        if item == 'U':
-                            tokens.append(Token(TokenType.SET_UNDERLINE, ""))
-                        if item == 'S':
-                            tokens.append(Token(TokenType.SET_STRIKE, ""))
-                        if item == 'AL':
-                            tokens.append(Token(TokenType.ALIGN_LEFT, ""))
-                        if item == 'AC':
-                            tokens.append(Token(TokenType.ALIGN_CENTER, ""))
-                        if item == 'AR':
-                            tokens.append(Token(TokenType.ALIGN_RIGHT, ""))
-                        if item.startswith('l'):
-                            tokens.append(Token(TokenType.URL_NAME, item[1:]))
-                        if item.startswith('#'):
-                            tokens.append(Token(TokenType.SET_COLOR, item))
-                        if item.startswith('b#'):
-                            tokens.append(Token(TokenType.SET_BG, item[1:]))
-                        if item.startswith('s'):
-                            tokens.append(Token(TokenType.SET_FONT_SIZE, item[1:]))
-                        if item.startswith('i'):
-                            tokens.append(Token(TokenType.IMAGE, item[1:]))
-                        if item.startswith('u'):
-                            tokens.append(Token(TokenType.IMAGE_UPLOAD, item[1:]))
-                    current_str = current_str[token_end+1:]
+                    parseDirectives(item[pos+1:token_end], tokens)
+                    pos = token_end + 1
                     continue
-            if current_str.startswith('http'):
-                token_end = current_str.find(' ')
+            elif char == 'h':
+                token_end = item.find(' ', pos, end)
                 if token_end == -1:
-                    url = current_str
-                    current_str = ''
+                    tokens.append(Token(TokenType.URL, item[pos:end]))
+                    pos = end
                 else:
-                    url = current_str[:token_end]
-                    current_str = current_str[token_end+1:]
-                tokens.append(Token(TokenType.URL, url))
+                    tokens.append(Token(TokenType.URL, item[pos:token_end]))
+                    pos = token_end + 1
+                continue
+            elif BV_PATTERN.match(item, pos, end):
+                # 与旧版保持一致：BV号后紧邻的一个字符会被一并取走
+                token_end = min(pos + 13, end)
+                tokens.append(Token(TokenType.BV_URL, item[pos:token_end]))
+                pos = token_end
                 continue
-            if current_str.startswith('BV'):
-                bv_part = current_str[0:13]
-                if re.match('BV[A-Za-z0-9]{10}', bv_part):
-                    tokens.append(Token(TokenType.BV_URL, bv_part))
-                    current_str = current_str[13:]
-                    continue
 
-        # 装入下一段
-        next_bracket = current_str.find('[', 1)
-        next_url = current_str.find('http', 1)
-        next_bv = current_str.find('BV', 1)
-        min_next = 10000
-        if next_bracket != -1:
-            min_next = min(min_next, next_bracket)
-        if next_url != -1:
-            min_next = min(min_next, next_url)
-        if next_bv != -1:
-            min_next = min(min_next, next_bv)
-        str_part = current_str[:min_next]
-        current_token.extra_info += str_part
-        current_str = current_str[min_next:]
-    tokens.append(current_token)
+        # 装入下一段文本
+        next_special = SPECIAL_PATTERN.search(item, pos + 1, end)
+        next_pos = next_special.start() if next_special else end
+        text_parts.append(item[pos:next_pos])
+        pos = next_pos
+    tokens.append(Token(TokenType.TEXT, ''.join(text_parts)))
     return tokens
 
-async def getContentJson(item: str, agent: BilibiliAgent = None) -> Tuple[NoteObject, str]:
+def collectBvids(items: Iterable[str]) -> List[str]:
+    """收集一组轴文本中引用的全部BV号（去重并保持顺序）
+
+    Args:
+        items (Iterable[str]): 轴文本
+
+    Returns:
+        List[str]: BV号列表
+    """
+    bvids = {}
+    for item in items:
+        for token in tokenizer(item):
+            if token.token_type == TokenType.BV_URL:
+                bvids[token.extra_info] = None
+    return list(bvids)
+
+def getContentTokens(item: str) -> List[Token]:
     tokens = tokenizer(item)
     if len(tokens) >= 4:
         if tokens[1].token_type == TokenType.TEXT and (tokens[1].extra_info == '🎤' or tokens[1].extra_info == '💃'):
@@ -168,8 +177,62 @@ async def getContentJson(item: str, agent: BilibiliAgent = None) -> Tuple[NoteOb
                     raw_tokens = tokens
                     tokens = [tokens[0], tokens[2], tokens[1]]
                     tokens.extend(raw_tokens[3:])
-    return await getContentJsonInternal(tokens, agent)
-async def getContentJsonInternal(tokens: List[Token], agent: BilibiliAgent = None) -> Tuple[NoteObject, str]:
+    return tokens
+
+def needsNetwork(tokens: List[Token]) -> bool:
+    """判断渲染这组token是否需要网络请求（BV号标题或图片上传）
+
+    Args:
+        tokens (List[Token]): token列表
+
+    Returns:
+        bool: 是否需要网络请求
+    """
+    for token in tokens:
+        if token.token_type == TokenType.BV_URL or token.token_type == TokenType.IMAGE_UPLOAD:
+            return True
+    return False
+
+async def resolveTokens(tokens: List[Token], agent: BilibiliAgent = None, resources: PublishResources = None) -> Dict[int, object]:
+    """并发完成一组token所需的网络请求
+
+    Args:
+        tokens (List[Token]): token列表
+        agent (BilibiliAgent): 用于请求的账号
+        resources (PublishResources): 使用的缓存，为空时使用进程共享的缓存
+
+    Returns:
+        Dict[int, object]: token序号到请求结果的映射（BV号为标题，图片为(是否成功, 地址)）
+    """
+    indices = []
+    requests = []
+    for i, token in enumerate(tokens):
+        if token.token_type == TokenType.BV_URL:
+            indices.append(i)
+            requests.append(getBvTitle(token.extra_info, agent, resources))
+        elif token.token_type == TokenType.IMAGE_UPLOAD:
+            indices.append(i)
+            requests.append(uploadImage(token.extra_info, agent, resources))
+    if not requests:
+        return {}
+    return dict(zip(indices, await asyncio.gather(*requests)))
+
+async def getContentJson(item: str, agent: BilibiliAgent = None, resources: PublishResources = None) -> Tuple[NoteObject, str]:
+    return await getContentJsonInternal(getContentTokens(item), agent, resources)
+async def getContentJsonInternal(tokens: List[Token], agent: BilibiliAgent = None, resources: PublishResources = None) -> Tuple[NoteObject, str]:
+    resolved = await resolveTokens(tokens, agent, resources)
+    return renderTokens(tokens, resolved)
+
+def renderTokens(tokens: List[Token], resolved: Dict[int, object] = None) -> Tuple[NoteObject, str]:
+    """将token渲染为笔记内容，不进行任何网络请求
+
+    Args:
+        tokens (List[Token]): token列表
+        resolved (Dict[int, object]): resolveTokens的返回值，不含网络token时可为空
+
+    Returns:
+        Tuple[NoteObject, str]: 笔记内容与摘要
+    """
     note_obj = NoteObject()
     align = None
     current_color = None
@@ -186,7 +249,7 @@ async def getContentJsonInternal(tokens: List[Token], agent: BilibiliAgent = Non
     last_token_type = TokenType.NEW_LINE
     last_image = False
 
-    for token in tokens:
+    for token_index, token in enumerate(tokens):
         if token.token_type == TokenType.TEXT and token.extra_info == '':
             continue
         # if last_token_type == TokenType.IMAGE and token.token_type != TokenType.NEW_LINE:
@@ -247,7 +310,7 @@ async def getContentJsonInternal(tokens: List[Token], agent: BilibiliAgent = Non
             continue
         elif token.token_type == TokenType.BV_URL:
             has_link = True
-            title = await getBvTitle(token.extra_info)
+            title = resolved[token_index]
             title = '▶️' + title
             attributes = {
                 "color": "#0b84ed",
@@ -274,7 +337,7 @@ async def getContentJsonInternal(tokens: List[Token], agent: BilibiliAgent = Non
             }, 1)
             continue
         elif token.token_type == TokenType.IMAGE_UPLOAD:
-            result, url = await uploadImage(token.extra_info, agent)
+            result, url = resolved[token_index]
             if result:
                 note_obj.append({
                     "insert": {
@@ -331,19 +394,82 @@ async def getContentJsonInternal(tokens: List[Token], agent: BilibiliAgent = Non
         note_obj.appendNewLine(align)
     return note_obj, abstract_string
 
-async def getSubTitleJson(item: str, config: PubTimelineConfig, agent: BilibiliAgent = None):
-    prefix = tokenizer(config.sub_title_prefix)
-    postfix = tokenizer(config.sub_title_postfix)
-    all_token = prefix
-    all_token.append(Token(TokenType.TEXT, item))
-    all_token.extend(postfix)
-    obj, abstract = await getContentJsonInternal(all_token, agent)
+class TitleTemplate:
+    # 预编译时占位的文本，渲染时替换为实际标题
+    PLACEHOLDER = '\0'
+
+    def __init__(self, prefix: str, postfix: str) -> None:
+        """预编译的标题样式模板
+
+        前后缀只在编译时解析一次；不含网络token时，渲染标题只需将文本填入预先生成的操作
+
+        Args:
+            prefix (str): 标题前缀（含控制字）
+            postfix (str): 标题后缀（含控制字）
+        """
+        self.prefix_tokens = tuple(tokenizer(prefix))
+        self.postfix_tokens = tuple(tokenizer(postfix))
+        self.static = not needsNetwork(self.prefix_tokens + self.postfix_tokens)
+        self._ops = ()
+        self._text_index = -1
+        self._length = 0
+        if self.static:
+            obj, _ = renderTokens(self.getTokens(TitleTemplate.PLACEHOLDER))
+            self._ops = tuple(obj)
+            self._length = obj.length - len(TitleTemplate.PLACEHOLDER)
+            for i, op in enumerate(self._ops):
+                if op.get('insert') == TitleTemplate.PLACEHOLDER:
+                    self._text_index = i
+                    break
+
+    def getTokens(self, item: str) -> List[Token]:
+        all_token = list(self.prefix_tokens)
+        all_token.append(Token(TokenType.TEXT, item))
+        all_token.extend(self.postfix_tokens)
+        return all_token
+
+    def render(self, item: str) -> NoteObject:
+        """同步渲染标题，仅可在static为True时调用
+
+        Args:
+            item (str): 标题文本
+
+        Returns:
+            NoteObject: 标题内容
+        """
+        if not item or self._text_index < 0:
+            obj, _ = renderTokens(self.getTokens(item))
+            return obj
+        ops = list(self._ops)
+        text_op = ops[self._text_index]
+        ops[self._text_index] = {
+            "attributes": text_op['attributes'],
+            "insert": item
+        }
+        return NoteObject(ops, self._length + len(item))
+
+@lru_cache(maxsize=64)
+def compileTitleTemplate(prefix: str, postfix: str) -> TitleTemplate:
+    return TitleTemplate(prefix, postfix)
+
+def getSubTitleTemplate(config: PubTimelineConfig) -> TitleTemplate:
+    return compileTitleTemplate(config.sub_title_prefix, config.sub_title_postfix)
+
+def getTitleTemplate(config: PubTimelineConfig) -> TitleTemplate:
+    return compileTitleTemplate(config.title_prefix, config.title_postfix)
+
+def getSubTitleTokens(item: str, config: PubTimelineConfig) -> List[Token]:
+    return getSubTitleTemplate(config).getTokens(item)
+
+async def getSubTitleJson(item: str, config: PubTimelineConfig, agent: BilibiliAgent = None, resources: PublishResources = None):
+    template = getSubTitleTemplate(config)
+    if template.static:
+        return template.render(item)
+    obj, abstract = await getContentJsonInternal(template.getTokens(item), agent, resources)
     return obj
-async def getTitleJson(item: str, config: PubTimelineConfig, agent: BilibiliAgent = None):
-    prefix = tokenizer(config.title_prefix)
-    postfix = tokenizer(config.title_postfix)
-    all_token = prefix
-    all_token.append(Token(TokenType.TEXT, item))
-    all_token.extend(postfix)
-    obj, abstract =  await getContentJsonInternal(all_token, agent)
+async def getTitleJson(item: str, config: PubTimelineConfig, agent: BilibiliAgent = None, resources: PublishResources = None):
+    template = getTitleTemplate(config)
+    if template.static:
+        return template.render(item)
+    obj, abstract = await getContentJsonInternal(template.getTokens(item), agent, resources)
     return obj
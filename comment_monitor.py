@@ -1,114 +1,69 @@
 #!/usr/bin/python3
 import sys
+import json
 import asyncio
-from bilibili import BilibiliNoteHelper, BilibiliAgent
-import urllib.parse
-import urllib.request
-import time
+from bilibili import BilibiliAgent, AgentOptions
+from bilibili.comment_monitor import CommentMonitor, CommentMonitorConfig
+from bilibili.notifier import Notifier, createSinks
+from bilibili.file_watcher import FileWatcher
 
 
-def send_pushplus(data: dict) -> bool:
-    """
-    :param data: data = {'token': 'pushplus_token(need)', 'title': 'str', 'content': 'content(need)', }
-    :return: bool
-    """
-    data = urllib.parse.urlencode(data).encode()
-    req = urllib.request.Request(url="http://www.pushplus.plus/send", data=data)
-    response = urllib.request.urlopen(req, timeout=10)
-    print(response.read().decode())
+def loadConfig(config_path: str) -> dict:
+    with open(config_path, 'r', encoding='utf8') as fp:
+        return json.load(fp)
 
-
-async def main(bvid: str, uname: str):
-    # 获取视频信息
+def createAgent(json_data: dict) -> BilibiliAgent:
     # 这里的所有操作都无需登录
-    agent = BilibiliAgent()
-    video_info_res = await agent.get(
-        "https://api.bilibili.com/x/web-interface/view",
-        params={
-            "bvid": bvid
-        })
-    video_info = BilibiliNoteHelper.getVideoInfo(video_info_res)
+    return BilibiliAgent(json_data.get('cookie'), AgentOptions(json_data.get('network')))
+
 
-    print(f'开始监视 {video_info.title} 的评论区...')
-    wait_cnt = 0
-    shown_ids = []
+async def main(json_data: dict, config_path: str = None):
+    agent = createAgent(json_data)
+    notifier = Notifier(createSinks(json_data.get('notify')))
+    monitor = CommentMonitor(CommentMonitorConfig(json_data), agent, notifier)
+    monitor.configure(monitor.config)
+    if config_path is None:
+        # 命令行模式，只需一直运行
+        await asyncio.Event().wait()
 
+    # 配置文件模式，配置文件修改后自动增减监控的视频和用户
+    watcher = FileWatcher([config_path])
     while True:
-        content = ""
-        if wait_cnt % 2 == 0:
-            comment_res = await agent.get(
-                "https://api.bilibili.com/x/v2/reply/main",
-                params={
-                    "type": 1,
-                    "oid":video_info.aid,
-                    # 2是最新评论，3是热门评论
-                    "mode": 2
-            })
-        else:
-            comment_res = await agent.get(
-                "https://api.bilibili.com/x/v2/reply/main",
-                params={
-                    "type": 1,
-                    "oid":video_info.aid,
-                    # 2是最新评论，3是热门评论
-                    "mode": 3
-            })
-        all_replies = comment_res['replies']
-        for reply in all_replies:
-            reply_uname = reply['member']['uname']
-            if reply_uname == uname and reply['rpid'] not in shown_ids:
-                pub_time = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(reply["ctime"]))
-                print('==============================')
-                print(f'已捕获到 {uname} 的评论：')
-                print(reply['content']['message'])
-                content += f"已捕获到 {uname} 的评论：\n{reply['content']['message']}\n"
-                content += f"发布时间{pub_time}\nAPP直达链接：\n{base_url_app}{reply['rpid']}\nPC直达链接：\n{base_url_pc}{reply['rpid']}\n\n"
-                print('==============================')
-                shown_ids.append(reply['rpid'])
-            if reply['replies']:
-                for sub_reply in reply['replies']:
-                    sub_reply_uname = sub_reply['member']['uname']
-                    pub_time = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(sub_reply["ctime"]))
-                    if sub_reply_uname == uname and sub_reply['rpid'] not in shown_ids:
-                        print('------------------------------')
-                        print(f'已捕获到 {uname} 的楼中楼回复：')
-                        print(sub_reply['content']['message'])
-                        content += f"已捕获到 {uname} 的楼中楼回复：\n{sub_reply['content']['message']}\n"
-                        content += f"发布时间{pub_time}\nAPP直达链接：\n{base_url_app}{sub_reply['rpid']}\nPC直达链接：\n{base_url_pc}{sub_reply['rpid']}\n\n"
-                        print('------------------------------')
-                        shown_ids.append(sub_reply['rpid'])
-        if bool(pushplus_token) & bool(content):
-            print("尝试请求pushplus服务推送捕获信息...")
-            data = {'token': pushplus_token, 'title': f'{uname}评论监控', 'content': content + "持续监控中...", }
-            try:
-                send_pushplus(data=data)
-            except Exception as e:
-                print("推送失败，网络错误")
-                print(e)
-        print('*', end='', flush=True)
-        for _ in range(24):
-            await asyncio.sleep(5)
-            print('*', end='', flush=True)
-        wait_cnt += 1
-        print(f' 已持续监控 {wait_cnt * 2} 分钟...')
+        await watcher.wait()
+        try:
+            new_json_data = loadConfig(config_path)
+            config = CommentMonitorConfig(new_json_data)
+        except Exception as e:
+            print('重新载入配置失败，将继续使用原有配置，错误原因如下：')
+            print(e)
+            continue
+        print('检测到配置文件更新，重新载入配置')
+        if new_json_data.get('notify') != json_data.get('notify'):
+            await notifier.close()
+            notifier = Notifier(createSinks(new_json_data.get('notify')))
+            monitor.notifier = notifier
+        json_data = new_json_data
+        monitor.configure(config)
 
 
 if __name__ == '__main__':
-    if len(sys.argv) <= 2:
-        print('Usage: comment_monitor.py <BVID> <User name> <pushplus_token from https://www.pushplus.plus/>\n第三项参数为推送服务，非必需填写')
+    if len(sys.argv) == 2 and sys.argv[1].endswith('.json'):
+        config_path = sys.argv[1]
+        json_data = loadConfig(config_path)
+    elif len(sys.argv) > 2:
+        config_path = None
+        json_data = {
+            'videos': [sys.argv[1]],
+            'unames': [sys.argv[2]],
+            # 推送服务 https://www.pushplus.plus/
+            'notify': {'pushplus': sys.argv[3]} if len(sys.argv) >= 4 else {},
+            'stateDir': sys.argv[4] if len(sys.argv) >= 5 else '.'
+        }
+    else:
+        print('Usage: comment_monitor.py <path to config file>')
+        print('       comment_monitor.py <BVID> <User name> <pushplus_token from https://www.pushplus.plus/> <state directory>\n第三项参数为推送服务，第四项参数为记录已读评论的状态文件目录，均非必需填写')
         sys.exit(-1)
 
-    bvid = sys.argv[1]
-    uname = sys.argv[2]
-
-    if len(sys.argv) == 4:
-        pushplus_token = sys.argv[3]
-    else:
-        # 推送服务 https://www.pushplus.plus/
-        pushplus_token = ""
-    # 两种跳转链接
-    base_url_app = f"https://www.bilibili.com/video/{bvid}?comment_on=1&comment_root_id="
-    base_url_pc = f"https://www.bilibili.com/video/{bvid}#reply"
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
-    loop.run_until_complete(main(bvid, uname))
+    loop.run_until_complete(main(json_data, config_path))
@@ -1,84 +1,105 @@
 #!/usr/bin/python3
 import sys
 import asyncio
-from bilibili import BilibiliNoteHelper, BilibiliAgent
-import urllib.parse
-import urllib.request
-import time
+from bilibili import BilibiliNoteHelper, BilibiliAgent, AgentOptions
+from bilibili.notifier import Notifier, createSinks
+from bilibili.comment_sender import CommentTarget, ArticleScanner, CommentQueue, CommentSenderState
 import json
 
-def send_pushplus(data: dict) -> bool:
-    """
-    :param data: data = {'token': 'pushplus_token(need)', 'title': 'str', 'content': 'content(need)', }
-    :return: bool
-    """
-    data = urllib.parse.urlencode(data).encode()
-    req = urllib.request.Request(url="http://www.pushplus.plus/send", data=data)
-    response = urllib.request.urlopen(req, timeout=10)
-    print(response.read().decode())
 
+async def verifyUncertain(comment_queue: CommentQueue, targets: list) -> None:
+    # 结果不确定的评论只在评论区中找到时标记为已发送，不会重新发送
+    for target in targets:
+        if not target.uncertain:
+            continue
+        try:
+            if await comment_queue.verify(target):
+                print(f'[{target.bvid}] 已在评论区找到之前发出的评论')
+        except Exception as e:
+            print(f'[{target.bvid}] 确认评论是否已发出失败: {e}')
 
 async def main(config_path: str):
     with open(config_path,'r',encoding='utf8') as fp:
         json_data = json.load(fp)
 
-        # 基础信息
-        agent = BilibiliAgent(json_data['cookie'])
-        bvid = json_data['bvid']
-        mid = json_data['mid']
-        comment = json_data['comment']
+    # 基础信息
+    agent = BilibiliAgent(json_data['cookie'], AgentOptions(json_data.get('network')))
+    mid = json_data['mid']
+    poll_interval: int = json_data['pollInterval'] if 'pollInterval' in json_data else 120
+    comment_interval: int = json_data['commentInterval'] if 'commentInterval' in json_data else 10
 
-        if 'pushplus' in json_data:
-            pushplus_token = json_data['pushplus']
-        else:
-            pushplus_token = ''
+    # 目标视频，兼容旧配置中的单个bvid和comment
+    targets = [CommentTarget(target['bvid'], target['comment']) for target in json_data.get('targets', [])]
+    if 'bvid' in json_data:
+        targets.append(CommentTarget(json_data['bvid'], json_data['comment']))
+
+    # 推送渠道，兼容旧配置中的pushplus项
+    notify_options = dict(json_data['notify']) if 'notify' in json_data else {}
+    if 'pushplus' in json_data:
+        notify_options.setdefault('pushplus', json_data['pushplus'])
+    notifier = Notifier(createSinks(notify_options))
 
+    state = CommentSenderState(json_data.get('state'))
+    targets_by_aid = {}
+    for target in targets:
         video_info_res = await agent.get(
-        "https://api.bilibili.com/x/web-interface/view",
-        params={
-            "bvid": bvid
-        })
+            "https://api.bilibili.com/x/web-interface/view",
+            params={
+                "bvid": target.bvid
+            })
         video_info = BilibiliNoteHelper.getVideoInfo(video_info_res)
+        target.aid = video_info.aid
+        target.title = video_info.title
+        state.restore(target)
+        targets_by_aid[target.aid] = target
+        if target.sent:
+            print(f'[{target.bvid}] 已评论过，跳过')
+        elif target.uncertain:
+            print(f'[{target.bvid}] 上次的评论结果未知，不会自动重新发送')
+        else:
+            print(f'开始监视 {target.title} 的笔记发布情况...')
 
-        print(f'开始监视 {video_info.title} 的笔记发布情况...')
-        wait_cnt = 0
+    scanner = ArticleScanner(mid, newest_id=state.newest_id)
+    # 每条评论发送成功或结果不确定时立即写入状态，进程在此之后退出也不会重复评论
+    comment_queue = CommentQueue(agent, notifier, comment_interval, on_update=lambda target: state.update(scanner.newest_id, targets))
+    await verifyUncertain(comment_queue, targets)
+    wait_cnt = 0
 
-        while True:
-            article_res = await agent.get(
-                "https://api.bilibili.com/x/space/article",
-                params={
-                    "mid": mid
-            })
-            all_articles = article_res['articles']
-            for article in all_articles:
-                if article['cover_avid'] == video_info.aid:
-                    print("已监测到新发布的笔记")
-                    cvid = article['id']
-                    url = f'https://www.bilibili.com/h5/note-app/view?cvid={cvid}&pagefrom=comment'
-                    full_comment = f'{url}\n{comment}'
-                    await agent.post(
-                        'http://api.bilibili.com/x/v2/reply/add',
-                        params={
-                            "type": 1,
-                            "oid": video_info.aid,
-                            "csrf": agent.csrf,
-                            "message": full_comment
-                    })
-                    print('已完成评论发布，程序自动退出')
-                    if bool(pushplus_token):
-                        print("尝试请求pushplus服务推送捕获信息...")
-                        data = {'token': pushplus_token, 'title': f'{video_info.title}评论自动发布', 'content': full_comment }
-                        try:
-                            send_pushplus(data=data)
-                        except Exception as e:
-                            print("推送失败，网络错误")
-                            print(e)
-                    sys.exit(0)
-            for _ in range(24):
-                await asyncio.sleep(5)
-                print('*', end='', flush=True)
-            wait_cnt += 1
-            print(f' 已持续监控 {wait_cnt * 2} 分钟...')
+    # 退出循环条件：全部目标视频都已完成评论或结果不确定
+    while not all(target.sent or target.uncertain for target in targets):
+        try:
+            for article in await scanner.scan(agent):
+                target = targets_by_aid.get(article['cover_avid'])
+                if target is not None and target.cvid is None:
+                    print(f'[{target.bvid}] 已监测到新发布的笔记')
+                    target.cvid = article['id']
+        except Exception as e:
+            print('获取笔记列表失败，错误原因如下：')
+            print(e)
+        await verifyUncertain(comment_queue, targets)
+        for target in targets:
+            if target.cvid is not None and not target.sent and not target.uncertain and not target.pending:
+                comment_queue.submit(target)
+        if all(target.cvid is not None for target in targets):
+            await comment_queue.join()
+        state.update(scanner.newest_id, targets)
+        if all(target.sent or target.uncertain for target in targets):
+            break
+        for _ in range(max(1, poll_interval // 5)):
+            await asyncio.sleep(min(5, poll_interval))
+            print('*', end='', flush=True)
+        wait_cnt += 1
+        print(f' 已持续监控 {wait_cnt * poll_interval // 60} 分钟...')
+
+    await comment_queue.join()
+    state.update(scanner.newest_id, targets)
+    uncertain = [target.bvid for target in targets if target.uncertain]
+    if uncertain:
+        print(f'以下视频的评论结果未知，请到评论区确认；确认没有发出时，将其从状态文件的uncertain中删除后重新运行: {", ".join(uncertain)}')
+    else:
+        print('全部目标视频已完成评论发布，程序自动退出')
+    await notifier.close()
+    await agent.close()
 
 if __name__ == '__main__':
     # add default config filepath
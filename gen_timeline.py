@@ -30,10 +30,12 @@ def main(config_path: str):
     if len(parts) != len(offsets):
         print("参数offsets和parts个数不同，无法继续")
         sys.exit(-1)
-    time_line = TimelineConverter.loadTimelineFromText(parts[0]).shift(offsets[0])
-    if len(parts) >= 2:
-        for i in range(len(parts))[1:]:
-            time_line += TimelineConverter.loadTimelineFromText(parts[i]).shift(offsets[i])
+    diagnostics = []
+    time_line = TimelineConverter.loadTimelinesFromText(parts, offsets, diagnostics)
+    if diagnostics:
+        print(f"共有 {len(diagnostics)} 行格式有误，已跳过：")
+        for diagnostic in diagnostics:
+            print(f"  {diagnostic.path}:{diagnostic.line_no}: {diagnostic.line}")
     if isinstance(raw_out ,str):
         outs = [raw_out]
     else:
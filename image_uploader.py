@@ -3,16 +3,18 @@ import sys
 import asyncio
 import json
 from bilibili import BilibiliAgent
+from bilibili.image_cache import image_upload_cache
 
 async def main(img_path: str, config_path: str):
     with open(config_path,'r',encoding='utf8') as fp:
         json_data = json.load(fp)
         agent = BilibiliAgent(json_data['cookie'])
-        result = await agent.post('https://api.bilibili.com/x/note/image/upload', data={
-            "file": open(img_path,"rb"),
-            "csrf": agent.csrf
-        })
-        print(f'图片地址: "{result["location"]}"')
+        if 'imageCache' in json_data:
+            image_upload_cache.configure(json_data['imageCache'])
+        result, location = await image_upload_cache.upload(img_path, agent)
+        if result:
+            print(f'图片地址: "{location}"')
+        image_upload_cache.save()
         await agent.close()
 
 if __name__ == '__main__':
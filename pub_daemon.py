@@ -0,0 +1,17 @@
+#!/usr/bin/python3
+from bilibili import PublishDaemon
+import asyncio
+import sys
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print('Usage: pub_daemon.py <path to config directory> [global requests per second]')
+        sys.exit(-1)
+    config_dir = sys.argv[1]
+    global_rate = float(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    daemon = PublishDaemon(config_dir, global_rate)
+    print(f'正在监控配置目录 {config_dir}，运行状态将写入 {daemon.status_path}')
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    loop.run_until_complete(daemon.run())
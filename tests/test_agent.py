@@ -0,0 +1,240 @@
+import time
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from bilibili import agent as agent_module
+from bilibili.agent import AgentOptions, BilibiliAgent, RequestMaybeSentError, TokenBucket
+
+class FakeAPIServer:
+    def __init__(self) -> None:
+        """本地的B站接口替身，记录收到的请求，并按预设依次返回 (HTTP状态码, 返回码, 延迟秒数)
+        """
+        self.requests = []
+        self.responses = []
+        self._server: TestServer = None
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        body = await request.read()
+        self.requests.append({'path': request.path, 'method': request.method, 'body': body, 'time': time.monotonic()})
+        status, code, delay = self.responses.pop(0) if self.responses else (200, 0, 0)
+        if delay:
+            await asyncio.sleep(delay)
+        if status != 200:
+            return web.Response(status=status, text='error')
+        return web.json_response({'code': code, 'message': '', 'data': {'count': len(self.requests)}})
+
+    def url(self, path: str) -> str:
+        return str(self._server.make_url(path))
+
+    def gaps(self) -> list:
+        times = [request['time'] for request in self.requests]
+        return [b - a for a, b in zip(times, times[1:])]
+
+    async def __aenter__(self) -> 'FakeAPIServer':
+        app = web.Application()
+        app.router.add_route('*', '/{path:.*}', self._handle)
+        self._server = TestServer(app)
+        await self._server.start_server()
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self._server.close()
+
+def makeAgent(**network) -> BilibiliAgent:
+    options = {'maxRetries': 3, 'backoffBase': 0.01, 'backoffMax': 1, 'defaultRate': 1000, 'timeout': 5}
+    options.update(network)
+    return BilibiliAgent(options=AgentOptions(options))
+
+def run(coro):
+    return asyncio.run(coro)
+
+@pytest.fixture
+def no_jitter(monkeypatch):
+    monkeypatch.setattr(agent_module.random, 'uniform', lambda a, b: 1.0)
+
+def test_success():
+    async def main():
+        async with FakeAPIServer() as server:
+            agent = makeAgent()
+            try:
+                assert await agent.get(server.url('/x/test'), params={'a': 1}) == {'count': 1}
+            finally:
+                await agent.close()
+    run(main())
+
+@pytest.mark.parametrize('status, code', [(412, 0), (429, 0), (500, 0), (502, 0), (200, -412), (200, -509), (200, -799), (200, -500), (200, -503)])
+def test_retryable_errors_are_retried(status, code):
+    async def main():
+        async with FakeAPIServer() as server:
+            server.responses = [(status, code, 0), (status, code, 0)]
+            agent = makeAgent()
+            try:
+                assert await agent.get(server.url('/x/test')) == {'count': 3}
+            finally:
+                await agent.close()
+            assert len(server.requests) == 3
+    run(main())
+
+def test_other_codes_are_not_retried():
+    async def main():
+        async with FakeAPIServer() as server:
+            server.responses = [(200, -400, 0)]
+            agent = makeAgent()
+            try:
+                with pytest.raises(Exception, match='服务调用失败'):
+                    await agent.get(server.url('/x/test'))
+            finally:
+                await agent.close()
+            assert len(server.requests) == 1
+    run(main())
+
+def test_gives_up_after_max_retries():
+    async def main():
+        async with FakeAPIServer() as server:
+            server.responses = [(503, 0, 0)] * 10
+            agent = makeAgent(maxRetries=2)
+            try:
+                with pytest.raises(Exception, match='已重试 2 次') as info:
+                    await agent.get(server.url('/x/test'))
+                assert not isinstance(info.value, RequestMaybeSentError)
+            finally:
+                await agent.close()
+            assert len(server.requests) == 3
+    run(main())
+
+def test_timeout_is_retried():
+    async def main():
+        async with FakeAPIServer() as server:
+            server.responses = [(200, 0, 1)]
+            agent = makeAgent(timeout=0.2)
+            try:
+                assert await agent.get(server.url('/x/test')) == {'count': 2}
+            finally:
+                await agent.close()
+    run(main())
+
+def test_backoff_grows_exponentially(no_jitter):
+    async def main():
+        async with FakeAPIServer() as server:
+            server.responses = [(429, 0, 0)] * 3
+            agent = makeAgent(backoffBase=0.05)
+            try:
+                await agent.get(server.url('/x/test'))
+            finally:
+                await agent.close()
+            gaps = server.gaps()
+            assert len(gaps) == 3
+            for attempt, gap in enumerate(gaps):
+                assert gap >= 0.05 * 2 ** attempt
+            assert gaps[2] > gaps[0] * 2
+    run(main())
+
+def test_backoff_is_capped_and_jittered(monkeypatch):
+    agent_options = AgentOptions({'backoffBase': 1, 'backoffMax': 5})
+    agent = BilibiliAgent.__new__(BilibiliAgent)
+    agent.options = agent_options
+    monkeypatch.setattr(agent_module.random, 'uniform', lambda a, b: 1.0)
+    assert [agent._getBackoff(attempt) for attempt in range(5)] == [1, 2, 4, 5, 5]
+    monkeypatch.setattr(agent_module.random, 'uniform', lambda a, b: a)
+    assert agent._getBackoff(1) == 1
+    monkeypatch.setattr(agent_module.random, 'uniform', lambda a, b: b)
+    assert agent._getBackoff(1) == 3
+
+def test_token_bucket_paces_requests():
+    async def main():
+        bucket = TokenBucket(20)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for _ in range(5):
+            await bucket.acquire()
+        # 第一个令牌立即可用，之后每个等待1/20秒
+        assert loop.time() - start >= 0.2 - 0.01
+    run(main())
+
+def test_token_bucket_allows_burst():
+    async def main():
+        bucket = TokenBucket(1, capacity=3)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for _ in range(3):
+            await bucket.acquire()
+        assert loop.time() - start < 0.1
+    run(main())
+
+def test_requests_are_paced_per_path():
+    async def main():
+        async with FakeAPIServer() as server:
+            agent = makeAgent(rateLimits={'/x/slow': 10})
+            try:
+                await asyncio.gather(*(agent.get(server.url('/x/slow')) for _ in range(4)))
+                fast_start = len(server.requests)
+                await asyncio.gather(*(agent.get(server.url('/x/fast')) for _ in range(4)))
+            finally:
+                await agent.close()
+            slow_times = [request['time'] for request in server.requests[:fast_start]]
+            fast_times = [request['time'] for request in server.requests[fast_start:]]
+            assert slow_times[-1] - slow_times[0] >= 0.3 - 0.01
+            assert fast_times[-1] - fast_times[0] < 0.1
+    run(main())
+
+def test_shared_rate_budget_paces_all_paths():
+    async def main():
+        async with FakeAPIServer() as server:
+            agent = BilibiliAgent(options=AgentOptions({'defaultRate': 1000}), rate_budget=TokenBucket(10))
+            try:
+                for path in ('/x/a', '/x/b', '/x/c', '/x/d'):
+                    await agent.get(server.url(path))
+            finally:
+                await agent.close()
+            assert server.requests[-1]['time'] - server.requests[0]['time'] >= 0.3 - 0.01
+    run(main())
+
+@pytest.mark.parametrize('status, code, delay', [(500, 0, 0), (502, 0, 0), (200, -500, 0), (200, -503, 0), (200, 0, 1)])
+def test_non_idempotent_request_is_not_replayed(status, code, delay):
+    async def main():
+        async with FakeAPIServer() as server:
+            server.responses = [(status, code, delay)]
+            agent = makeAgent(timeout=0.2)
+            try:
+                with pytest.raises(RequestMaybeSentError):
+                    await agent.post(server.url('/x/v2/reply/add'), data={'message': '评论'}, idempotent=False)
+            finally:
+                await agent.close()
+            assert len(server.requests) == 1
+    run(main())
+
+@pytest.mark.parametrize('status, code', [(412, 0), (429, 0), (200, -412), (200, -509), (200, -799)])
+def test_non_idempotent_request_retried_after_rejection(status, code):
+    async def main():
+        async with FakeAPIServer() as server:
+            server.responses = [(status, code, 0)]
+            agent = makeAgent(rateLimits={'/x/v2/reply/add': 1000})
+            calls = []
+            def makeData() -> dict:
+                calls.append(1)
+                return {'message': '评论'}
+            try:
+                assert await agent.post(server.url('/x/v2/reply/add'), data=makeData, idempotent=False) == {'count': 2}
+            finally:
+                await agent.close()
+            assert len(server.requests) == 2
+            assert len(calls) == 2
+            assert all(request['body'] == server.requests[0]['body'] for request in server.requests)
+    run(main())
+
+def test_non_idempotent_request_retried_when_connection_fails():
+    async def main():
+        async with FakeAPIServer() as server:
+            # 取得一个已关闭的端口
+            url = server.url('/x/v2/reply/add')
+        agent = makeAgent(maxRetries=1)
+        try:
+            with pytest.raises(Exception, match='已重试 1 次') as info:
+                await agent.post(url, data={'message': '评论'}, idempotent=False)
+            assert not isinstance(info.value, RequestMaybeSentError)
+        finally:
+            await agent.close()
+    run(main())
@@ -0,0 +1,90 @@
+import json
+import asyncio
+
+from bilibili.agent import RequestMaybeSentError
+from bilibili.comment_sender import CommentQueue, CommentSenderState, CommentTarget
+
+class FakeNotifier:
+    def __init__(self) -> None:
+        self.messages = []
+
+    def notify(self, title: str, content: str) -> None:
+        self.messages.append(title)
+
+class FakeAgent:
+    csrf = 'token'
+    mid = '42'
+
+    def __init__(self, error: Exception = None, replies: list = None) -> None:
+        self.error = error
+        self.replies = replies or []
+        self.posts = 0
+
+    async def post(self, url: str, **kwargs) -> dict:
+        self.posts += 1
+        if self.error is not None:
+            raise self.error
+        return {}
+
+    async def get(self, url: str, params: dict) -> dict:
+        return {'replies': self.replies}
+
+def makeTarget() -> CommentTarget:
+    target = CommentTarget('BV1xx411c7mD', '评论')
+    target.aid = 1
+    target.cvid = 100
+    return target
+
+def sendOnce(agent: FakeAgent, target: CommentTarget, state: CommentSenderState) -> CommentQueue:
+    async def run() -> CommentQueue:
+        queue = CommentQueue(agent, FakeNotifier(), 0, on_update=lambda target: state.update(0, [target]))
+        queue.submit(target)
+        await queue.join()
+        return queue
+    return asyncio.run(run())
+
+def test_maybe_sent_comment_is_uncertain_and_persisted(tmp_path):
+    state_path = str(tmp_path / 'state.json')
+    target = makeTarget()
+    queue = sendOnce(FakeAgent(RequestMaybeSentError('timeout')), target, CommentSenderState(state_path))
+    assert queue.failed == 1
+    assert target.uncertain and not target.sent and not target.pending
+    with open(state_path, 'r', encoding='utf-8') as f:
+        assert json.load(f)['uncertain'] == [target.bvid]
+    restored = makeTarget()
+    CommentSenderState(state_path).restore(restored)
+    assert restored.uncertain and not restored.sent
+
+def test_comment_not_sent_can_be_retried(tmp_path):
+    target = makeTarget()
+    sendOnce(FakeAgent(Exception('服务调用失败')), target, CommentSenderState(str(tmp_path / 'state.json')))
+    assert not target.uncertain and not target.sent and not target.pending
+
+def test_verify_marks_found_comment_as_sent(tmp_path):
+    state_path = str(tmp_path / 'state.json')
+    state = CommentSenderState(state_path)
+    target = makeTarget()
+    target.uncertain = True
+    state.update(0, [target])
+    message = CommentQueue.getMessage(target)
+    replies = [
+        {'content': {'message': message}, 'member': {'mid': '7'}},
+        {'content': {'message': message}, 'member': {'mid': '42'}},
+    ]
+    agent = FakeAgent(replies=replies)
+    queue = CommentQueue(agent, FakeNotifier(), 0, on_update=lambda target: state.update(0, [target]))
+    assert asyncio.run(queue.verify(target))
+    assert target.sent and not target.uncertain
+    assert agent.posts == 0
+    with open(state_path, 'r', encoding='utf-8') as f:
+        json_data = json.load(f)
+    assert json_data['sent'] == [target.bvid]
+    assert json_data['uncertain'] == []
+
+def test_verify_ignores_other_accounts():
+    target = makeTarget()
+    target.uncertain = True
+    replies = [{'content': {'message': CommentQueue.getMessage(target)}, 'member': {'mid': '7'}}]
+    queue = CommentQueue(FakeAgent(replies=replies), FakeNotifier(), 0)
+    assert not asyncio.run(queue.verify(target))
+    assert target.uncertain and not target.sent
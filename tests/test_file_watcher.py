@@ -0,0 +1,83 @@
+import os
+import asyncio
+
+import pytest
+
+from bilibili.file_watcher import FileWatcher
+
+def kernelWatches(watcher: FileWatcher) -> int:
+    with open(f'/proc/self/fdinfo/{watcher._fd}', 'r') as f:
+        return sum(1 for line in f if line.startswith('inotify wd:'))
+
+def makeWatcher(paths) -> FileWatcher:
+    watcher = FileWatcher(paths, debounce=0.05, max_delay=0.2, poll_interval=0.05)
+    if watcher.mode != 'inotify':
+        watcher.close()
+        pytest.skip('inotify不可用')
+    return watcher
+
+async def waitChanged(watcher: FileWatcher, timeout: float = 1.0) -> set:
+    try:
+        return await asyncio.wait_for(watcher.wait(), timeout)
+    except asyncio.TimeoutError:
+        return set()
+
+def test_unused_directories_are_unwatched(tmp_path):
+    old_dir = tmp_path / 'old'
+    new_dir = tmp_path / 'new'
+    old_dir.mkdir()
+    new_dir.mkdir()
+    old_file = old_dir / 'a.csv'
+    new_file = new_dir / 'b.csv'
+    async def main():
+        watcher = makeWatcher([str(old_file)])
+        try:
+            assert kernelWatches(watcher) == 1
+            watcher.setPaths([str(new_file)])
+            assert set(watcher._dirs) == {str(new_dir)}
+            assert set(watcher._wds.values()) == {str(new_dir)}
+            assert kernelWatches(watcher) == 1
+            old_file.write_text('1,a')
+            assert await waitChanged(watcher, 0.3) == set()
+            new_file.write_text('1,b')
+            assert await waitChanged(watcher) == {str(new_file)}
+            # 再次需要旧目录时重新监控
+            watcher.setPaths([str(old_file), str(new_file)])
+            assert kernelWatches(watcher) == 2
+            old_file.write_text('2,a')
+            assert await waitChanged(watcher) == {str(old_file)}
+        finally:
+            watcher.close()
+    asyncio.run(main())
+
+def test_watch_count_stays_bounded(tmp_path):
+    async def main():
+        watcher = makeWatcher([])
+        try:
+            for i in range(50):
+                directory = tmp_path / str(i)
+                directory.mkdir()
+                watcher.setPaths([str(directory / 'timeline.csv')])
+            assert kernelWatches(watcher) == 1
+            assert len(watcher._dirs) == len(watcher._wds) == 1
+        finally:
+            watcher.close()
+    asyncio.run(main())
+
+def test_deleted_directory_is_watched_again(tmp_path):
+    directory = tmp_path / 'dir'
+    directory.mkdir()
+    path = directory / 'a.csv'
+    async def main():
+        watcher = makeWatcher([str(path)])
+        try:
+            os.rmdir(directory)
+            await waitChanged(watcher, 0.2)
+            assert watcher._dirs == {} and watcher._wds == {}
+            directory.mkdir()
+            watcher.setPaths([str(path)])
+            path.write_text('1,a')
+            assert await waitChanged(watcher) == {str(path)}
+        finally:
+            watcher.close()
+    asyncio.run(main())
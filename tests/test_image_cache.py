@@ -0,0 +1,68 @@
+import asyncio
+import threading
+
+from bilibili.image_cache import ImageUploadCache
+
+class FakeUploader:
+    csrf = 'token'
+
+    def __init__(self) -> None:
+        self.uploads = 0
+        self.active = 0
+        self.max_active = 0
+
+    async def post(self, url: str, data) -> dict:
+        form = data()
+        name = form['file'].name
+        self.uploads += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        return {'location': f'//img/{self.uploads}-{len(name)}.jpg'}
+
+def writeImages(directory, count: int, same_content: bool = False) -> list:
+    directory.mkdir(exist_ok=True)
+    paths = []
+    for i in range(count):
+        path = directory / f'{i}.jpg'
+        path.write_bytes(b'image' if same_content else f'{directory.name}/image{i}'.encode())
+        paths.append(str(path))
+    return paths
+
+async def uploadAll(cache: ImageUploadCache, paths: list, agent: FakeUploader) -> list:
+    return await asyncio.gather(*(cache.upload(path, agent) for path in paths))
+
+def test_usable_across_event_loops(tmp_path):
+    # 与进程共享的缓存一样，在事件循环之外创建，并先后在多个事件循环中使用
+    cache = ImageUploadCache(max_concurrency=2)
+    agent = FakeUploader()
+    for round in range(2):
+        paths = writeImages(tmp_path / str(round), 6)
+        results = asyncio.run(uploadAll(cache, paths, agent))
+        assert all(ok for ok, _ in results)
+    assert agent.uploads == 12
+    assert agent.max_active == 2
+
+def test_same_content_uploaded_once(tmp_path):
+    cache = ImageUploadCache()
+    agent = FakeUploader()
+    paths = writeImages(tmp_path, 5, same_content=True)
+    results = asyncio.run(uploadAll(cache, paths, agent))
+    assert agent.uploads == 1
+    assert len({location for _, location in results}) == 1
+
+def test_hashing_runs_off_event_loop_thread(tmp_path, monkeypatch):
+    threads = []
+    hash_file = ImageUploadCache._hashFile
+    def recordThread(path: str) -> str:
+        threads.append(threading.get_ident())
+        return hash_file(path)
+    monkeypatch.setattr(ImageUploadCache, '_hashFile', staticmethod(recordThread))
+    cache = ImageUploadCache()
+    asyncio.run(uploadAll(cache, writeImages(tmp_path, 1), FakeUploader()))
+    assert threads and threads[0] != threading.get_ident()
+
+def test_missing_file(tmp_path):
+    cache = ImageUploadCache()
+    assert asyncio.run(cache.upload(str(tmp_path / 'missing.jpg'), FakeUploader())) == (False, None)
@@ -0,0 +1,79 @@
+import random
+
+import pytest
+
+from bilibili.note_object import NoteObject
+
+def line(text: str) -> NoteObject:
+    note = NoteObject()
+    note.append({'insert': text}, len(text))
+    note.appendNewLine()
+    return note
+
+@pytest.mark.parametrize('seed', range(10))
+def test_builder_matches_list_model(seed):
+    # 用普通列表模拟改写前逐次复制的实现，随机交替追加、拼接和复制
+    rng = random.Random(seed)
+    notes = [(NoteObject(), [])]
+    for step in range(300):
+        action = rng.randrange(5)
+        note, model = rng.choice(notes)
+        if action == 0:
+            op = {'insert': f'op{step}'}
+            note.append(op, 1)
+            model.append(op)
+        elif action == 1:
+            other, other_model = rng.choice(notes)
+            note += other
+            model.extend(other_model)
+        elif action == 2:
+            other, other_model = rng.choice(notes)
+            notes.append((note + other, model + other_model))
+        elif action == 3:
+            notes.append((note.copy(), list(model)))
+        else:
+            assert note.obj == model
+    for note, model in notes:
+        assert note.obj == model
+        assert list(note) == model
+        assert len(note) == len(model)
+
+def test_self_extend():
+    note = line('a')
+    note += note
+    assert note.obj == line('a').obj * 2
+
+def test_length_is_accumulated():
+    note = line('abc')
+    note += line('de')
+    assert note.length == 7
+    assert (note + line('f')).length == 9
+
+def test_obj_does_not_expose_shared_chunk():
+    source = line('a')
+    target = NoteObject()
+    target += source
+    # 只有一个块时也不能返回与其他笔记共享的列表
+    target.obj.append({'insert': 'x'})
+    assert source.obj == line('a').obj
+    assert target.obj == line('a').obj
+
+def test_obj_mutation_does_not_affect_note():
+    note = line('a')
+    note.obj.clear()
+    assert note.obj == line('a').obj
+
+def test_init_copies_list():
+    ops = [{'insert': 'a'}]
+    note = NoteObject(ops, 1)
+    note.append({'insert': 'b'}, 1)
+    ops.append({'insert': 'c'})
+    assert ops == [{'insert': 'a'}, {'insert': 'c'}]
+    assert note.obj == [{'insert': 'a'}, {'insert': 'b'}]
+
+def test_empty_note():
+    note = NoteObject()
+    assert note.obj == []
+    assert len(note) == 0
+    note += NoteObject()
+    assert note.obj == []
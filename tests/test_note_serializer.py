@@ -0,0 +1,57 @@
+import json
+from urllib.parse import urlencode
+
+import pytest
+
+import bilibili.note_serializer as note_serializer
+from bilibili.note_object import NoteObject
+from bilibili.note_serializer import OPS_PER_CHUNK, encodeFormBody
+
+def referenceBody(data: dict) -> bytes:
+    # 改写前的实现：先生成完整的JSON字符串，再整体进行表单编码
+    data = {key: json.dumps(value.obj, indent=None, ensure_ascii=False, separators=(',', ':')) if isinstance(value, NoteObject) else value
+            for key, value in data.items()}
+    return urlencode(data).encode()
+
+def buildNote(ops: int) -> NoteObject:
+    note = NoteObject()
+    for i in range(ops):
+        note.append({'attributes': {'color': '#0b84ed', 'bold': True}, 'insert': f'第{i}行 & a=b/?+%'}, 10)
+        note.appendNewLine()
+    return note
+
+BACKENDS = ['json']
+if note_serializer.orjson is not None:
+    BACKENDS.append('orjson')
+
+@pytest.fixture(params=BACKENDS)
+def backend(request, monkeypatch):
+    if request.param == 'json':
+        monkeypatch.setattr(note_serializer, 'orjson', None)
+    return request.param
+
+@pytest.mark.parametrize('ops', [0, 1, OPS_PER_CHUNK - 1, OPS_PER_CHUNK, OPS_PER_CHUNK * 3 + 7])
+def test_form_body_matches_reference(backend, ops):
+    data = {
+        'oid': 1,
+        'note_id': 2,
+        'title': '标题 T&=',
+        'summary': '换行\n摘要',
+        'content': buildNote(ops),
+        'csrf': 'token',
+    }
+    assert bytes(encodeFormBody(data)) == referenceBody(data)
+
+def test_special_characters(backend):
+    note = NoteObject()
+    for text in ('"引号"', '反斜杠\\', '\t制表符', '\x00\x1f', '  ', '😀', '<>'):
+        note.append({'insert': text}, len(text))
+    data = {'content': note}
+    assert bytes(encodeFormBody(data)) == referenceBody(data)
+
+def test_image_ops(backend):
+    note = NoteObject()
+    note.append({'insert': {'imageUpload': {'url': '//a.b/c.jpg?x=1&y=2', 'status': 'done', 'width': 315}}}, 1)
+    note.append({'insert': {'tag': {'cid': 1, 'seconds': 30, 'desc': '歌曲'}}}, 1)
+    data = {'content': note, 'cls': 1}
+    assert bytes(encodeFormBody(data)) == referenceBody(data)
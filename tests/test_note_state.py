@@ -0,0 +1,56 @@
+import json
+
+from bilibili import note_serializer
+from bilibili.note_object import NoteObject
+from bilibili.note_state import NoteStateStore, hashLine, hashNote
+
+FIELDS = {'title': '标题', 'summary': 0, 'publish': True}
+
+def makeNote(image_id: int = 1) -> NoteObject:
+    return NoteObject([
+        {'insert': '01:00 开场\n', 'attributes': {'color': '#ff0000', 'bold': True}},
+        {'insert': {'imageUpload': {'url': '//img/1.jpg', 'status': 'done', 'id': image_id, 'width': 100}}},
+        {'insert': {'tag': {'cid': 1, 'index': 0, 'key': str(image_id), 'seconds': 60}}},
+        {'insert': 1.5},
+    ], 10)
+
+def test_hash_ignores_volatile_fields():
+    assert hashNote(makeNote(1), FIELDS) == hashNote(makeNote(2), FIELDS)
+    assert hashNote(makeNote(), FIELDS) != hashNote(makeNote(), dict(FIELDS, title='新标题'))
+
+def test_hash_ignores_key_order():
+    note = makeNote()
+    reordered = NoteObject([{key: op[key] for key in reversed(list(op))} for op in note])
+    assert hashNote(reordered, FIELDS) == hashNote(note, FIELDS)
+
+def test_hash_does_not_depend_on_json_backend(monkeypatch):
+    expected = hashNote(makeNote(), FIELDS)
+    monkeypatch.setattr(note_serializer, 'orjson', None)
+    assert hashNote(makeNote(), FIELDS) == expected
+
+def test_state_file_does_not_store_lines(tmp_path):
+    state_path = str(tmp_path / 'state.json')
+    lines = [f'{i:02d}:00 很长的轴条目内容{i}' for i in range(100)]
+    store = NoteStateStore(state_path)
+    store.setNote(1, 'hash', lines, ['P1'])
+    with open(state_path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    assert '轴条目内容' not in text
+    assert json.loads(text)['notes']['1']['lineHashes'] == [hashLine(line) for line in lines]
+    assert NoteStateStore(state_path).getNote(1)['hash'] == 'hash'
+
+def test_diff_summary():
+    store = NoteStateStore()
+    lines = ['00:01 a', '00:02 b', '00:03 c', '00:04 d']
+    store.setNote(1, 'hash', lines, ['P1', 'P2'])
+    summary = NoteStateStore.diffSummary(store.getNote(1), ['00:01 a', '00:02 B', '00:03 c', '00:04 d', '00:05 e'], ['P1', 'P3'])
+    assert '新增 1 行，删除 0 行，修改 1 行' in summary
+    assert '  + 00:02 B' in summary and '  + 00:05 e' in summary
+    assert '新增分P: P3' in summary and '移除分P: P2' in summary
+    assert '新增 0 行，删除 2 行，修改 0 行' in NoteStateStore.diffSummary(store.getNote(1), ['00:01 a', '00:04 d'], ['P1', 'P2'])
+    assert NoteStateStore.diffSummary(store.getNote(1), lines, ['P1', 'P2']) == '轴条目与分P均无结构变化'
+
+def test_diff_summary_with_legacy_state():
+    previous = {'hash': 'hash', 'lines': ['00:01 a', '00:02 b'], 'parts': ['P1']}
+    assert NoteStateStore.diffSummary(previous, ['00:01 a', '00:02 b'], ['P1']) == '轴条目与分P均无结构变化'
+    assert '新增 1 行' in NoteStateStore.diffSummary(previous, ['00:01 a', '00:02 b', '00:03 c'], ['P1'])
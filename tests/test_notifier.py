@@ -0,0 +1,221 @@
+import json
+import asyncio
+from urllib.parse import parse_qs
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from bilibili.notifier import Notifier, NotificationSink, PushPlusSink, WebhookSink, FileSink
+
+class RecordingServer:
+    def __init__(self) -> None:
+        """本地的推送接口替身，记录收到的请求，并按预设依次返回 (HTTP状态码, 延迟秒数, pushplus返回码)
+        """
+        self.requests = []
+        self.responses = []
+        self._server: TestServer = None
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        body = await request.read()
+        self.requests.append({'path': request.path, 'headers': dict(request.headers), 'body': body})
+        status, delay, code = self.responses.pop(0) if self.responses else (200, 0, 200)
+        if delay:
+            await asyncio.sleep(delay)
+        if request.path == '/pushplus':
+            return web.json_response({'code': code, 'msg': 'ok'}, status=status)
+        return web.Response(status=status)
+
+    def url(self, path: str) -> str:
+        return str(self._server.make_url(path))
+
+    def form(self, index: int) -> dict:
+        return {key: values[0] for key, values in parse_qs(self.requests[index]['body'].decode()).items()}
+
+    def json(self, index: int) -> dict:
+        return json.loads(self.requests[index]['body'])
+
+    async def __aenter__(self) -> 'RecordingServer':
+        app = web.Application()
+        app.router.add_post('/{name}', self._handle)
+        self._server = TestServer(app)
+        await self._server.start_server()
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self._server.close()
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_sink_base_is_abstract():
+    with pytest.raises(TypeError):
+        NotificationSink()
+
+def test_sink_without_send_cannot_be_created():
+    class IncompleteSink(NotificationSink):
+        name = 'incomplete'
+    with pytest.raises(TypeError):
+        IncompleteSink()
+
+def test_pushplus_payload():
+    async def main():
+        async with RecordingServer() as server:
+            async with aiohttp.ClientSession() as session:
+                await PushPlusSink('token123', server.url('/pushplus')).send(session, '标题', '内容 & more')
+            assert server.requests[0]['headers']['Content-Type'] == 'application/x-www-form-urlencoded'
+            assert server.form(0) == {'token': 'token123', 'title': '标题', 'content': '内容 & more'}
+    run(main())
+
+def test_pushplus_error_code_raises():
+    async def main():
+        async with RecordingServer() as server:
+            server.responses = [(200, 0, 500)]
+            async with aiohttp.ClientSession() as session:
+                with pytest.raises(Exception):
+                    await PushPlusSink('token', server.url('/pushplus')).send(session, '标题', '内容')
+    run(main())
+
+def test_webhook_payload():
+    async def main():
+        async with RecordingServer() as server:
+            async with aiohttp.ClientSession() as session:
+                await WebhookSink(server.url('/hook'), {'X-Token': 'abc'}).send(session, '标题', '内容')
+            request = server.requests[0]
+            assert request['headers']['Content-Type'] == 'application/json'
+            assert request['headers']['X-Token'] == 'abc'
+            assert server.json(0) == {'title': '标题', 'content': '内容'}
+    run(main())
+
+def test_file_sink(tmp_path):
+    path = tmp_path / 'notify.log'
+    run(FileSink(str(path)).send(None, '标题', '内容'))
+    assert '标题\n内容\n' in path.read_text(encoding='utf-8')
+
+def test_notifications_are_batched():
+    async def main():
+        async with RecordingServer() as server:
+            notifier = Notifier([WebhookSink(server.url('/hook'))], batch_window=0.2)
+            for i in range(3):
+                notifier.notify('评论监控', f'第{i}条')
+            await notifier.close()
+            assert len(server.requests) == 1
+            assert server.json(0) == {'title': '评论监控 等3条通知', 'content': '第0条\n第1条\n第2条'}
+            assert notifier.sent == 3
+    run(main())
+
+def test_batches_are_limited_to_max_batch():
+    async def main():
+        async with RecordingServer() as server:
+            notifier = Notifier([WebhookSink(server.url('/hook'))], batch_window=0.2, max_batch=2)
+            for i in range(3):
+                notifier.notify('评论监控', f'第{i}条')
+            await notifier.close()
+            assert [server.json(i)['content'] for i in range(len(server.requests))] == ['第0条\n第1条', '第2条']
+    run(main())
+
+def test_notify_returns_without_waiting_for_delivery():
+    async def main():
+        async with RecordingServer() as server:
+            server.responses = [(200, 0.3, 200)]
+            notifier = Notifier([WebhookSink(server.url('/hook'))], batch_window=0)
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            notifier.notify('标题', '内容')
+            assert loop.time() - start < 0.1
+            assert not server.requests
+            await notifier.close()
+            assert len(server.requests) == 1
+    run(main())
+
+def test_retry_after_server_errors():
+    async def main():
+        async with RecordingServer() as server:
+            server.responses = [(500, 0, 200), (503, 0, 200)]
+            notifier = Notifier([WebhookSink(server.url('/hook'))], batch_window=0, backoff_base=0.01)
+            notifier.notify('标题', '内容')
+            await notifier.close()
+            assert len(server.requests) == 3
+            assert (notifier.sent, notifier.failed) == (1, 0)
+    run(main())
+
+def test_retry_after_timeout():
+    async def main():
+        async with RecordingServer() as server:
+            server.responses = [(200, 1, 200)]
+            notifier = Notifier([PushPlusSink('token', server.url('/pushplus'))], batch_window=0, backoff_base=0.01, timeout=0.2)
+            notifier.notify('标题', '内容')
+            await notifier.close()
+            assert len(server.requests) == 2
+            assert notifier.failed == 0
+    run(main())
+
+def test_gives_up_after_max_retries():
+    async def main():
+        async with RecordingServer() as server:
+            server.responses = [(500, 0, 200)] * 10
+            notifier = Notifier([WebhookSink(server.url('/hook'))], batch_window=0, max_retries=2, backoff_base=0.01)
+            notifier.notify('标题', '内容')
+            await notifier.close()
+            assert len(server.requests) == 3
+            assert notifier.failed == 1
+    run(main())
+
+def test_failing_sink_does_not_block_others():
+    async def main():
+        async with RecordingServer() as server:
+            server.responses = [(500, 0, 200)] * 10
+            failing = WebhookSink(server.url('/failing'))
+            notifier = Notifier([failing], batch_window=0, max_retries=1, backoff_base=0.01)
+            async with RecordingServer() as healthy:
+                notifier.sinks.append(WebhookSink(healthy.url('/hook')))
+                notifier.notify('标题', '内容')
+                await notifier.close()
+                assert len(healthy.requests) == 1
+            assert notifier.failed == 1
+    run(main())
+
+def test_drop_oldest_when_queue_is_full():
+    async def main():
+        async with RecordingServer() as server:
+            notifier = Notifier([WebhookSink(server.url('/hook'))], max_queue=2, batch_window=0.1)
+            # 后台任务还没有机会运行，队列只能保留最新的两条
+            for i in range(5):
+                notifier.notify('标题', f'第{i}条')
+            assert notifier.dropped == 3
+            await notifier.close()
+            assert server.json(0)['content'] == '第3条\n第4条'
+    run(main())
+
+def test_close_flushes_pending_notifications():
+    async def main():
+        async with RecordingServer() as server:
+            notifier = Notifier([WebhookSink(server.url('/hook'))], batch_window=0.05, max_batch=1)
+            for i in range(3):
+                notifier.notify('标题', f'第{i}条')
+            await notifier.close()
+            assert len(server.requests) == 3
+            assert notifier.sent == 3
+            assert notifier._task is None and notifier._session is None
+    run(main())
+
+def test_close_gives_up_after_timeout():
+    async def main():
+        async with RecordingServer() as server:
+            server.responses = [(200, 5, 200)]
+            notifier = Notifier([WebhookSink(server.url('/hook'))], batch_window=0, timeout=10)
+            notifier.notify('标题', '内容')
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            await notifier.close(timeout=0.2)
+            assert loop.time() - start < 2
+            assert notifier.sent == 0
+    run(main())
+
+def test_close_without_notifications():
+    async def main():
+        notifier = Notifier([WebhookSink('http://127.0.0.1:1/hook')])
+        await notifier.close()
+        Notifier([]).notify('标题', '内容')
+    run(main())
@@ -0,0 +1,117 @@
+import time
+import asyncio
+
+import pytest
+
+from bilibili.reply_monitor import ReplyMonitor
+
+PAGE_SIZE = 20
+PREVIEW_SIZE = 3
+
+class FakeCommentSection:
+    def __init__(self) -> None:
+        self.roots = []
+        self.subs = {}
+        self.next_rpid = 1000
+        self.sub_requests = 0
+        # 为True时下一次对应的请求抛出异常
+        self.fail_next_page = False
+        self.fail_sub_replies = False
+
+    def addReply(self, root: int = 0, ctime: int = None) -> dict:
+        self.next_rpid += 1
+        reply = {'rpid': self.next_rpid, 'root': root, 'ctime': int(time.time()) if ctime is None else ctime}
+        if root:
+            self.subs.setdefault(root, []).append(reply)
+        else:
+            self.roots.append(reply)
+        return reply
+
+    async def get(self, url: str, params: dict) -> dict:
+        if url.endswith('/main'):
+            if params['mode'] == 2:
+                ordered = sorted(self.roots, key=lambda reply: -reply['rpid'])
+            else:
+                ordered = self.roots[:PAGE_SIZE]
+            start = params['next'] or 0
+            if start and self.fail_next_page:
+                self.fail_next_page = False
+                raise Exception('第二页读取失败')
+            page = ordered[start:start + PAGE_SIZE]
+            replies = [dict(root, rcount=len(self.subs.get(root['rpid'], [])), replies=self.subs.get(root['rpid'], [])[:PREVIEW_SIZE]) for root in page]
+            return {'replies': replies, 'cursor': {'next': start + PAGE_SIZE, 'is_end': start + PAGE_SIZE >= len(ordered)}}
+        self.sub_requests += 1
+        if self.fail_sub_replies:
+            self.fail_sub_replies = False
+            raise Exception('楼中楼读取失败')
+        subs = self.subs.get(params['root'], [])
+        pn, ps = params['pn'], params['ps']
+        return {'replies': subs[(pn - 1) * ps:pn * ps], 'page': {'count': len(subs)}}
+
+def oldSection() -> FakeCommentSection:
+    section = FakeCommentSection()
+    old_time = int(time.time()) - 3600
+    for _ in range(100):
+        root = section.addReply(ctime=old_time)
+        for _ in range(10):
+            section.addReply(root['rpid'], ctime=old_time)
+    return section
+
+def poll(monitor: ReplyMonitor, section: FakeCommentSection) -> list:
+    return asyncio.run(monitor.poll(section))
+
+def test_first_poll_only_reads_first_page():
+    section = oldSection()
+    monitor = ReplyMonitor(1)
+    assert poll(monitor, section) == []
+    assert monitor.requests == 1
+    assert section.sub_requests == 0
+
+def test_only_deltas_after_first_poll():
+    section = oldSection()
+    monitor = ReplyMonitor(1)
+    poll(monitor, section)
+    new_root = section.addReply()
+    # 第一页中的旧评论和第一页之外的旧评论都有新的楼中楼回复
+    new_subs = [section.addReply(section.roots[-1]['rpid']), section.addReply(section.roots[0]['rpid'])]
+    replies = poll(monitor, section)
+    replies += poll(monitor, section)
+    assert sorted(reply['rpid'] for reply in replies) == sorted([new_root['rpid']] + [reply['rpid'] for reply in new_subs])
+
+def test_empty_section_reports_first_comment():
+    section = FakeCommentSection()
+    monitor = ReplyMonitor(1)
+    assert poll(monitor, section) == []
+    reply = section.addReply()
+    assert [r['rpid'] for r in poll(monitor, section)] == [reply['rpid']]
+
+def test_state_is_reused_after_restart(tmp_path):
+    section = oldSection()
+    state_path = str(tmp_path / 'state.json')
+    poll(ReplyMonitor(1, state_path), section)
+    reply = section.addReply()
+    monitor = ReplyMonitor(1, state_path)
+    assert [r['rpid'] for r in poll(monitor, section)] == [reply['rpid']]
+
+def test_replies_are_reported_after_failed_page():
+    section = oldSection()
+    monitor = ReplyMonitor(1)
+    poll(monitor, section)
+    new_roots = [section.addReply() for _ in range(PAGE_SIZE + 5)]
+    section.fail_next_page = True
+    with pytest.raises(Exception):
+        poll(monitor, section)
+    replies = poll(monitor, section)
+    assert sorted(reply['rpid'] for reply in replies) == [reply['rpid'] for reply in new_roots]
+
+def test_sub_replies_are_reported_after_failed_request():
+    section = oldSection()
+    monitor = ReplyMonitor(1)
+    poll(monitor, section)
+    root = section.roots[-1]
+    new_subs = [section.addReply(root['rpid']) for _ in range(PREVIEW_SIZE + 2)]
+    section.fail_sub_replies = True
+    with pytest.raises(Exception):
+        poll(monitor, section)
+    replies = poll(monitor, section)
+    assert sorted(reply['rpid'] for reply in replies) == [reply['rpid'] for reply in new_subs]
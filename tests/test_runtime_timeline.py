@@ -0,0 +1,48 @@
+import random
+
+import pytest
+
+from bilibili.note_object import NoteObject
+from bilibili.runtime_timeline import RuntimeTimeline, RuntimeTimelineItem
+from bilibili.timeline import Timeline, TimelineItem
+from bilibili.video import VideoPartInfo
+
+def buildRuntimeTimeline(timeline: Timeline) -> RuntimeTimeline:
+    return RuntimeTimeline([RuntimeTimelineItem(item, (NoteObject(), '摘要')) for item in timeline])
+
+def registerLinear(runtime_timeline: RuntimeTimeline, info: VideoPartInfo, start_time: int, token_index: int, hide_part: bool) -> None:
+    # 改写前的实现：每个分P遍历全部条目
+    for item in runtime_timeline.items:
+        item.registerPartInfo(info, start_time, token_index, '标题', hide_part)
+
+def snapshot(runtime_timeline: RuntimeTimeline) -> list:
+    result = []
+    for item in runtime_timeline:
+        labels = [(o['insert']['tag']['index'], o['insert']['tag']['seconds'], o['insert']['tag']['oid_type']) for o in item.time_obj]
+        abstracts = sorted((index, o['insert']['tag']['seconds']) for index, o in item.abstract_time_obj.items())
+        result.append((item.item.sec, item.part_names, labels, abstracts))
+    return result
+
+@pytest.mark.parametrize('seed', range(5))
+def test_register_part_info_matches_linear_scan(seed):
+    rng = random.Random(seed)
+    parts = [VideoPartInfo(100 + i, i + 1, 8, f'P{i + 1}', rng.randrange(1, 600)) for i in range(8)]
+    # 包含重复秒数、负数偏移和恰好落在分P边界上的条目
+    secs = [rng.randrange(-50, 3000) for _ in range(300)]
+    secs += [sum(part.duration for part in parts[:i]) for i in range(len(parts) + 1)]
+    timeline = Timeline([TimelineItem(sec, f'条目{i}', mask='0' if i % 7 == 0 else '') for i, sec in enumerate(secs)])
+
+    expected = buildRuntimeTimeline(timeline)
+    actual = buildRuntimeTimeline(timeline)
+    start_time = 0
+    for part in parts:
+        for token_index, hide_part in ((0, False), (1, True)):
+            registerLinear(expected, part, start_time, token_index, hide_part)
+            actual.registerPartInfo(part, start_time, token_index, '标题', hide_part)
+        start_time += part.duration
+    assert snapshot(actual) == snapshot(expected)
+
+def test_register_part_info_on_empty_timeline():
+    runtime_timeline = buildRuntimeTimeline(Timeline([]))
+    runtime_timeline.registerPartInfo(VideoPartInfo(1, 1, 1, 'P1', 100), 0, 0, '', False)
+    assert runtime_timeline.items == []
@@ -0,0 +1,326 @@
+import os
+import sys
+import json
+import subprocess
+
+import pytest
+
+from bilibili.timeline import Timeline, TimelineItem
+from bilibili.timeline_cache import TLCACHE_HEADER, TLCACHE_MAGIC, TLCACHE_VERSION, TimelineCSVCache, iterTimelineFromCSV
+from bilibili.timeline_converter import TimelineConverter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ROWS = [
+    '10,开场',
+    '5,"带,逗号的条目"',
+    '30,🎤歌曲[B],0',
+    '20,"带""引号""的条目"',
+    '',
+    '40,重复',
+    '40,重复',
+    '-3,负数秒',
+]
+
+def writeCSV(path, lines, bom: bool = False) -> None:
+    data = ''.join(line + '\n' for line in lines).encode('utf-8')
+    writeBytes(path, (b'\xef\xbb\xbf' if bom else b'') + data)
+
+def writeBytes(path, data: bytes) -> None:
+    # 每次写入都推进修改时间，避免同一时刻内的两次写入无法区分
+    previous = os.stat(path).st_mtime_ns if os.path.exists(path) else 0
+    with open(path, 'wb') as f:
+        f.write(data)
+    mtime = max(os.stat(path).st_mtime_ns, previous + 1000)
+    os.utime(path, ns=(mtime, mtime))
+
+def snapshot(timeline: Timeline) -> list:
+    return [(item.sec, item.tag, item.mask, item.key) for item in timeline]
+
+def fullParse(path) -> list:
+    return snapshot(Timeline(list(iterTimelineFromCSV(str(path), []))))
+
+def sidecarPath(path) -> str:
+    return TimelineCSVCache.getSidecarPath(os.path.abspath(str(path)))
+
+def readHeader(path) -> tuple:
+    with open(sidecarPath(path), 'rb') as f:
+        return TLCACHE_HEADER.unpack(f.read(TLCACHE_HEADER.size))
+
+def patchSidecar(path, offset: int, data: bytes) -> None:
+    with open(sidecarPath(path), 'r+b') as f:
+        f.seek(offset)
+        f.write(data)
+
+def loadFresh(path) -> tuple:
+    cache = TimelineCSVCache()
+    return snapshot(cache.load(str(path), [])), cache.last_mode
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / 'timeline.csv'
+    writeCSV(path, ROWS, bom=True)
+    return path
+
+def test_sidecar_header(csv_path):
+    TimelineCSVCache().load(str(csv_path), [])
+    magic, version, count, size, mtime_ns, offset, crc, lines, tags_len, masks_len = readHeader(csv_path)
+    stat = os.stat(csv_path)
+    assert (magic, version) == (TLCACHE_MAGIC, TLCACHE_VERSION)
+    assert count == len(fullParse(csv_path))
+    assert (size, mtime_ns, offset) == (stat.st_size, stat.st_mtime_ns, stat.st_size)
+    assert lines == len(ROWS)
+
+def test_sidecar_loaded_in_fresh_process(csv_path):
+    cache = TimelineCSVCache()
+    assert snapshot(cache.load(str(csv_path), [])) == fullParse(csv_path)
+    assert cache.last_mode == 'full'
+    script = (
+        'import sys, json\n'
+        'from bilibili.timeline_cache import TimelineCSVCache\n'
+        'cache = TimelineCSVCache()\n'
+        'timeline = cache.load(sys.argv[1])\n'
+        'print(json.dumps({"mode": cache.last_mode, "items": [[i.sec, i.tag, i.mask, i.key] for i in timeline]}, ensure_ascii=False))\n'
+    )
+    output = subprocess.run([sys.executable, '-c', script, str(csv_path)], cwd=ROOT, capture_output=True, check=True).stdout
+    result = json.loads(output.decode('utf-8'))
+    assert result['mode'] == 'sidecar'
+    assert [tuple(item) for item in result['items']] == fullParse(csv_path)
+
+def test_memory_hit(csv_path):
+    cache = TimelineCSVCache()
+    first = snapshot(cache.load(str(csv_path), []))
+    assert snapshot(cache.load(str(csv_path), [])) == first
+    assert cache.last_mode == 'memory'
+
+def test_sidecar_strings_are_interned(tmp_path):
+    path = tmp_path / 'timeline.csv'
+    writeCSV(path, [f'{i},同一条内容' for i in range(3)])
+    TimelineCSVCache().load(str(path), [])
+    cache = TimelineCSVCache()
+    timeline = cache.load(str(path), [])
+    assert cache.last_mode == 'sidecar'
+    items = list(timeline)
+    assert items[0].tag is items[1].tag is items[2].tag
+
+def test_stale_mtime_falls_back_to_full_parse(csv_path):
+    TimelineCSVCache().load(str(csv_path), [])
+    # 大小不变、内容变化
+    writeCSV(csv_path, [row.replace('开场', '结束') for row in ROWS], bom=True)
+    result, mode = loadFresh(csv_path)
+    assert mode == 'full'
+    assert result == fullParse(csv_path)
+    assert any(tag == '结束' for _, tag, _, _ in result)
+
+def test_stale_size_falls_back_to_full_parse(csv_path):
+    TimelineCSVCache().load(str(csv_path), [])
+    writeCSV(csv_path, ['1,完全不同的内容'])
+    result, mode = loadFresh(csv_path)
+    assert mode == 'full'
+    assert result == fullParse(csv_path)
+
+def test_unchanged_mtime_with_different_size_is_not_trusted(csv_path):
+    TimelineCSVCache().load(str(csv_path), [])
+    stat = os.stat(csv_path)
+    writeCSV(csv_path, ROWS[:2], bom=True)
+    os.utime(csv_path, ns=(stat.st_mtime_ns, stat.st_mtime_ns))
+    result, mode = loadFresh(csv_path)
+    assert mode == 'full'
+    assert result == fullParse(csv_path)
+
+@pytest.mark.parametrize('offset, data', [
+    (0, b'NOTCACHE'),
+    (8, (TLCACHE_VERSION + 1).to_bytes(4, 'little')),
+    (8, (TLCACHE_VERSION - 1).to_bytes(4, 'little')),
+    # 条目数与文件长度不符
+    (12, (999).to_bytes(4, 'little')),
+])
+def test_bad_header_falls_back_to_full_parse(csv_path, offset, data):
+    TimelineCSVCache().load(str(csv_path), [])
+    patchSidecar(csv_path, offset, data)
+    result, mode = loadFresh(csv_path)
+    assert mode == 'full'
+    assert result == fullParse(csv_path)
+    # 重新写入了有效的缓存
+    assert readHeader(csv_path)[:2] == (TLCACHE_MAGIC, TLCACHE_VERSION)
+    assert loadFresh(csv_path) == (result, 'sidecar')
+
+def test_truncated_sidecar_falls_back_to_full_parse(csv_path):
+    TimelineCSVCache().load(str(csv_path), [])
+    with open(sidecarPath(csv_path), 'r+b') as f:
+        f.truncate(TLCACHE_HEADER.size + 3)
+    assert loadFresh(csv_path) == (fullParse(csv_path), 'full')
+
+def test_invalid_utf8_in_sidecar_falls_back_to_full_parse(csv_path):
+    TimelineCSVCache().load(str(csv_path), [])
+    size = os.path.getsize(sidecarPath(csv_path))
+    patchSidecar(csv_path, size - 1, b'\xff')
+    assert loadFresh(csv_path) == (fullParse(csv_path), 'full')
+
+def test_saved_csv_roundtrip(tmp_path):
+    path = tmp_path / 'saved.csv'
+    items = [TimelineItem(1, '普通'), TimelineItem(2, '含,逗号'), TimelineItem(3, '"引号"开头'), TimelineItem(4, '末尾"引号')]
+    TimelineConverter.saveTimelineToCSV(str(path), Timeline(items))
+    diagnostics = []
+    timeline = TimelineConverter.loadTimelineFromCSV(str(path), use_cache=False, diagnostics=diagnostics)
+    assert [item.tag for item in timeline] == [item.tag for item in items]
+    assert diagnostics == []
+    TimelineCSVCache().load(str(path), [])
+    assert loadFresh(path) == (snapshot(timeline), 'sidecar')
+
+def test_legacy_unquoted_rows(tmp_path):
+    path = tmp_path / 'legacy.csv'
+    writeCSV(path, ['10,"未闭合', '20,正常', '30,a"b', '40,"引用"开头'])
+    diagnostics = []
+    timeline = TimelineCSVCache().load(str(path), diagnostics)
+    assert [(item.sec, item.tag) for item in timeline] == [(10, '"未闭合'), (20, '正常'), (30, 'a"b'), (40, '"引用"开头')]
+    assert [(diagnostic.path, diagnostic.line_no) for diagnostic in diagnostics] == [(os.path.abspath(str(path)), 1), (os.path.abspath(str(path)), 4)]
+    # 从缓存读取时保持原样，且不会重复报告
+    diagnostics = []
+    assert loadFresh(path)[0] == snapshot(timeline)
+    cache = TimelineCSVCache()
+    cache.load(str(path), diagnostics)
+    assert cache.last_mode == 'sidecar'
+    assert diagnostics == []
+
+def test_bad_quoting_without_cache_is_reported(tmp_path):
+    path = tmp_path / 'legacy.csv'
+    writeCSV(path, ['10,"未闭合'])
+    diagnostics = []
+    timeline = TimelineConverter.loadTimelineFromCSV(str(path), use_cache=False, diagnostics=diagnostics)
+    assert [item.tag for item in timeline] == ['"未闭合']
+    assert len(diagnostics) == 1 and diagnostics[0].line_no == 1
+
+def test_invalid_seconds_raise(tmp_path):
+    path = tmp_path / 'bad.csv'
+    writeCSV(path, ['10,正常', 'abc,错误'])
+    with pytest.raises(ValueError, match='第2行'):
+        TimelineCSVCache().load(str(path), [])
+
+def appendBytes(path, data: bytes) -> None:
+    with open(path, 'rb') as f:
+        writeBytes(path, f.read() + data)
+
+def appendRows(path, lines) -> None:
+    appendBytes(path, ''.join(line + '\n' for line in lines).encode('utf-8'))
+
+def test_append_rows(csv_path):
+    cache = TimelineCSVCache()
+    cache.load(str(csv_path), [])
+    for i in range(3):
+        appendRows(csv_path, [f'{50 + i},追加{i}', f'{50 + i},"追加,{i}"'])
+        assert snapshot(cache.load(str(csv_path), [])) == fullParse(csv_path)
+        assert cache.last_mode == 'append'
+
+def test_append_rows_out_of_order(csv_path):
+    cache = TimelineCSVCache()
+    cache.load(str(csv_path), [])
+    appendRows(csv_path, ['100,最后', '0,最前', '25,中间'])
+    assert snapshot(cache.load(str(csv_path), [])) == fullParse(csv_path)
+    assert cache.last_mode == 'append'
+
+def test_append_reports_diagnostics_with_file_line_numbers(csv_path):
+    cache = TimelineCSVCache()
+    cache.load(str(csv_path), [])
+    appendRows(csv_path, ['50,正常', '60,"未闭合'])
+    diagnostics = []
+    cache.load(str(csv_path), diagnostics)
+    assert cache.last_mode == 'append'
+    assert [diagnostic.line_no for diagnostic in diagnostics] == [len(ROWS) + 2]
+
+def test_partial_last_line_then_completed(csv_path):
+    cache = TimelineCSVCache()
+    cache.load(str(csv_path), [])
+    appendBytes(csv_path, '50,未写'.encode('utf-8'))
+    assert snapshot(cache.load(str(csv_path), [])) == fullParse(csv_path)
+    assert cache.last_mode == 'append'
+    appendBytes(csv_path, '完的条目\n60,下一条'.encode('utf-8'))
+    result = snapshot(cache.load(str(csv_path), []))
+    assert cache.last_mode == 'append'
+    assert result == fullParse(csv_path)
+    assert [tag for _, tag, _, _ in result if tag.startswith('未写')] == ['未写完的条目']
+    appendBytes(csv_path, b'\n')
+    assert snapshot(cache.load(str(csv_path), [])) == fullParse(csv_path)
+    assert cache.last_mode == 'append'
+
+def test_partial_line_with_open_quote(csv_path):
+    cache = TimelineCSVCache()
+    cache.load(str(csv_path), [])
+    appendBytes(csv_path, '50,"带,逗'.encode('utf-8'))
+    diagnostics = []
+    cache.load(str(csv_path), diagnostics)
+    # 未写完的行不报告
+    assert diagnostics == []
+    appendBytes(csv_path, '号"\n'.encode('utf-8'))
+    result = snapshot(cache.load(str(csv_path), diagnostics))
+    assert diagnostics == []
+    assert result == fullParse(csv_path)
+    assert any(tag == '带,逗号' for _, tag, _, _ in result)
+
+def test_partial_multibyte_character(csv_path):
+    cache = TimelineCSVCache()
+    before = snapshot(cache.load(str(csv_path), []))
+    data = '50,中文\n'.encode('utf-8')
+    # 写到一半的多字节字符
+    appendBytes(csv_path, data[:5])
+    assert snapshot(cache.load(str(csv_path), [])) == before
+    appendBytes(csv_path, data[5:])
+    assert snapshot(cache.load(str(csv_path), [])) == fullParse(csv_path)
+    assert cache.last_mode == 'append'
+
+def test_edit_before_cached_prefix_falls_back_to_full_parse(csv_path):
+    cache = TimelineCSVCache()
+    cache.load(str(csv_path), [])
+    # 修改已解析的部分，同时文件变长
+    writeCSV(csv_path, [row.replace('开场', '改过') for row in ROWS] + ['50,追加'], bom=True)
+    result = snapshot(cache.load(str(csv_path), []))
+    assert cache.last_mode == 'full'
+    assert result == fullParse(csv_path)
+    assert not any(tag == '开场' for _, tag, _, _ in result)
+    assert loadFresh(csv_path) == (result, 'sidecar')
+
+def test_truncation_falls_back_to_full_parse(csv_path):
+    cache = TimelineCSVCache()
+    cache.load(str(csv_path), [])
+    writeCSV(csv_path, ROWS[:3], bom=True)
+    assert snapshot(cache.load(str(csv_path), [])) == fullParse(csv_path)
+    assert cache.last_mode == 'full'
+    assert loadFresh(csv_path) == (fullParse(csv_path), 'sidecar')
+
+def test_truncation_within_partial_line(csv_path):
+    cache = TimelineCSVCache()
+    cache.load(str(csv_path), [])
+    appendBytes(csv_path, '50,未写完'.encode('utf-8'))
+    cache.load(str(csv_path), [])
+    # 文件截回到已解析的完整行末尾
+    writeCSV(csv_path, ROWS, bom=True)
+    assert snapshot(cache.load(str(csv_path), [])) == fullParse(csv_path)
+
+def test_restart_then_append(csv_path):
+    TimelineCSVCache().load(str(csv_path), [])
+    appendRows(csv_path, ['50,重启后追加'])
+    result, mode = loadFresh(csv_path)
+    assert mode == 'append'
+    assert result == fullParse(csv_path)
+    # 再次重启，读取缓存文件后继续追加
+    appendRows(csv_path, [f'{60 + i},又追加{i}' for i in range(10)])
+    result, mode = loadFresh(csv_path)
+    assert mode == 'append'
+    assert result == fullParse(csv_path)
+    assert readHeader(csv_path)[2] == len(result)
+    assert loadFresh(csv_path) == (result, 'sidecar')
+
+def test_earlier_views_unchanged_after_append(csv_path):
+    cache = TimelineCSVCache()
+    timeline = cache.load(str(csv_path), [])
+    before = snapshot(timeline)
+    length = len(timeline)
+    appendRows(csv_path, ['100,末尾追加'])
+    appended = cache.load(str(csv_path), [])
+    assert cache.last_mode == 'append'
+    appendRows(csv_path, ['0,插入开头'])
+    merged = cache.load(str(csv_path), [])
+    assert cache.last_mode == 'append'
+    assert (snapshot(timeline), len(timeline)) == (before, length)
+    assert snapshot(appended) == before + [(100, '末尾追加', '', '100_末尾追加')]
+    assert snapshot(merged) == fullParse(csv_path)
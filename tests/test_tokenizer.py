@@ -0,0 +1,214 @@
+import re
+import random
+
+import pytest
+
+from bilibili.tokenizer import Token, TokenType, tokenizer, getContentTokens, needsNetwork, renderTokens
+
+def referenceTokenizer(item: str) -> list:
+    """单遍扫描改写前的分词实现，作为行为基准
+
+    逐token切片剩余字符串，返回 (token类型, 附加信息) 列表
+    """
+    tokens = []
+    current_str = item
+
+    if current_str.endswith('**'):
+        tokens.append((TokenType.SET_COLOR, "#ee230d"))
+        tokens.append((TokenType.SET_BOLD, ""))
+        current_str = current_str[:-2]
+    elif current_str.endswith('*'):
+        tokens.append((TokenType.SET_COLOR, "#ee230d"))
+        current_str = current_str[:-1]
+    elif current_str.startswith('🎤'):
+        tokens.append((TokenType.SET_COLOR, "#0b84ed"))
+    elif current_str.startswith('💃'):
+        tokens.append((TokenType.SET_COLOR, "#017001"))
+
+    current_text = ""
+    while current_str:
+        if current_str.startswith('[') or current_str.startswith('http') or current_str.startswith('BV'):
+            tokens.append((TokenType.TEXT, current_text))
+            current_text = ""
+            if current_str.startswith('['):
+                token_end = current_str.find(']')
+                if token_end != -1:
+                    for item in current_str[1:token_end].split('|'):
+                        item = item.strip()
+                        if item == 'N':
+                            tokens.append((TokenType.NEW_LINE, ""))
+                        if item == 'R':
+                            tokens.append((TokenType.RESET, ""))
+                        if item == 'B':
+                            tokens.append((TokenType.SET_BOLD, ""))
+                        if item == 'I':
+                            tokens.append((TokenType.SET_ITALIC, ""))
+                        if item == 'U':
+                            tokens.append((TokenType.SET_UNDERLINE, ""))
+                        if item == 'S':
+                            tokens.append((TokenType.SET_STRIKE, ""))
+                        if item == 'AL':
+                            tokens.append((TokenType.ALIGN_LEFT, ""))
+                        if item == 'AC':
+                            tokens.append((TokenType.ALIGN_CENTER, ""))
+                        if item == 'AR':
+                            tokens.append((TokenType.ALIGN_RIGHT, ""))
+                        if item.startswith('l'):
+                            tokens.append((TokenType.URL_NAME, item[1:]))
+                        if item.startswith('#'):
+                            tokens.append((TokenType.SET_COLOR, item))
+                        if item.startswith('b#'):
+                            tokens.append((TokenType.SET_BG, item[1:]))
+                        if item.startswith('s'):
+                            tokens.append((TokenType.SET_FONT_SIZE, item[1:]))
+                        if item.startswith('i'):
+                            tokens.append((TokenType.IMAGE, item[1:]))
+                        if item.startswith('u'):
+                            tokens.append((TokenType.IMAGE_UPLOAD, item[1:]))
+                    current_str = current_str[token_end+1:]
+                    continue
+            if current_str.startswith('http'):
+                token_end = current_str.find(' ')
+                if token_end == -1:
+                    url = current_str
+                    current_str = ''
+                else:
+                    url = current_str[:token_end]
+                    current_str = current_str[token_end+1:]
+                tokens.append((TokenType.URL, url))
+                continue
+            if current_str.startswith('BV'):
+                bv_part = current_str[0:13]
+                if re.match('BV[A-Za-z0-9]{10}', bv_part):
+                    tokens.append((TokenType.BV_URL, bv_part))
+                    current_str = current_str[13:]
+                    continue
+
+        next_bracket = current_str.find('[', 1)
+        next_url = current_str.find('http', 1)
+        next_bv = current_str.find('BV', 1)
+        min_next = 10000
+        if next_bracket != -1:
+            min_next = min(min_next, next_bracket)
+        if next_url != -1:
+            min_next = min(min_next, next_url)
+        if next_bv != -1:
+            min_next = min(min_next, next_bv)
+        current_text += current_str[:min_next]
+        current_str = current_str[min_next:]
+    tokens.append((TokenType.TEXT, current_text))
+    return tokens
+
+def referenceContentTokens(item: str) -> list:
+    tokens = referenceTokenizer(item)
+    if len(tokens) >= 4:
+        if tokens[1][0] == TokenType.TEXT and tokens[1][1] in ('🎤', '💃'):
+            if tokens[2][0] in (TokenType.IMAGE, TokenType.IMAGE_UPLOAD):
+                if len(tokens) == 4 and tokens[3][1] == '':
+                    tokens = [tokens[2]]
+                else:
+                    tokens = [tokens[0], tokens[2], tokens[1]] + tokens[3:]
+    return tokens
+
+EDGE_CASES = [
+    '',
+    '[',
+    ']',
+    '[]',
+    '[[B]',
+    '[B',
+    'abc[',
+    'h',
+    'http',
+    'https://example.com',
+    'https://example.com 后续文本',
+    'http http',
+    '看http://a.b链接',
+    'B',
+    'BV',
+    'BV1xx411c7m',
+    'BV1xx411c7mD',
+    'BV1xx411c7mDx后续',
+    'BVBV1xx411c7mD',
+    'BV1xx411c7m!',
+    '*',
+    '**',
+    '***',
+    '重要*',
+    '重要**',
+    '🎤',
+    '🎤歌曲',
+    '💃舞蹈',
+    '🎤[i//img.jpg]',
+    '🎤[u./a.jpg]歌曲',
+    '💃[i//img.jpg]舞蹈[B]',
+    '[N]',
+    '[R|B|I|U|S]文本',
+    '[AL| AC |AR]',
+    '[#ee230d|b#ffffff|s18]彩色',
+    '[l链接名]https://example.com',
+    '[B|lname|i//x.jpg|u./y.png|sbig|#]',
+    '[b#]',
+    '[未知|X|]文本',
+    '前缀[B]中间[R]后缀',
+    '[B]http://a.b BV1xx411c7mD[N]文本**',
+    '纯文本' * 5000,
+    '[B]' * 1000,
+    'x' * 10001 + '[B]',
+]
+
+def randomLines(count: int, seed: int = 0):
+    fragments = ['[', ']', '|', 'B', 'N', 'R', 'AC', 'b#fff', '#123', 's18', 'i12', 'u./a.jpg', 'l名',
+                 'http', 'https://x.y', ' ', 'BV', 'BV1xx411c7mD', 'BV1xx411c7m', 'a', '中文',
+                 '*', '**', '🎤', '💃', 'h', 'tp', 'V', '  ']
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield ''.join(rng.choice(fragments) for _ in range(rng.randrange(0, 14)))
+
+def withoutIds(ops: list) -> list:
+    # 图片的id由当前时间生成，比较时忽略
+    result = []
+    for op in ops:
+        image = op['insert'].get('imageUpload') if isinstance(op.get('insert'), dict) else None
+        if image is not None:
+            op = {**op, 'insert': {'imageUpload': {key: value for key, value in image.items() if key != 'id'}}}
+        result.append(op)
+    return result
+
+def asTuples(tokens: list) -> list:
+    return [(token.token_type, token.extra_info) for token in tokens]
+
+@pytest.mark.parametrize('line', EDGE_CASES)
+def test_tokenizer_matches_reference(line):
+    assert asTuples(tokenizer(line)) == referenceTokenizer(line)
+
+@pytest.mark.parametrize('line', EDGE_CASES)
+def test_content_tokens_match_reference(line):
+    assert asTuples(getContentTokens(line)) == referenceContentTokens(line)
+
+def test_random_lines_match_reference():
+    for line in randomLines(20000):
+        assert asTuples(tokenizer(line)) == referenceTokenizer(line), line
+
+@pytest.mark.parametrize('line', EDGE_CASES)
+def test_render_matches_reference(line):
+    reference_tokens = [Token(token_type, extra_info) for token_type, extra_info in referenceContentTokens(line)]
+    if needsNetwork(reference_tokens):
+        pytest.skip('需要网络请求')
+    expected = renderTokens(reference_tokens)
+    note_obj, abstract = renderTokens(getContentTokens(line))
+    assert withoutIds(note_obj.obj) == withoutIds(expected[0].obj)
+    assert abstract == expected[1]
+
+def test_bv_token_keeps_trailing_character():
+    # 旧版实现的特性：BV号后紧邻的一个字符会被一并取走
+    assert asTuples(tokenizer('BV1xx411c7mDx后续')) == [
+        (TokenType.TEXT, ''),
+        (TokenType.BV_URL, 'BV1xx411c7mDx'),
+        (TokenType.TEXT, '后续'),
+    ]
+
+def test_tokens_are_tuples():
+    token = tokenizer('文本')[0]
+    assert token == (TokenType.TEXT, '文本')
+    assert not hasattr(token, '__dict__')